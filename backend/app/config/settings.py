@@ -37,6 +37,33 @@ JAMENDO_CLIENT_ID = os.getenv("JAMENDO_CLIENT_ID", "bfc770e7")
 JAMENDO_DEFAULT_LANGUAGE = os.getenv("JAMENDO_DEFAULT_LANGUAGE", "en")
 JAMENDO_DEFAULT_ORDER = os.getenv("JAMENDO_DEFAULT_ORDER", "popularity_total")
 
+# Background worker
+# Set EMBEDDED_WORKER=false on web processes when a standalone worker (python -m app.worker) is deployed
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "true").lower() in {"1", "true", "yes"}
+WORKER_LEASE_TTL_SECONDS = int(os.getenv("WORKER_LEASE_TTL_SECONDS", 30))
+
+# Notification settings cache (per process; bounds staleness of changes made by other processes).
+# The scheduler reads settings from MongoDB instead, so it never sends after a user switched reminders off.
+NOTIFICATION_SETTINGS_CACHE_TTL_SECONDS = int(os.getenv("NOTIFICATION_SETTINGS_CACHE_TTL_SECONDS", 300))
+NOTIFICATION_SETTINGS_CACHE_SIZE = 10000
+
+# Therapist calendar counts and dashboards are cached per process; changes made through other processes show up within this TTL
+CALENDAR_CACHE_TTL_SECONDS = int(os.getenv("CALENDAR_CACHE_TTL_SECONDS", 60))
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", 45))
+
+# Bursts of notifications sharing a coalesce key (e.g. one chat conversation) collapse into one within this window
+NOTIFICATION_COALESCE_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_WINDOW_SECONDS", 300))
+
+# Push delivery ("local" only logs pushes and delivers nothing; "fcm" sends through Firebase Cloud Messaging)
+PUSH_TRANSPORT = os.getenv("PUSH_TRANSPORT", "local").lower()
+# Service-account JSON used to mint short-lived FCM access tokens; the project id defaults to the account's
+FCM_CREDENTIALS_FILE = os.getenv("FCM_CREDENTIALS_FILE", os.getenv("GOOGLE_APPLICATION_CREDENTIALS", ""))
+FCM_PROJECT_ID = os.getenv("FCM_PROJECT_ID", "")
+
+# Signs ICS calendar feed URLs; rotating it revokes every issued feed URL.
+# When unset, a key generated once and stored in the app_secrets collection is used.
+CALENDAR_FEED_SECRET = os.getenv("CALENDAR_FEED_SECRET", "")
+
 class Settings(BaseSettings):
     """Application settings and configuration"""
     
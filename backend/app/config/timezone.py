@@ -4,13 +4,13 @@ try:
 except ImportError:  # pragma: no cover
     ZoneInfo = None  # type: ignore
 
-_MALAYSIA_TZ_NAME = "Asia/Kuala_Lumpur"
+MALAYSIA_TZ_NAME = "Asia/Kuala_Lumpur"
 
 def get_malaysia_tz():
     """Get Malaysia timezone object."""
     if ZoneInfo is not None:
         try:
-            return ZoneInfo(_MALAYSIA_TZ_NAME)
+            return ZoneInfo(MALAYSIA_TZ_NAME)
         except Exception:
             pass
     # Fallback: UTC+8
@@ -32,3 +32,18 @@ def make_aware_malaysia(dt: datetime) -> datetime:
     if dt.tzinfo is not None:
         return dt
     return dt.replace(tzinfo=get_malaysia_tz())
+
+def to_storage_datetime(value) -> datetime:
+    """Canonical stored form for session timestamps: a timezone-aware UTC datetime.
+
+    Accepts aware datetimes or ISO strings carrying an offset. Naive values are
+    rejected because their timezone is ambiguous (pymongo reads naive UTC, the
+    app builds naive Malaysia time).
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime):
+        raise ValueError(f"Expected a datetime, got {type(value).__name__}")
+    if value.tzinfo is None:
+        raise ValueError("Refusing to store a naive datetime; attach a timezone first")
+    return value.astimezone(timezone.utc)
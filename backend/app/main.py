@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -33,6 +33,9 @@ from .routes.mood_nudge_routes import router as mood_nudge_router
 from .routes.admin_routes import router as admin_router
 from .routes.tts_routes import router as tts_router
 from .services.notification_background import lifespan
+from .services.background_worker import SCHEDULER_LEASE_NAME
+from .services.leader_election import get_lease
+from .services.metrics import metrics, render_prometheus
 from .services.mood_nudge_service import init_mood_nudges
 from app.config.settings import get_settings
 
@@ -189,6 +192,16 @@ async def health_check():
         )
 
 
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for this process and the current scheduler leader"""
+    snapshots = [(metrics.snapshot(), {"source": "web"})]
+    lease = get_lease(SCHEDULER_LEASE_NAME)
+    if lease and lease.get("status"):
+        snapshots.append((lease["status"], {"source": "leader", "owner": lease.get("owner", "")}))
+    return render_prometheus(snapshots)
+
+
 @app.get("/users", tags=["Legacy"])
 def get_users():
     """Legacy endpoint - Get all users"""
@@ -0,0 +1,6 @@
+"""
+One-off data migrations
+
+Each module exposes run() and can be executed directly, e.g.
+python -m app.migrations.notification_logs
+"""
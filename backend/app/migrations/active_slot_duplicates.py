@@ -0,0 +1,106 @@
+"""
+Find double-booked therapist slots and build the unique_active_slot index
+
+Bookings made before the index existed were not arbitrated, so a therapist can
+have several scheduled sessions at the same scheduled_at, which stops the index
+(and the app) from starting. Without flags the duplicates are only reported.
+With --resolve the earliest booking of each slot is kept; the others are
+cancelled (slot not released), their clients are notified, and the index is built.
+
+Run session_datetimes first so equal times stored as strings and dates line up.
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+from app.config.timezone import now_my
+from app.models.booking_schemas import SessionStatus
+from app.models.database import db, ensure_unique_active_slot_index
+from app.services import availability_engine
+from app.services.booking_service import _booking_label
+from app.services.notification_service import create_notification
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_REASON = "Duplicate booking: this slot was booked more than once"
+
+
+def find_duplicates() -> list[dict]:
+    """Groups of scheduled sessions sharing a therapist slot, earliest booking first"""
+    return list(db.therapy_sessions.aggregate([
+        {"$match": {"session_status": SessionStatus.scheduled.value}},
+        {"$sort": {"created_at": 1, "_id": 1}},
+        {"$group": {
+            "_id": {"therapist_user_id": "$therapist_user_id", "scheduled_at": "$scheduled_at"},
+            "sessions": {"$push": {"session_id": "$session_id", "user_id": "$user_id"}},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True))
+
+
+def _cancel_extra(group: dict) -> int:
+    slot = group["_id"]
+    scheduled_at = slot["scheduled_at"]
+    extra = group["sessions"][1:]
+    result = db.therapy_sessions.update_many(
+        {
+            "session_id": {"$in": [session["session_id"] for session in extra]},
+            "session_status": SessionStatus.scheduled.value,
+        },
+        {"$set": {
+            "session_status": SessionStatus.cancelled.value,
+            "status": SessionStatus.cancelled.value,
+            "cancellation_reason": DUPLICATE_REASON,
+            "cancelled_by": "system",
+            "slot_released": False,
+            "updated_at": now_my(),
+        }},
+    )
+    label = _booking_label(scheduled_at) if isinstance(scheduled_at, datetime) else scheduled_at
+    for session in extra:
+        create_notification(
+            user_id=session["user_id"],
+            type="booking_update",
+            title="Booking cancelled",
+            body=f"Your booking on {label} was cancelled because the slot had already been taken. "
+                 "Please choose another time.",
+            data={"session_id": session["session_id"]},
+        )
+    if isinstance(scheduled_at, datetime):
+        availability_engine.on_calendar_changed(slot["therapist_user_id"], scheduled_at)
+    return result.modified_count
+
+
+def run(resolve: bool = False) -> int:
+    """Report (or with resolve, cancel) the extra bookings; returns how many slots were double-booked"""
+    groups = find_duplicates()
+    for group in groups:
+        slot = group["_id"]
+        kept, *extra = group["sessions"]
+        logger.warning(
+            f"Therapist {slot['therapist_user_id']} has {group['count']} scheduled sessions at "
+            f"{slot['scheduled_at']}: keeping {kept['session_id']}, "
+            f"{'cancelling' if resolve else 'would cancel'} {', '.join(s['session_id'] for s in extra)}"
+        )
+
+    if resolve:
+        cancelled = sum(_cancel_extra(group) for group in groups)
+        logger.info(f"Cancelled {cancelled} duplicate bookings in {len(groups)} slots")
+        ensure_unique_active_slot_index()
+        logger.info("unique_active_slot index is in place")
+    elif groups:
+        logger.warning(f"{len(groups)} double-booked slots; re-run with --resolve to cancel the extra bookings")
+    else:
+        logger.info("No double-booked slots")
+    return len(groups)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Find double-booked therapist slots")
+    parser.add_argument("--resolve", action="store_true", help="Cancel all but the earliest booking of each slot")
+    args = parser.parse_args()
+    if run(resolve=args.resolve) and not args.resolve:
+        sys.exit(1)
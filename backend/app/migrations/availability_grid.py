@@ -0,0 +1,39 @@
+"""
+Backfill day-grid fields on therapist_availability
+
+Adds start_minute, end_minute and the 15-minute cell_mask to slots created
+before they were stored. Safe to run more than once.
+"""
+import logging
+
+from pymongo import UpdateOne
+
+from app.models.database import db
+from app.services import day_grid
+from app.services.availability_engine import slot_minutes
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def run():
+    updated = 0
+    batch = []
+    for slot in db.therapist_availability.find({"cell_mask": {"$exists": False}}, {"start_time": 1, "end_time": 1}):
+        minutes = slot_minutes(slot)
+        if minutes is None:
+            logger.warning(f"Skipping availability {slot['_id']} with unparseable times")
+            continue
+        batch.append(UpdateOne({"_id": slot["_id"]}, {"$set": day_grid.grid_fields(*minutes)}))
+        if len(batch) >= BATCH_SIZE:
+            updated += db.therapist_availability.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.therapist_availability.bulk_write(batch, ordered=False).modified_count
+    logger.info(f"Backfilled day grid on {updated} availability slots")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
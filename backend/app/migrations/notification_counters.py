@@ -0,0 +1,35 @@
+"""
+Recompute per-user unread notification counters
+
+Counters are maintained incrementally; run this once after deploying them,
+or whenever a counter is suspected to have drifted.
+"""
+import logging
+
+from pymongo import UpdateOne
+
+from app.models.database import db
+
+logger = logging.getLogger(__name__)
+
+
+def run():
+    rows = db.notifications.aggregate([
+        {"$match": {"is_read": False}},
+        {"$group": {"_id": "$user_id", "unread_count": {"$sum": 1}}},
+    ])
+    counts = {row["_id"]: row["unread_count"] for row in rows}
+    # Users with nothing unread
+    db.notification_counters.update_many({"_id": {"$nin": list(counts)}}, {"$set": {"unread_count": 0, "seeded": True}})
+    updates = [
+        UpdateOne({"_id": user_id}, {"$set": {"unread_count": count, "seeded": True}}, upsert=True)
+        for user_id, count in counts.items()
+    ]
+    if updates:
+        db.notification_counters.bulk_write(updates, ordered=False)
+    logger.info(f"Recomputed unread counters for {len(updates)} users")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
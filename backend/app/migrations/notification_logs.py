@@ -0,0 +1,72 @@
+"""
+Migrate notification_logs to typed timestamps
+
+- Converts ISO-string sent_at values to BSON dates so the TTL index can expire them
+- Builds the per-user last_sent map on notification_settings from the logs
+
+Safe to run more than once.
+"""
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app.models.database import db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def convert_sent_at() -> int:
+    """Rewrite string sent_at values as datetimes"""
+    converted = 0
+    batch = []
+    cursor = db.notification_logs.find({"sent_at": {"$type": "string"}}, {"sent_at": 1})
+    for log in cursor:
+        try:
+            sent_at = datetime.fromisoformat(log["sent_at"])
+        except ValueError:
+            logger.warning(f"Skipping notification log {log['_id']} with invalid sent_at {log['sent_at']!r}")
+            continue
+        batch.append(UpdateOne({"_id": log["_id"]}, {"$set": {"sent_at": sent_at}}))
+        if len(batch) >= BATCH_SIZE:
+            converted += db.notification_logs.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        converted += db.notification_logs.bulk_write(batch, ordered=False).modified_count
+    return converted
+
+
+def build_last_sent_map() -> int:
+    """Store the latest delivery per reminder type on each user's settings"""
+    updated = 0
+    batch = []
+    rows = db.notification_logs.aggregate([
+        {"$match": {"sent_at": {"$type": "date"}}},
+        {"$group": {"_id": {"user_id": "$user_id", "type": "$type"}, "last_sent": {"$max": "$sent_at"}}},
+    ])
+    for row in rows:
+        key = row["_id"]
+        batch.append(UpdateOne(
+            {"user_id": key["user_id"]},
+            {"$max": {f"last_sent.{key['type']}": row["last_sent"]}}
+        ))
+        if len(batch) >= BATCH_SIZE:
+            updated += db.notification_settings.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.notification_settings.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def run():
+    converted = convert_sent_at()
+    logger.info(f"Converted sent_at on {converted} notification logs")
+    updated = build_last_sent_map()
+    logger.info(f"Updated last_sent on {updated} notification settings")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -0,0 +1,34 @@
+"""
+Remove duplicate notification_settings documents and make user_id unique
+
+Without a unique index, concurrent upserts or signup retries could store more
+than one settings document per user. Reads and updates by user_id have been
+hitting the oldest one, so that document is kept and the others are deleted.
+Safe to run more than once.
+"""
+import logging
+
+from app.models.database import db, ensure_unique_settings_index
+
+logger = logging.getLogger(__name__)
+
+
+def run() -> int:
+    removed = 0
+    groups = db.notification_settings.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for group in groups:
+        kept, *extra = group["ids"]
+        removed += db.notification_settings.delete_many({"_id": {"$in": extra}}).deleted_count
+        logger.warning(f"User {group['_id']}: kept settings {kept}, removed {len(extra)} duplicates")
+    ensure_unique_settings_index()
+    logger.info(f"Removed {removed} duplicate settings documents; user_id is unique")
+    return removed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -0,0 +1,49 @@
+"""
+Normalize therapy_sessions.scheduled_at to BSON dates
+
+Older sessions stored scheduled_at as ISO strings. They are rewritten as UTC
+datetimes; strings without an offset are read as UTC, which is how the read
+paths always treated them. Sessions whose value cannot be parsed are logged
+and left alone. Safe to run more than once.
+"""
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from app.config.timezone import to_storage_datetime
+from app.models.database import db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return to_storage_datetime(parsed)
+
+
+def run():
+    converted = 0
+    batch = []
+    for session in db.therapy_sessions.find({"scheduled_at": {"$not": {"$type": "date"}}}, {"scheduled_at": 1}):
+        try:
+            scheduled_at = _parse(session["scheduled_at"])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            logger.warning(f"Leaving session {session['_id']} with unparseable scheduled_at {session.get('scheduled_at')!r}")
+            continue
+        batch.append(UpdateOne({"_id": session["_id"]}, {"$set": {"scheduled_at": scheduled_at}}))
+        if len(batch) >= BATCH_SIZE:
+            converted += db.therapy_sessions.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        converted += db.therapy_sessions.bulk_write(batch, ordered=False).modified_count
+    logger.info(f"Converted scheduled_at on {converted} sessions")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
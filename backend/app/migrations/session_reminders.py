@@ -0,0 +1,49 @@
+"""
+Retire the scheduled_notifications collection
+
+Therapy session reminders are now derived from therapy_sessions. Reminders
+the old collection already delivered for upcoming sessions are recorded in
+reminders_sent so they are not repeated, then the collection is dropped.
+Safe to run more than once.
+"""
+import logging
+
+from app.models.database import db
+
+logger = logging.getLogger(__name__)
+
+# Legacy reminder titles mapped to the derived reminder keys
+LEGACY_TITLES = {
+    "📅 Therapy Session Reminder": "1h",
+    "📅 Therapy Session Starting Soon": "10m",
+}
+
+
+def run():
+    if "scheduled_notifications" not in db.list_collection_names():
+        logger.info("scheduled_notifications already dropped")
+        return
+
+    sent_keys = {}
+    for reminder in db.scheduled_notifications.find(
+        {"notification_type": "therapy_session_reminder", "is_sent": True},
+        {"notification_data": 1}
+    ):
+        data = reminder.get("notification_data") or {}
+        key = LEGACY_TITLES.get(data.get("title"))
+        if key and data.get("session_id"):
+            sent_keys.setdefault(key, set()).add(data["session_id"])
+
+    for key, session_ids in sent_keys.items():
+        db.therapy_sessions.update_many(
+            {"session_id": {"$in": list(session_ids)}, "session_status": "scheduled"},
+            {"$addToSet": {"reminders_sent": key}}
+        )
+
+    db.scheduled_notifications.drop()
+    logger.info(f"Carried over {sum(len(ids) for ids in sent_keys.values())} sent reminders; dropped scheduled_notifications")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -0,0 +1,51 @@
+"""
+Backfill rating_sum / rating_count / rating_average on therapist_profile
+
+submit_session_rating maintains the counters with $inc and the rating_average
+sort key from them; this recomputes all three from the rated sessions. Run once after deploying the counters, or whenever
+they are suspected to have drifted. Safe to run more than once.
+"""
+import logging
+
+from pymongo import UpdateOne
+
+from app.models.database import db
+from app.services.therapist_service import rating_average
+
+logger = logging.getLogger(__name__)
+
+
+def run():
+    rows = db.therapy_sessions.aggregate([
+        {"$match": {"user_rating": {"$type": "number"}}},
+        {"$group": {
+            "_id": "$therapist_user_id",
+            "rating_sum": {"$sum": "$user_rating"},
+            "rating_count": {"$sum": 1},
+        }},
+    ])
+    totals = {row["_id"]: row for row in rows if row["_id"]}
+    # Therapists without any rated session
+    db.therapist_profile.update_many(
+        {"user_id": {"$nin": list(totals)}},
+        {"$set": {"rating_sum": 0, "rating_count": 0, "rating_average": 0.0}}
+    )
+    updates = [
+        UpdateOne(
+            {"user_id": therapist_id},
+            {"$set": {
+                "rating_sum": float(row["rating_sum"]),
+                "rating_count": row["rating_count"],
+                "rating_average": rating_average(row["rating_sum"], row["rating_count"]),
+            }}
+        )
+        for therapist_id, row in totals.items()
+    ]
+    if updates:
+        db.therapist_profile.bulk_write(updates, ordered=False)
+    logger.info(f"Recomputed rating counters for {len(updates)} therapists")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
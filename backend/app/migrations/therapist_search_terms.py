@@ -0,0 +1,35 @@
+"""
+Backfill search_terms / search_words on therapist_profile
+
+Therapist search matches query words against search_terms and ranks on the
+per-field search_words; profile writes keep both current. Run once after deploying indexed search. Safe to run more than once.
+"""
+import logging
+
+from pymongo import UpdateOne
+
+from app.models.database import db
+from app.services.therapist_service import SEARCH_FIELD_WEIGHTS, search_fields
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def run():
+    projection = {"_id": 1, **{field: 1 for field, _ in SEARCH_FIELD_WEIGHTS}}
+    updates = []
+    updated = 0
+    for profile in db.therapist_profile.find({}, projection):
+        updates.append(UpdateOne({"_id": profile["_id"]}, {"$set": search_fields(profile)}))
+        if len(updates) >= BATCH_SIZE:
+            updated += db.therapist_profile.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        updated += db.therapist_profile.bulk_write(updates, ordered=False).modified_count
+    logger.info(f"Updated search fields on {updated} therapist profiles")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
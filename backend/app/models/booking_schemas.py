@@ -40,6 +40,46 @@ class TherapistAvailabilityResponse(BaseModel):
     center_name: Optional[str] = None
 
 
+class DailyAvailability(BaseModel):
+    """Slots for one date within a range"""
+    date: str
+    available_slots: list[AvailableTimeSlot]
+
+
+class TherapistAvailabilityRangeResponse(BaseModel):
+    """Therapist availability for consecutive dates"""
+    therapist_id: str
+    therapist_name: str
+    days: list[DailyAvailability]
+    price: float
+    center_name: Optional[str] = None
+
+
+class NextAvailableSlotResponse(BaseModel):
+    """Earliest free slot for a therapist, if any"""
+    therapist_id: str
+    slot: Optional[AvailableTimeSlot] = None
+
+
+class TherapistSlotSearchResult(BaseModel):
+    """A therapist with free slots matching an availability search"""
+    therapist_id: str
+    therapist_name: str
+    specializations: list[str] = []
+    languages_spoken: list[str] = []
+    price: float
+    center_name: Optional[str] = None
+    earliest_start_iso: str
+    slots: list[AvailableTimeSlot]
+
+
+class TherapistSlotSearchResponse(BaseModel):
+    """Page of therapists ranked by earliest matching slot"""
+    results: list[TherapistSlotSearchResult]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
 class BookingRequest(BaseModel):
     """Request to create a booking"""
     client_user_id: str
@@ -176,6 +216,19 @@ class SubmitSessionRatingResponse(BaseModel):
 
 
 class BookingListResponse(BaseModel):
-    """List of bookings"""
+    """One page of bookings; pass next_cursor back for the next page"""
     bookings: list[BookingResponse]
-    total: int
+    total: int  # all sessions matching the filters, not just this page
+    status_counts: dict[str, int] = {}
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class CalendarFeedUrlRequest(BaseModel):
+    """The account password, re-entered to prove the caller owns the feed"""
+    password: str
+
+
+class CalendarFeedUrlResponse(BaseModel):
+    """Signed ICS feed URL to subscribe to from a calendar app"""
+    feed_url: str
@@ -52,3 +52,10 @@ class MarkConversationReadRequest(BaseModel):
 
 class ConversationListResponse(BaseModel):
     conversations: list[ChatConversationResponse]
+
+
+class ChatMessageSyncResponse(BaseModel):
+    messages: list[ChatMessageResponse]
+    read_message_ids: list[str] = []
+    next_cursor: str
+    has_more: bool = False
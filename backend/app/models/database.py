@@ -1,9 +1,13 @@
-from pymongo import MongoClient, ASCENDING  # type: ignore
+from pymongo import MongoClient, ASCENDING, DESCENDING, GEOSPHERE  # type: ignore
+from pymongo.errors import OperationFailure
 from ..config.settings import MONGODB_URI, DATABASE_NAME
 import logging
 
 logger = logging.getLogger(__name__)
 
+UNIQUE_ACTIVE_SLOT_INDEX = "unique_active_slot"
+SETTINGS_USER_INDEX = "user_id_1"
+
 client = MongoClient(MONGODB_URI)
 db = client[DATABASE_NAME]
 
@@ -40,6 +44,18 @@ db.user_login_events.create_index("user_id")
 db.therapist_profile.create_index("user_id", unique=True)
 db.therapist_profile.create_index("license_number", unique=True)
 db.therapist_profile.create_index("verification_status")
+db.therapist_profile.create_index("next_available.start_at", sparse=True)
+# Therapist search: every query word must prefix one of search_terms
+db.therapist_profile.create_index([("verification_status", ASCENDING), ("search_terms", ASCENDING)])
+# Therapist directory (no query): rating order straight off the index
+db.therapist_profile.create_index([
+    ("verification_status", ASCENDING),
+    ("rating_average", DESCENDING),
+    ("rating_count", DESCENDING),
+    ("user_id", ASCENDING),
+])
+# Near searches ($geoNear); profiles without a location are left out of the index
+db.therapist_profile.create_index([("location", GEOSPHERE), ("verification_status", ASCENDING)])
 
 # Therapy sessions collection
 db.therapy_sessions.create_index("session_id", unique=True)
@@ -57,17 +73,38 @@ db.therapy_sessions.create_index([
     ("scheduled_at", ASCENDING),
 ])
 
+db.therapy_sessions.create_index([("therapist_user_id", ASCENDING), ("scheduled_at", ASCENDING)])
+# ICS feed versions: latest change per client / therapist
+db.therapy_sessions.create_index([("user_id", ASCENDING), ("updated_at", DESCENDING)])
+db.therapy_sessions.create_index([("therapist_user_id", ASCENDING), ("updated_at", DESCENDING)])
+# Unfiltered client booking lists page on scheduled_at
+db.therapy_sessions.create_index([("user_id", ASCENDING), ("scheduled_at", ASCENDING)])
+# Session reminders are derived from upcoming scheduled sessions
+db.therapy_sessions.create_index([("session_status", ASCENDING), ("scheduled_at", ASCENDING)])
+db.therapist_availability.create_index([("user_id", ASCENDING), ("availability_date", ASCENDING)])
+
 # Therapist-Client Chat collections
 db.chat_conversations.create_index("conversation_id", unique=True)
 db.chat_conversations.create_index([("client_user_id", ASCENDING), ("therapist_user_id", ASCENDING)], unique=True)
 db.chat_conversations.create_index("updated_at")
 db.chat_conversations.create_index("client_user_id")
 db.chat_conversations.create_index("therapist_user_id")
+db.chat_conversations.create_index([("client_user_id", ASCENDING), ("changed_at", DESCENDING)])
+db.chat_conversations.create_index([("therapist_user_id", ASCENDING), ("changed_at", DESCENDING)])
 
 db.therapist_chat_messages.create_index("message_id", unique=True)
 db.therapist_chat_messages.create_index("conversation_id")
 db.therapist_chat_messages.create_index("created_at")
 db.therapist_chat_messages.create_index([("conversation_id", ASCENDING), ("created_at", ASCENDING)])
+db.therapist_chat_messages.create_index([
+    ("conversation_id", ASCENDING),
+    ("created_at", ASCENDING),
+    ("message_id", ASCENDING),
+])
+db.therapist_chat_messages.create_index(
+    [("conversation_id", ASCENDING), ("read_at", ASCENDING)],
+    sparse=True,
+)
 
 # OTP codes collection
 db.otp_codes.create_index("email")
@@ -146,12 +183,31 @@ db.activities.create_index("category")
 db.user_activities.create_index("user_id")
 db.user_activities.create_index("completed_at")
 
-# Scheduled notifications collection
-db.scheduled_notifications.create_index("notification_id", unique=True)
-db.scheduled_notifications.create_index("user_id")
-db.scheduled_notifications.create_index("scheduled_time")
-db.scheduled_notifications.create_index("is_sent")
-db.scheduled_notifications.create_index([("scheduled_time", ASCENDING), ("is_sent", ASCENDING)])
+# Notification settings collection (the unique user_id index is built by initialize_indexes)
+db.notification_settings.create_index(
+    [("next_reminder_at", ASCENDING), ("user_id", ASCENDING)],
+    sparse=True,
+)
+
+# Notifications inbox (keyset pagination on created_at, notification_id)
+db.notifications.create_index("notification_id", unique=True)
+db.notifications.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("notification_id", DESCENDING)])
+db.notifications.create_index("created_at")
+db.notifications.create_index([("user_id", ASCENDING), ("coalesce_key", ASCENDING)], sparse=True)
+db.notifications_archive.create_index("notification_id", unique=True)
+db.notifications_archive.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+
+# Push delivery: device registry and retry queue (finished jobs expire after 7 days)
+db.device_tokens.create_index("token", unique=True)
+db.device_tokens.create_index("user_id")
+db.push_queue.create_index("push_id", unique=True)
+db.push_queue.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+db.push_queue.create_index("claim_id", sparse=True)
+db.push_queue.create_index("completed_at", expireAfterSeconds=7 * 24 * 60 * 60)
+
+# Notification logs expire automatically (sent_at must be a BSON date)
+NOTIFICATION_LOG_TTL_SECONDS = 30 * 24 * 60 * 60
+db.notification_logs.create_index("sent_at", expireAfterSeconds=NOTIFICATION_LOG_TTL_SECONDS)
 
 
 def get_database():
@@ -159,6 +215,54 @@ def get_database():
     return db
 
 
+def ensure_unique_active_slot_index():
+    """One active (scheduled) session per therapist slot; this is what makes booking atomic.
+
+    Built at startup rather than on import so the active_slot_duplicates
+    migration can still load the database when legacy double bookings block it.
+    """
+    try:
+        db.therapy_sessions.create_index(
+            [("therapist_user_id", ASCENDING), ("scheduled_at", ASCENDING)],
+            name=UNIQUE_ACTIVE_SLOT_INDEX,
+            unique=True,
+            partialFilterExpression={"session_status": "scheduled"},
+        )
+    except OperationFailure as e:
+        raise RuntimeError(
+            f"Could not create the {UNIQUE_ACTIVE_SLOT_INDEX} index: some therapist slots have more than one "
+            "scheduled session. Run `python -m app.migrations.active_slot_duplicates` to list them "
+            f"and `--resolve` to cancel the extra bookings, then restart. ({e})"
+        ) from e
+
+
+def ensure_unique_settings_index():
+    """One notification_settings document per user, so upserts by user_id cannot fork it.
+
+    Replaces the earlier non-unique user_id index; while duplicates remain that
+    index is left in place and startup fails.
+    """
+    existing = db.notification_settings.index_information().get(SETTINGS_USER_INDEX)
+    if existing and existing.get("unique"):
+        return
+    duplicate = next(db.notification_settings.aggregate([
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1},
+    ]), None)
+    if duplicate:
+        raise RuntimeError(
+            f"Could not make notification_settings.user_id unique: user {duplicate['_id']} has "
+            f"{duplicate['count']} settings documents. Run `python -m app.migrations.notification_settings_duplicates`, "
+            "then restart."
+        )
+    if existing:
+        db.notification_settings.drop_index(SETTINGS_USER_INDEX)
+    db.notification_settings.create_index("user_id", name=SETTINGS_USER_INDEX, unique=True)
+
+
 def initialize_indexes():
-    """Initialize all indexes - already done above during module import"""
+    """Create the indexes that can fail on existing data (the rest are created on import)"""
+    ensure_unique_active_slot_index()
+    ensure_unique_settings_index()
     logger.info("Database indexes initialized")
\ No newline at end of file
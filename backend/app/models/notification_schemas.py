@@ -35,6 +35,19 @@ class Notification(BaseModel):
     is_read: bool = False
     created_at: str
     data: Optional[dict] = None
+    count: int = 1  # number of events folded into this notification
 
 class NotificationListResponse(BaseModel):
     notifications: list[Notification]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+class MarkNotificationsReadRequest(BaseModel):
+    notification_ids: Optional[list[str]] = None  # None marks every notification as read
+
+class RegisterDeviceRequest(BaseModel):
+    token: str
+    platform: str = "android"  # 'android', 'ios', 'web'
@@ -81,6 +81,8 @@ class TherapistApplicationRequest(BaseModel):
     languages: list[str]
     hourly_rate: float
     profile_picture: Optional[str] = None  # base64 encoded
+    latitude: Optional[float] = None  # office location, for near searches
+    longitude: Optional[float] = None
 
 class UpdateTherapistProfileRequest(BaseModel):
     first_name: Optional[str] = None
@@ -99,6 +101,9 @@ class UpdateTherapistProfileRequest(BaseModel):
     profile_picture_base64: Optional[str] = None
     profile_picture_url: Optional[str] = None
     delete_profile_picture: Optional[bool] = False
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    clear_location: Optional[bool] = False
 
 # Response Models
 class LoginResponse(BaseModel):
@@ -160,6 +165,15 @@ class TherapistProfileResponse(BaseModel):
     updated_at: datetime
     average_rating: Optional[float] = None
     total_ratings: int = 0
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None  # only set by near searches
+
+class TherapistSearchResponse(BaseModel):
+    """Page of therapists ranked by relevance, then rating (or by distance for near searches)"""
+    results: list[TherapistProfileResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 class TherapistApplicationResponse(BaseModel):
     success: bool
@@ -178,6 +192,27 @@ class SetAvailabilityRequest(BaseModel):
     is_available: bool = True
     availability_date: Optional[str] = None  # Specific date (YYYY-MM-DD) or None for recurring
 
+class AvailabilityRule(BaseModel):
+    days_of_week: list[str]  # monday, tuesday, etc.
+    start_time: str  # Format: "HH:MM AM/PM"
+    end_time: str    # Format: "HH:MM AM/PM"
+    slot_minutes: Optional[int] = None  # Split the window into blocks of this length; None = one slot
+    break_minutes: int = 0  # Gap between consecutive blocks
+    start_date: Optional[str] = None  # YYYY-MM-DD; with end_date, expands to date-specific slots
+    end_date: Optional[str] = None    # Inclusive; both omitted = weekly recurring template
+    is_available: bool = True
+
+class BulkAvailabilityRequest(BaseModel):
+    user_id: str
+    rules: list[AvailabilityRule]
+    replace: bool = True  # Swap out existing slots on the days/dates the rules cover
+
+class BulkAvailabilityResponse(BaseModel):
+    success: bool
+    message: str
+    slots_created: int
+    slots_deleted: int
+
 class AvailabilityResponse(BaseModel):
     availability_id: str
     user_id: str
@@ -233,6 +268,17 @@ class EditAvailabilityRequest(BaseModel):
     start_time: str
     end_time: str
 
+class CalendarDayCounts(BaseModel):
+    date: str  # YYYY-MM-DD
+    available: int
+    booked: int
+    released: int  # cancelled sessions whose slot was released
+
+class TherapistCalendarResponse(BaseModel):
+    therapist_id: str
+    start_date: str
+    days: list[CalendarDayCounts]
+
 class NextAvailabilityResponse(BaseModel):
     has_availability: bool
     message: Optional[str] = None
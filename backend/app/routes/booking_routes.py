@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from email.utils import format_datetime
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Literal, Optional
 from ..models.booking_schemas import (
     TherapistAvailabilityResponse,
     BookingRequest,
@@ -15,12 +17,46 @@ from ..models.booking_schemas import (
     SubmitSessionRatingResponse,
     ReleaseSessionSlotRequest,
     ReleaseSessionSlotResponse,
+    TherapistAvailabilityRangeResponse,
+    NextAvailableSlotResponse,
+    TherapistSlotSearchResponse,
+    SessionStatus,
+    CalendarFeedUrlRequest,
+    CalendarFeedUrlResponse,
 )
-from ..services import booking_service
+from ..services import booking_service, calendar_feed_service
 
 router = APIRouter(prefix="/booking", tags=["booking"])
 
 
+@router.get("/availability/search", response_model=TherapistSlotSearchResponse)
+def search_available_therapists(
+    start_date: str = Query(..., description="First date in YYYY-MM-DD format"),
+    days: int = Query(1, description="Number of consecutive days to search"),
+    from_time: Optional[str] = Query(None, description="Earliest slot start, e.g. '18:00' or '6:00 PM'"),
+    to_time: Optional[str] = Query(None, description="Latest slot end, e.g. '22:00' or '10:00 PM'"),
+    specialization: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+):
+    """
+    Find therapists with free slots in a date range and time-of-day window
+    Ranked by earliest matching slot; pass next_cursor back for the next page
+    """
+    try:
+        return booking_service.search_available_therapists(
+            start_date, days, from_time, to_time, specialization, language,
+            min_price, max_price, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search availability: {str(e)}")
+
+
 @router.get("/availability/{therapist_user_id}", response_model=TherapistAvailabilityResponse)
 def get_therapist_availability(
     therapist_user_id: str,
@@ -42,6 +78,36 @@ def get_therapist_availability(
         raise HTTPException(status_code=500, detail=f"Failed to get availability: {str(e)}")
 
 
+@router.get("/availability/{therapist_user_id}/range", response_model=TherapistAvailabilityRangeResponse)
+def get_therapist_availability_range(
+    therapist_user_id: str,
+    start_date: str = Query(..., description="First date in YYYY-MM-DD format"),
+    days: int = Query(7, description="Number of consecutive days")
+):
+    """
+    Get available time slots for a therapist over several days
+    """
+    try:
+        return booking_service.get_therapist_availability_for_range(therapist_user_id, start_date, days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get availability: {str(e)}")
+
+
+@router.get("/availability/{therapist_user_id}/next", response_model=NextAvailableSlotResponse)
+def get_next_available_slot(therapist_user_id: str):
+    """
+    Get the earliest bookable slot for a therapist
+    """
+    try:
+        return booking_service.get_next_available_slot(therapist_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get availability: {str(e)}")
+
+
 @router.post("/create", response_model=BookingResponse)
 def create_booking(request: BookingRequest):
     """
@@ -51,6 +117,8 @@ def create_booking(request: BookingRequest):
     try:
         booking = booking_service.create_booking(request)
         return booking
+    except booking_service.SlotConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -58,27 +126,49 @@ def create_booking(request: BookingRequest):
 
 
 @router.get("/client/{client_user_id}", response_model=BookingListResponse)
-def get_client_bookings(client_user_id: str):
+def get_client_bookings(
+    client_user_id: str,
+    status: Optional[list[SessionStatus]] = Query(None, description="Repeat to match several statuses"),
+    from_date: Optional[str] = Query(None, description="Earliest session date, YYYY-MM-DD"),
+    to_date: Optional[str] = Query(None, description="Latest session date (inclusive), YYYY-MM-DD"),
+    order: Literal["desc", "asc"] = "desc",
+    limit: int = Query(booking_service.BOOKING_PAGE_SIZE, ge=1, le=booking_service.MAX_BOOKING_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """
-    Get all bookings for a client
-    Returns list sorted by scheduled date (newest first)
+    Get a page of bookings for a client
+    Sorted by scheduled date (newest first unless order=asc); pass next_cursor back for the next page
     """
     try:
-        bookings = booking_service.get_client_bookings(client_user_id)
-        return BookingListResponse(bookings=bookings, total=len(bookings))
+        return booking_service.get_client_bookings(
+            client_user_id, status, from_date, to_date, order == "desc", limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get bookings: {str(e)}")
 
 
 @router.get("/therapist/{therapist_user_id}", response_model=BookingListResponse)
-def get_therapist_bookings(therapist_user_id: str):
+def get_therapist_bookings(
+    therapist_user_id: str,
+    status: Optional[list[SessionStatus]] = Query(None, description="Repeat to match several statuses"),
+    from_date: Optional[str] = Query(None, description="Earliest session date, YYYY-MM-DD"),
+    to_date: Optional[str] = Query(None, description="Latest session date (inclusive), YYYY-MM-DD"),
+    order: Literal["desc", "asc"] = "desc",
+    limit: int = Query(booking_service.BOOKING_PAGE_SIZE, ge=1, le=booking_service.MAX_BOOKING_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """
-    Get all bookings for a therapist
-    Returns list sorted by scheduled date (newest first)
+    Get a page of bookings for a therapist
+    Sorted by scheduled date (newest first unless order=asc); pass next_cursor back for the next page
     """
     try:
-        bookings = booking_service.get_therapist_bookings(therapist_user_id)
-        return BookingListResponse(bookings=bookings, total=len(bookings))
+        return booking_service.get_therapist_bookings(
+            therapist_user_id, status, from_date, to_date, order == "desc", limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get bookings: {str(e)}")
 
@@ -149,3 +239,43 @@ def submit_session_rating(request: SubmitSessionRatingRequest):
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to submit rating: {str(e)}")
+
+
+@router.post("/calendar/{user_id}/feed-url", response_model=CalendarFeedUrlResponse)
+def create_calendar_feed_url(user_id: str, body: CalendarFeedUrlRequest, request: Request):
+    """
+    Signed ICS feed URL covering the user's sessions as client or therapist
+    The account password is required, since anyone holding the URL can read the feed
+    """
+    calendar_feed_service.authorize_feed_owner(user_id, body.password)
+    feed_url = request.url_for("get_calendar_feed", user_id=user_id)
+    return CalendarFeedUrlResponse(
+        feed_url=f"{feed_url}?token={calendar_feed_service.feed_token(user_id)}"
+    )
+
+
+@router.get("/calendar/{user_id}.ics", name="get_calendar_feed")
+def get_calendar_feed(user_id: str, request: Request, token: str = ""):
+    """
+    ICS feed of a user's therapy sessions
+    Answers 304 when the ETag / Last-Modified validators still match
+    """
+    if not calendar_feed_service.verify_feed_token(user_id, token):
+        raise HTTPException(status_code=404, detail="Calendar feed not found")
+
+    etag, last_modified = calendar_feed_service.feed_version(user_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if calendar_feed_service.is_not_modified(
+        etag, last_modified,
+        request.headers.get("if-none-match"), request.headers.get("if-modified-since")
+    ):
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(
+        calendar_feed_service.iter_feed(user_id),
+        media_type="text/calendar",
+        headers=headers,
+    )
@@ -3,11 +3,12 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query  # type: ignore
+from fastapi import APIRouter, Header, HTTPException, Query, Response  # type: ignore
 
 from ..models.chat_schemas import (
     ChatConversationResponse,
     ChatMessageResponse,
+    ChatMessageSyncResponse,
     ConversationListResponse,
     CreateConversationRequest,
     MarkConversationReadRequest,
@@ -16,10 +17,12 @@ from ..models.chat_schemas import (
 from ..services.chat_service import (
     fetch_messages,
     get_conversation_summary,
+    get_conversations_etag,
     get_or_create_conversation,
     list_conversations,
     mark_conversation_read,
     send_message,
+    sync_messages,
 )
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
@@ -35,11 +38,20 @@ def create_conversation(request: CreateConversationRequest) -> ChatConversationR
 
 
 @router.get("/conversations", response_model=ConversationListResponse)
-def get_conversations(user_id: str = Query(..., min_length=1), role: str = Query("client")) -> ConversationListResponse:
+def get_conversations(
+    response: Response,
+    user_id: str = Query(..., min_length=1),
+    role: str = Query("client"),
+    if_none_match: Optional[str] = Header(None),
+):
     if role not in {"client", "therapist"}:
         raise HTTPException(status_code=400, detail="Role must be 'client' or 'therapist'")
     role_value = "client" if role == "client" else "therapist"
+    etag = get_conversations_etag(user_id, role_value)
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers={"ETag": etag})
     conversations = list_conversations(user_id, role_value)
+    response.headers["ETag"] = etag
     return ConversationListResponse(conversations=conversations)
 
 
@@ -59,6 +71,18 @@ def get_conversation_messages(
     return fetch_messages(conversation_id, limit=limit, before=target_before)
 
 
+@router.get("/conversations/{conversation_id}/messages/sync", response_model=ChatMessageSyncResponse)
+def sync_conversation_messages(
+    conversation_id: str,
+    since: Optional[str] = Query(None, description="Cursor returned by the previous sync"),
+    limit: int = Query(50, gt=0, le=200),
+) -> ChatMessageSyncResponse:
+    try:
+        return sync_messages(conversation_id, since=since, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @router.post("/messages", response_model=ChatMessageResponse)
 def post_message(payload: SendChatMessageRequest) -> ChatMessageResponse:
     try:
@@ -1,6 +1,10 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
-from app.models.notification_schemas import NotificationSettings, UpdateNotificationSettingsRequest, NotificationListResponse
-from app.services import notification_service
+from app.models.notification_schemas import (
+    NotificationSettings, UpdateNotificationSettingsRequest, NotificationListResponse,
+    UnreadCountResponse, MarkNotificationsReadRequest, RegisterDeviceRequest
+)
+from app.services import notification_service, push_service
 
 router = APIRouter()
 
@@ -12,11 +16,38 @@ def get_settings(user_id: str):
 def update_settings(user_id: str, settings: UpdateNotificationSettingsRequest):
     return notification_service.update_notification_settings(user_id, settings)
 
+@router.post("/notifications/devices/{user_id}")
+def register_device(user_id: str, request: RegisterDeviceRequest):
+    """Register a device token for push delivery"""
+    return push_service.register_device(user_id, request.token, request.platform)
+
+@router.delete("/notifications/devices/{token}")
+def unregister_device(token: str):
+    """Stop push delivery to a device (e.g. on logout)"""
+    if not push_service.unregister_device(token):
+        raise HTTPException(status_code=404, detail="Device not registered")
+    return {"status": "success"}
+
 @router.get("/notifications/{user_id}", response_model=NotificationListResponse)
-def get_notifications(user_id: str, limit: int = 50):
-    """Get user notifications"""
-    notifications = notification_service.get_user_notifications(user_id)
-    return NotificationListResponse(notifications=notifications[:limit])
+def get_notifications(user_id: str, limit: int = 50, cursor: Optional[str] = None, unread_only: bool = False):
+    """Get a page of user notifications; pass next_cursor back to fetch the next page"""
+    try:
+        return notification_service.get_user_notifications(
+            user_id, limit=limit, cursor=cursor, unread_only=unread_only
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/notifications/{user_id}/unread-count", response_model=UnreadCountResponse)
+def get_unread_count(user_id: str):
+    """Get the number of unread notifications"""
+    return UnreadCountResponse(unread_count=notification_service.get_unread_count(user_id))
+
+@router.post("/notifications/{user_id}/mark-read")
+def mark_many_read(user_id: str, request: MarkNotificationsReadRequest):
+    """Mark several notifications (or all when no ids are given) as read"""
+    updated = notification_service.mark_notifications_read(user_id, request.notification_ids)
+    return {"status": "success", "updated": updated}
 
 @router.post("/notifications/{notification_id}/read")
 def mark_read(notification_id: str):
@@ -2,7 +2,8 @@ from fastapi import APIRouter, Query
 from typing import Optional
 from ..models.schemas import (
     SetAvailabilityRequest, AvailabilityResponse, TherapistScheduleResponse, 
-    TherapistDashboardResponse, EditAvailabilityRequest, NextAvailabilityResponse
+    TherapistDashboardResponse, EditAvailabilityRequest, NextAvailabilityResponse,
+    TherapistCalendarResponse, BulkAvailabilityRequest, BulkAvailabilityResponse
 )
 from ..services.schedule_service import (
     set_therapist_availability,
@@ -14,6 +15,8 @@ from ..services.schedule_service import (
     edit_availability_slot,
     get_therapist_schedule_for_month,
     get_next_available_slot,
+    get_therapist_calendar,
+    bulk_set_therapist_availability,
 )
 
 router = APIRouter()
@@ -23,6 +26,11 @@ def set_availability(request: SetAvailabilityRequest):
     """Set therapist availability for a specific day"""
     return set_therapist_availability(request)
 
+@router.post("/therapist/availability/bulk", response_model=BulkAvailabilityResponse)
+def bulk_set_availability(request: BulkAvailabilityRequest):
+    """Replace availability from recurrence rules, e.g. every weekday 9-5 in 50-minute blocks"""
+    return bulk_set_therapist_availability(request)
+
 @router.get("/therapist/availability/{user_id}", response_model=list[AvailabilityResponse])
 def get_availability(
     user_id: str,
@@ -46,6 +54,15 @@ def get_schedule_for_month(user_id: str, year: int, month: int):
     """Get all scheduled dates for a therapist in a given month"""
     return get_therapist_schedule_for_month(user_id, year, month)
 
+@router.get("/therapist/schedule/{user_id}/calendar", response_model=TherapistCalendarResponse)
+def get_calendar(
+    user_id: str,
+    start_date: str = Query(..., description="First day in YYYY-MM-DD format"),
+    days: int = Query(31, ge=1, le=42)
+):
+    """Per-day available, booked and released slot counts for a date range"""
+    return get_therapist_calendar(user_id, start_date, days)
+
 @router.get("/therapist/today-sessions/{user_id}")
 def get_sessions_today(user_id: str):
     """Get therapist's sessions for today"""
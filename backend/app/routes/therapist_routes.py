@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from typing import Optional
-from ..models.schemas import TherapistApplicationRequest, TherapistApplicationResponse, TherapistProfileResponse, UpdateTherapistProfileRequest
+from ..models.schemas import (
+    TherapistApplicationRequest,
+    TherapistApplicationResponse,
+    TherapistProfileResponse,
+    TherapistSearchResponse,
+    UpdateTherapistProfileRequest,
+)
 from ..services.therapist_service import (
+    THERAPIST_SEARCH_PAGE_SIZE,
+    MAX_THERAPIST_SEARCH_PAGE_SIZE,
+    search_therapists,
     submit_therapist_application,
     get_therapist_profile,
     get_all_verified_therapists,
     get_pending_therapists,
     update_therapist_verification_status,
-    get_therapist_dashboard_data,
     update_therapist_profile
 )
 from ..models.database import db
@@ -53,6 +61,32 @@ def get_verified_therapists(search: Optional[str] = None):
     """Get all verified therapists with optional search"""
     return get_all_verified_therapists(search_text=search)
 
+@router.get("/therapist/search", response_model=TherapistSearchResponse)
+def search_verified_therapists(
+    q: Optional[str] = Query(None, description="Words or word prefixes of name / specializations"),
+    specialization: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = Query(None, ge=1, le=5),
+    limit: int = Query(THERAPIST_SEARCH_PAGE_SIZE, ge=1, le=MAX_THERAPIST_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    near_lat: Optional[float] = Query(None, description="With near_lng: nearest therapists first"),
+    near_lng: Optional[float] = None,
+    max_distance_km: Optional[float] = None,
+):
+    """
+    Search verified therapists ranked by relevance, then rating
+    With near_lat / near_lng, in-person therapists sorted by distance; pass next_cursor back for the next page
+    """
+    try:
+        return search_therapists(
+            q, specialization, language, min_price, max_price, min_rating, limit, cursor,
+            near_lat, near_lng, max_distance_km
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/therapist/verify/{user_id}")
 def verify_therapist(
     user_id: str, 
@@ -64,9 +98,3 @@ def verify_therapist(
     if body and "rejection_reason" in body:
         rejection_reason = body["rejection_reason"]
     return update_therapist_verification_status(user_id, status, rejection_reason)
-
-@router.get("/therapist/dashboard/{user_id}")
-def get_dashboard(user_id: str):
-    """Get therapist dashboard data"""
-    return get_therapist_dashboard_data(user_id)
-
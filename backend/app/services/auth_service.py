@@ -9,6 +9,7 @@ from ..config.timezone import now_my
 from .password_service import hash_password, verify_password
 from .mood_service import check_today_log
 from .activity_service import ActivityService
+from .notification_service import create_default_notification_settings
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +65,7 @@ def create_user(payload: SignupRequest) -> SignupResponse:
         logger.info(f"Inserted user document: {user_id}")
         db.user_profile.insert_one(profile_doc)
         logger.info(f"Inserted profile document: {user_id}")
+        create_default_notification_settings(user_id)
     except DuplicateKeyError:
         logger.warning(f"Signup failed: email {payload.email} already exists (DuplicateKeyError)")
         # Clean up if user was inserted but profile failed (unlikely for email dup, but good practice)
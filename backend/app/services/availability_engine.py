@@ -0,0 +1,521 @@
+"""
+Availability Engine
+Computes a therapist's bookable slots over a date range from one availability
+query and one sessions query, using merged busy intervals and binary search
+"""
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import logging
+import threading
+import time as time_module
+
+from ..config.settings import CALENDAR_CACHE_TTL_SECONDS
+from ..config.timezone import MALAYSIA_TZ_NAME, get_malaysia_tz, now_my
+from ..models.booking_schemas import AvailableTimeSlot, SessionStatus
+from ..models.database import db
+from . import day_grid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_MINUTES = 50
+# Sessions starting this long before the range can still overlap its first slots
+MAX_SESSION_MINUTES = 24 * 60
+NEXT_AVAILABLE_HORIZON_DAYS = 60
+# Materialized next_available is recomputed at least this often (weekly templates roll forward)
+NEXT_AVAILABLE_MAX_AGE = timedelta(hours=6)
+NEXT_AVAILABLE_SWEEP_BATCH = 200
+CALENDAR_MAX_DAYS = 42
+CALENDAR_CACHE_SIZE = 1024
+
+Interval = Tuple[datetime, datetime]
+
+_TIME_FORMATS = ("%I:%M %p", "%I:%M%p", "%H:%M")
+
+
+def _parse_time_label(label: str) -> Optional[time]:
+    """Parse '2:00 PM', '2:00PM' or '14:00'"""
+    cleaned = label.strip().upper()
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def to_local(value: datetime) -> datetime:
+    """Convert a stored datetime (pymongo returns naive UTC) to Malaysia time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(get_malaysia_tz())
+
+
+def _is_released(session: Dict) -> bool:
+    status_text = (session.get("session_status") or session.get("status") or "").strip().lower()
+    is_cancelled = status_text == SessionStatus.cancelled.value or "cancel" in status_text
+    return is_cancelled and session.get("slot_released") is True
+
+
+class BusyIndex:
+    """Disjoint, sorted busy intervals answering overlap queries in O(log n)"""
+
+    def __init__(self, windows: List[Interval]):
+        merged: List[List[datetime]] = []
+        for start, end in sorted(windows):
+            if merged and start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [interval[0] for interval in merged]
+        self.ends = [interval[1] for interval in merged]
+        self._day_masks: Dict[date, Tuple[int, int]] = {}
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        # First merged interval ending after `start`; ends are sorted because intervals are disjoint
+        index = bisect_right(self.ends, start)
+        return index < len(self.starts) and self.starts[index] < end
+
+    def day_masks(self, day: date) -> Tuple[int, int]:
+        """(touched, fully covered) 15-minute cells of a day, see day_grid"""
+        masks = self._day_masks.get(day)
+        if masks is None:
+            day_start = datetime.combine(day, time.min, tzinfo=get_malaysia_tz())
+            day_end = day_start + timedelta(days=1)
+            intervals = []
+            for index in range(bisect_right(self.ends, day_start), len(self.starts)):
+                if self.starts[index] >= day_end:
+                    break
+                intervals.append((self.starts[index], self.ends[index]))
+            masks = day_grid.day_busy_masks(intervals, day_start)
+            self._day_masks[day] = masks
+        return masks
+
+
+def load_busy_indexes(therapist_user_ids: List[str], range_start: datetime, range_end: datetime) -> Dict[str, BusyIndex]:
+    """Single query for every session that can overlap [range_start, range_end), per therapist"""
+    sessions = db.therapy_sessions.find(
+        {
+            "therapist_user_id": {"$in": therapist_user_ids},
+            "scheduled_at": {
+                "$gte": range_start - timedelta(minutes=MAX_SESSION_MINUTES),
+                "$lt": range_end,
+            },
+        },
+        {"therapist_user_id": 1, "scheduled_at": 1, "duration_minutes": 1,
+         "session_status": 1, "status": 1, "slot_released": 1},
+    )
+    windows: Dict[str, List[Interval]] = {user_id: [] for user_id in therapist_user_ids}
+    for session in sessions:
+        if _is_released(session):
+            continue
+        start = to_local(session["scheduled_at"])
+        duration = int(session.get("duration_minutes") or DEFAULT_SESSION_MINUTES)
+        windows.setdefault(session["therapist_user_id"], []).append((start, start + timedelta(minutes=duration)))
+    return {user_id: BusyIndex(user_windows) for user_id, user_windows in windows.items()}
+
+
+def load_busy_index(therapist_user_id: str, range_start: datetime, range_end: datetime) -> BusyIndex:
+    return load_busy_indexes([therapist_user_id], range_start, range_end)[therapist_user_id]
+
+
+def load_availability_many(therapist_user_ids: List[str], start_date: date,
+                           end_date: date) -> Dict[str, Tuple[Dict[str, List[Dict]], Dict[str, List[Dict]]]]:
+    """Single query for date-specific slots in range plus the recurring weekly templates.
+
+    Returns, per therapist, (specific slots by 'YYYY-MM-DD', recurring slots by weekday name).
+    """
+    docs = db.therapist_availability.find({
+        "user_id": {"$in": therapist_user_ids},
+        "$or": [
+            {"availability_date": {"$gte": start_date.isoformat(), "$lte": end_date.isoformat()}},
+            {"availability_date": None},
+        ],
+    })
+    result: Dict[str, Tuple[Dict[str, List[Dict]], Dict[str, List[Dict]]]] = {
+        user_id: ({}, {}) for user_id in therapist_user_ids
+    }
+    for doc in docs:
+        specific, recurring = result.setdefault(doc["user_id"], ({}, {}))
+        if doc.get("availability_date"):
+            specific.setdefault(doc["availability_date"], []).append(doc)
+        elif doc.get("day_of_week"):
+            recurring.setdefault(doc["day_of_week"].lower(), []).append(doc)
+    return result
+
+
+def load_availability(therapist_user_id: str, start_date: date, end_date: date) -> Tuple[Dict[str, List[Dict]], Dict[str, List[Dict]]]:
+    return load_availability_many([therapist_user_id], start_date, end_date)[therapist_user_id]
+
+
+def slot_minutes(slot: Dict) -> Optional[Tuple[int, int]]:
+    """Start/end minutes of an availability document, preferring the stored grid fields"""
+    start_minute, end_minute = slot.get("start_minute"), slot.get("end_minute")
+    if isinstance(start_minute, int) and isinstance(end_minute, int):
+        return start_minute, end_minute
+    start_label, end_label = slot.get("start_time"), slot.get("end_time")
+    if not start_label or not end_label:
+        return None
+    start_time, end_time = _parse_time_label(start_label), _parse_time_label(end_label)
+    if start_time is None or end_time is None:
+        return None
+    return day_grid.minutes_of(start_time), day_grid.end_minutes_of(end_time)
+
+
+def _slot_mask(slot: Dict) -> int:
+    stored = slot.get("cell_mask")
+    if isinstance(stored, str):
+        return day_grid.from_hex(stored)
+    minutes = slot_minutes(slot)
+    return day_grid.span_mask(*minutes) if minutes else 0
+
+
+def _day_slots(day: date, templates: List[Dict], busy: BusyIndex) -> List[Tuple[datetime, AvailableTimeSlot]]:
+    day_start = datetime.combine(day, time.min, tzinfo=get_malaysia_tz())
+    date_str = day.isoformat()
+    busy_touched, _ = busy.day_masks(day)
+    entries: List[Tuple[datetime, AvailableTimeSlot]] = []
+    for slot in templates:
+        minutes = slot_minutes(slot)
+        if minutes is None or minutes[1] <= minutes[0]:
+            continue
+        slot_start = day_start + timedelta(minutes=minutes[0])
+        slot_end = day_start + timedelta(minutes=minutes[1])
+
+        if not day_grid.span_mask(*minutes) & busy_touched:
+            is_booked = False
+        elif day_grid.is_aligned(*minutes):
+            # The slot owns every cell it touches, so any busy cell is a real overlap
+            is_booked = True
+        else:
+            is_booked = busy.overlaps(slot_start, slot_end)
+
+        entries.append((
+            slot_start,
+            AvailableTimeSlot(
+                slot_id=slot.get("availability_id") or str(slot.get("_id")),
+                start_time=slot_start.strftime("%I:%M %p"),
+                end_time=slot_end.strftime("%I:%M %p"),
+                is_available=slot.get("is_available", True) and not is_booked,
+                date=date_str,
+            ),
+        ))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def templates_for(day: date, specific: Dict[str, List[Dict]], recurring: Dict[str, List[Dict]]) -> List[Dict]:
+    # Date-specific availability replaces the weekly template for that date
+    return specific.get(day.isoformat()) or recurring.get(day.strftime("%A").lower(), [])
+
+
+def get_slots_for_range(therapist_user_id: str, start_date: date, days: int) -> Dict[str, List[AvailableTimeSlot]]:
+    """Slots per date for `days` consecutive days starting at start_date"""
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    end_date = start_date + timedelta(days=days - 1)
+    tz = get_malaysia_tz()
+    specific, recurring = load_availability(therapist_user_id, start_date, end_date)
+    busy = load_busy_index(
+        therapist_user_id,
+        datetime.combine(start_date, time.min, tzinfo=tz),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+    result: Dict[str, List[AvailableTimeSlot]] = {}
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        templates = templates_for(day, specific, recurring)
+        result[day.isoformat()] = [slot for _, slot in _day_slots(day, templates, busy)]
+    return result
+
+
+def find_next_available(therapist_user_id: str, after: Optional[datetime] = None,
+                        horizon_days: int = NEXT_AVAILABLE_HORIZON_DAYS) -> Optional[Tuple[datetime, AvailableTimeSlot]]:
+    """Earliest free slot starting after `after` (default now) within the horizon"""
+    after = after.astimezone(get_malaysia_tz()) if after else now_my()
+    start_date = after.date()
+    end_date = start_date + timedelta(days=horizon_days - 1)
+    tz = get_malaysia_tz()
+    specific, recurring = load_availability(therapist_user_id, start_date, end_date)
+    if not specific and not recurring:
+        return None
+    busy = load_busy_index(
+        therapist_user_id,
+        datetime.combine(start_date, time.min, tzinfo=tz),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+    for offset in range(horizon_days):
+        day = start_date + timedelta(days=offset)
+        templates = templates_for(day, specific, recurring)
+        for slot_start, slot in _day_slots(day, templates, busy):
+            if slot_start > after and slot.is_available:
+                return slot_start, slot
+    return None
+
+
+def search_free_slots(therapist_user_ids: List[str], start_date: date, days: int,
+                      window_start: Optional[time] = None, window_end: Optional[time] = None,
+                      after: Optional[datetime] = None) -> Dict[str, List[Tuple[datetime, AvailableTimeSlot]]]:
+    """Free slots inside a time-of-day window for many therapists, earliest first.
+
+    Uses one availability query and one sessions query for the whole set.
+    """
+    if not therapist_user_ids:
+        return {}
+    after = after or now_my()
+    end_date = start_date + timedelta(days=days - 1)
+    tz = get_malaysia_tz()
+    availability = load_availability_many(therapist_user_ids, start_date, end_date)
+    busy_indexes = load_busy_indexes(
+        therapist_user_ids,
+        datetime.combine(start_date, time.min, tzinfo=tz),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+    window = day_grid.window_mask(window_start, window_end)
+    result: Dict[str, List[Tuple[datetime, AvailableTimeSlot]]] = {}
+    for user_id in therapist_user_ids:
+        specific, recurring = availability[user_id]
+        if not specific and not recurring:
+            continue
+        busy = busy_indexes[user_id]
+        free: List[Tuple[datetime, AvailableTimeSlot]] = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            templates = templates_for(day, specific, recurring)
+            # Bitmap prefilter: a free slot inside the window touches at least one cell that is
+            # offered, inside the window and not fully covered by a session
+            offered = 0
+            for template in templates:
+                offered |= _slot_mask(template)
+            if not offered & window & ~busy.day_masks(day)[1]:
+                continue
+            for slot_start, slot in _day_slots(day, templates, busy):
+                if not slot.is_available or slot_start <= after:
+                    continue
+                if window_start and slot_start.time() < window_start:
+                    continue
+                if window_end and (day_grid.end_minutes_of(_parse_time_label(slot.end_time))
+                                   > day_grid.end_minutes_of(window_end)):
+                    continue
+                free.append((slot_start, slot))
+        if free:
+            result[user_id] = free
+    return result
+
+
+def parse_time_of_day(label: str) -> time:
+    parsed = _parse_time_label(label)
+    if parsed is None:
+        raise ValueError(f"Invalid time: '{label}'. Use 'HH:MM' or 'HH:MM AM/PM'")
+    return parsed
+
+
+# ---- Per-therapist read caches ----
+
+class TherapistCache:
+    """Per-process TTL cache keyed by tuples whose first item is a therapist user_id.
+
+    Every instance is dropped for a therapist by invalidate_therapist_caches,
+    which on_calendar_changed calls on each booking or availability change.
+    """
+
+    _instances: List["TherapistCache"] = []
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        TherapistCache._instances.append(self)
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time_module.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value):
+        with self._lock:
+            self._entries[key] = (time_module.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, therapist_user_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == therapist_user_id]:
+                del self._entries[key]
+
+
+def invalidate_therapist_caches(therapist_user_id: str):
+    for cache in TherapistCache._instances:
+        cache.invalidate(therapist_user_id)
+
+
+# ---- Calendar projection (per-day slot counts) ----
+
+_calendar_cache = TherapistCache(CALENDAR_CACHE_TTL_SECONDS, CALENDAR_CACHE_SIZE)
+
+
+def _sessions_by_day(therapist_user_id: str, range_start: datetime, range_end: datetime) -> Dict[str, List[Dict]]:
+    """One aggregation grouping the range's sessions by Malaysia calendar day"""
+    local_start = {"date": "$scheduled_at", "timezone": MALAYSIA_TZ_NAME}
+    rows = db.therapy_sessions.aggregate([
+        {"$match": {
+            "therapist_user_id": therapist_user_id,
+            "scheduled_at": {"$gte": range_start, "$lt": range_end},
+        }},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", **local_start}},
+            "sessions": {"$push": {
+                "start_minute": {"$add": [{"$multiply": [{"$hour": local_start}, 60]}, {"$minute": local_start}]},
+                "duration_minutes": "$duration_minutes",
+                "session_status": "$session_status",
+                "status": "$status",
+                "slot_released": "$slot_released",
+            }},
+        }},
+    ])
+    return {row["_id"]: row["sessions"] for row in rows}
+
+
+def get_calendar_counts(therapist_user_id: str, start_date: date, days: int) -> Dict[str, Dict[str, int]]:
+    """Per-day counts of available, booked and released (cancelled, slot freed) slots.
+
+    A slot is booked when an active session overlaps it; released counts the
+    cancelled sessions whose slot was handed back that day.
+    """
+    if not 1 <= days <= CALENDAR_MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {CALENDAR_MAX_DAYS}")
+    cache_key = (therapist_user_id, start_date, days)
+    cached = _calendar_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    end_date = start_date + timedelta(days=days - 1)
+    tz = get_malaysia_tz()
+    sessions_by_day = _sessions_by_day(
+        therapist_user_id,
+        datetime.combine(start_date, time.min, tzinfo=tz),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+    )
+    specific, recurring = load_availability(therapist_user_id, start_date, end_date)
+
+    counts: Dict[str, Dict[str, int]] = {}
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        date_str = day.isoformat()
+        busy: List[Tuple[int, int]] = []
+        released = 0
+        for session in sessions_by_day.get(date_str, []):
+            if _is_released(session):
+                released += 1
+                continue
+            duration = int(session.get("duration_minutes") or DEFAULT_SESSION_MINUTES)
+            busy.append((session["start_minute"], session["start_minute"] + duration))
+
+        available = booked = 0
+        for slot in templates_for(day, specific, recurring):
+            minutes = slot_minutes(slot)
+            if minutes is None or minutes[1] <= minutes[0]:
+                continue
+            if any(start < minutes[1] and minutes[0] < end for start, end in busy):
+                booked += 1
+            elif slot.get("is_available", True):
+                available += 1
+        counts[date_str] = {"available": available, "booked": booked, "released": released}
+
+    _calendar_cache.put(cache_key, counts)
+    return counts
+
+
+# ---- Materialized next available slot (therapist_profile.next_available) ----
+
+def refresh_next_available(therapist_user_id: str) -> Optional[Dict]:
+    """Recompute and store the therapist's next free slot"""
+    now = now_my()
+    found = find_next_available(therapist_user_id, now)
+    next_available = None
+    if found:
+        slot_start, slot = found
+        day_start = datetime.combine(slot_start.date(), time.min, tzinfo=slot_start.tzinfo)
+        slot_end = day_start + timedelta(minutes=day_grid.end_minutes_of(_parse_time_label(slot.end_time)))
+        next_available = {
+            "start_at": slot_start,
+            "end_at": slot_end,
+            "date": slot.date,
+            "start_time": slot.start_time,
+            "end_time": slot.end_time,
+            "slot_id": slot.slot_id,
+        }
+    db.therapist_profile.update_one(
+        {"user_id": therapist_user_id},
+        {"$set": {"next_available": next_available, "next_available_computed_at": now}}
+    )
+    return next_available
+
+
+def is_next_available_fresh(profile: Dict, now: datetime) -> bool:
+    computed_at = profile.get("next_available_computed_at")
+    if not isinstance(computed_at, datetime) or to_local(computed_at) < now - NEXT_AVAILABLE_MAX_AGE:
+        return False
+    next_available = profile.get("next_available")
+    return next_available is None or to_local(next_available["start_at"]) > now
+
+
+def on_calendar_changed(therapist_user_id: str, changed_start: Optional[datetime] = None):
+    """Keep next_available current after a booking or availability change.
+
+    A change at changed_start only matters if it is at or before the stored
+    next slot; pass None when the whole template changed.
+    """
+    invalidate_therapist_caches(therapist_user_id)
+    try:
+        if changed_start is not None:
+            profile = db.therapist_profile.find_one(
+                {"user_id": therapist_user_id},
+                {"next_available": 1, "next_available_computed_at": 1}
+            )
+            if profile and is_next_available_fresh(profile, now_my()):
+                current = profile.get("next_available")
+                if current is not None and to_local(changed_start) > to_local(current["start_at"]):
+                    return
+        refresh_next_available(therapist_user_id)
+    except Exception as e:
+        # Readers fall back to recomputing when the stored value is stale
+        logger.error(f"Failed to refresh next available slot for {therapist_user_id}: {e}")
+
+
+def sweep_next_available() -> int:
+    """Recompute next_available for therapists whose stored slot has passed or aged out"""
+    now = now_my()
+    stale = db.therapist_profile.find(
+        {
+            "verification_status": "approved",
+            "$or": [
+                {"next_available_computed_at": {"$exists": False}},
+                {"next_available_computed_at": {"$lt": now - NEXT_AVAILABLE_MAX_AGE}},
+                {"next_available.start_at": {"$lte": now}},
+            ],
+        },
+        {"user_id": 1}
+    ).limit(NEXT_AVAILABLE_SWEEP_BATCH)
+
+    refreshed = 0
+    for profile in stale:
+        refresh_next_available(profile["user_id"])
+        refreshed += 1
+    if refreshed:
+        logger.info(f"Refreshed next available slot for {refreshed} therapists")
+    return refreshed
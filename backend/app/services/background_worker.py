@@ -0,0 +1,171 @@
+"""
+Background Worker
+Runs the notification scheduler and periodic maintenance jobs on the elected leader only
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config.settings import WORKER_LEASE_TTL_SECONDS
+from app.services.leader_election import LeaderLease, LeaseLostError, set_fence
+from app.services.metrics import metrics
+from app.services.notification_background import notification_task
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE_NAME = "scheduler"
+# How often the job loop looks for due maintenance jobs
+JOB_TICK_SECONDS = 1
+
+
+def _check_stuck_bottles():
+    from app.services.drift_bottle_service import DriftBottleService
+    return DriftBottleService.check_stuck_bottles()
+
+
+def _expire_old_bottles():
+    from app.services.drift_bottle_service import DriftBottleService
+    return DriftBottleService.expire_old_bottles()
+
+
+def _cleanup_expired_otps():
+    from app.services.otp_service import cleanup_expired_otps
+    return cleanup_expired_otps()
+
+
+def _cleanup_tts_audio():
+    from app.services.tts_service import tts_service
+    return tts_service.cleanup_old_files()
+
+
+def _archive_old_notifications():
+    from app.services.notification_service import archive_old_notifications
+    return archive_old_notifications()
+
+
+def _deliver_push_notifications():
+    from app.services.push_service import process_push_queue
+    return process_push_queue()
+
+
+def _sweep_next_available():
+    from app.services.availability_engine import sweep_next_available
+    return sweep_next_available()
+
+
+# (name, job, interval in seconds)
+MAINTENANCE_JOBS: List[Tuple[str, Callable[[], object], int]] = [
+    ("deliver_push_notifications", _deliver_push_notifications, 5),
+    ("check_stuck_bottles", _check_stuck_bottles, 15 * 60),
+    ("expire_old_bottles", _expire_old_bottles, 60 * 60),
+    ("cleanup_expired_otps", _cleanup_expired_otps, 60 * 60),
+    ("cleanup_tts_audio", _cleanup_tts_audio, 60 * 60),
+    ("sweep_next_available", _sweep_next_available, 5 * 60),
+    ("archive_old_notifications", _archive_old_notifications, 6 * 60 * 60),
+]
+
+
+class BackgroundWorker:
+    """Holds the scheduler lease and runs leader-only work while it is held
+
+    Renewal runs in its own task on a fixed ttl/3 interval, independent of how
+    long jobs take. Losing the lease cancels the job loop and the notification
+    scheduler; work already running in a thread stops at its next check_fence().
+    """
+
+    def __init__(self, lease: Optional[LeaderLease] = None):
+        self.lease = lease or LeaderLease(SCHEDULER_LEASE_NAME, ttl_seconds=WORKER_LEASE_TTL_SECONDS)
+        self.task = None
+        self.jobs_task = None
+        self.running = False
+        self._next_run: Dict[str, float] = {}
+
+    async def _run_job(self, name: str, job: Callable[[], object]):
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(job)
+            metrics.increment("worker_job_runs_total", job=name)
+            metrics.set_gauge("worker_job_last_success_timestamp", time.time(), job=name)
+        except LeaseLostError as e:
+            logger.warning(f"Maintenance job {name} stopped: {e}")
+            metrics.increment("worker_job_fenced_total", job=name)
+        except Exception as e:
+            logger.error(f"Maintenance job {name} failed: {e}")
+            metrics.increment("worker_job_failures_total", job=name)
+        finally:
+            metrics.observe("worker_job_duration_seconds", time.perf_counter() - started, job=name)
+
+    async def _run_due_jobs(self):
+        for name, job, interval in MAINTENANCE_JOBS:
+            if not self.lease.is_held():
+                return
+            current = time.monotonic()
+            if self._next_run.get(name, 0) <= current:
+                self._next_run[name] = current + interval
+                await self._run_job(name, job)
+
+    async def _run_jobs(self):
+        while self.running and self.lease.is_held():
+            await self._run_due_jobs()
+            await asyncio.sleep(JOB_TICK_SECONDS)
+        # The lease ran out between renewals (e.g. a renewal is hanging)
+        if notification_task.running:
+            await notification_task.stop()
+
+    async def _become_leader(self):
+        if not notification_task.running:
+            await notification_task.start()
+        if self.jobs_task is None or self.jobs_task.done():
+            self.jobs_task = asyncio.create_task(self._run_jobs())
+
+    async def _step_down(self):
+        if self.jobs_task and not self.jobs_task.done():
+            self.jobs_task.cancel()
+            try:
+                await self.jobs_task
+            except asyncio.CancelledError:
+                pass
+        self.jobs_task = None
+        if notification_task.running:
+            await notification_task.stop()
+        # Run every job promptly if leadership comes back
+        self._next_run.clear()
+
+    async def _run(self):
+        # Renew well before expiry so a slow round trip does not drop the lease
+        renew_interval = max(1, self.lease.ttl_seconds / 3)
+        while self.running:
+            is_leader = await asyncio.to_thread(self.lease.try_acquire, metrics.snapshot())
+            if is_leader:
+                await self._become_leader()
+            else:
+                await self._step_down()
+            await asyncio.sleep(renew_interval)
+
+    async def start(self):
+        """Start competing for the scheduler lease"""
+        if not self.running:
+            self.running = True
+            set_fence(self.lease)
+            self.task = asyncio.create_task(self._run())
+            logger.info(f"Background worker started as {self.lease.owner_id}")
+
+    async def stop(self):
+        """Stop leader-only work and hand the lease back"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self._step_down()
+        if self.lease.is_leader:
+            await asyncio.to_thread(self.lease.release)
+        set_fence(None)
+        logger.info("Background worker stopped")
+
+
+# Global instance
+background_worker = BackgroundWorker()
@@ -1,14 +1,21 @@
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from typing import Optional
+import base64
+import json
 import logging
+import re
 import secrets
 
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
 from ..models.database import db
 from ..models.booking_schemas import (
     TherapistAvailabilityResponse,
     AvailableTimeSlot,
     BookingRequest,
     BookingResponse,
+    BookingListResponse,
     UpcomingSessionResponse,
     CancelBookingRequest,
     CancelBookingResponse,
@@ -22,14 +29,39 @@ from ..models.booking_schemas import (
     SubmitSessionRatingResponse,
     ReleaseSessionSlotRequest,
     ReleaseSessionSlotResponse,
+    TherapistAvailabilityRangeResponse,
+    DailyAvailability,
+    NextAvailableSlotResponse,
+    TherapistSlotSearchResult,
+    TherapistSlotSearchResponse,
 )
-from ..config.timezone import now_my, make_aware_malaysia
+from ..config.timezone import now_my, make_aware_malaysia, to_storage_datetime
 from ..models.chat_schemas import SendChatMessageRequest
 from ..services.chat_service import send_message
 from ..services.notification_service import create_notification
+from ..services.notification_background import notify_schedule_changed
+from ..services import availability_engine, day_grid, therapist_service
 
 logger = logging.getLogger(__name__)
 
+MAX_AVAILABILITY_RANGE_DAYS = 31
+MAX_SEARCH_PAGE_SIZE = 50
+SLOTS_PER_SEARCH_RESULT = 5
+BOOKING_PAGE_SIZE = 50
+MAX_BOOKING_PAGE_SIZE = 100
+
+# Fields read by _session_to_booking_response
+_BOOKING_LIST_PROJECTION = {
+    "session_id": 1, "user_id": 1, "therapist_user_id": 1, "therapist_name": 1, "client_name": 1,
+    "scheduled_at": 1, "start_time": 1, "end_time": 1, "duration_minutes": 1, "session_fee": 1,
+    "price": 1, "session_status": 1, "status": 1, "session_type": 1, "created_at": 1,
+    "center_name": 1, "center_address": 1, "user_rating": 1, "user_feedback": 1,
+}
+
+
+class SlotConflictError(ValueError):
+    """Raised when another client already holds the requested slot."""
+
 
 def _coerce_session_status(value: Optional[str]) -> SessionStatus:
     """Return a valid session status, defaulting when value is unknown."""
@@ -53,223 +85,176 @@ def _coerce_session_type(value: Optional[str]) -> SessionType:
         return SessionType.in_person
 
 
-def _combine_date_with_time(date_value: datetime, time_str: str) -> datetime:
-    """Return a datetime by combining a date with a 'HH:MM AM/PM' label."""
-    
-    time_str_clean = time_str.strip().upper()
-    
-    # Try different time formats
-    formats_to_try = [
-        "%I:%M %p",      # 2:00 PM
-        "%I:%M%p",       # 2:00PM (no space)
-        "%H:%M",         # 14:00 (24-hour)
-    ]
-    
-    dt_time = None
-    for fmt in formats_to_try:
-        try:
-            dt_time = datetime.strptime(time_str_clean, fmt)
-            break
-        except ValueError:
-            continue
-    
-    if dt_time is None:
-        raise ValueError(f"Unable to parse time string: '{time_str}'. Expected format like '2:00 PM' or '14:00'")
-    
-    return date_value.replace(hour=dt_time.hour, minute=dt_time.minute, second=0, microsecond=0)
-
-
 def get_therapist_availability_for_booking(therapist_user_id: str, date_str: str) -> TherapistAvailabilityResponse:
     """
     Get therapist's available time slots for a specific date
     Returns slots based on therapist's set availability minus already booked slots
     """
-    print(f"\n=== AVAILABILITY SERVICE DEBUG ===")
-    print(f"Therapist ID: {therapist_user_id}")
-    print(f"Date requested: {date_str}")
-    
-    # Get therapist profile
     therapist = db.therapist_profile.find_one({"user_id": therapist_user_id})
-    print(f"Therapist found: {therapist is not None}")
-    if therapist:
-        print(f"Therapist name: {therapist.get('first_name', '')} {therapist.get('last_name', '')}")
     if not therapist:
-        print("ERROR: Therapist not found")
         raise ValueError("Therapist not found")
-    
-    # Parse date
+
     try:
-        target_date = datetime.strptime(date_str, "%Y-%m-%d")
-        target_date = make_aware_malaysia(target_date)
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
         raise ValueError("Invalid date format. Use YYYY-MM-DD")
-    
-    # Get day of week (lowercase)
-    day_of_week = target_date.strftime("%A").lower()
-    print(f"Day of week: {day_of_week}")
-    
-    # Attempt to find date-specific availability first, then fall back to recurring weekly slots
-    print(f"Querying for date-specific slots: user_id={therapist_user_id}, availability_date={date_str}")
-    specific_slots = list(db.therapist_availability.find({
-        "user_id": therapist_user_id,
-        "availability_date": date_str
-    }))
-    print(f"Found {len(specific_slots)} date-specific slots")
-    for slot in specific_slots:
-        print(f"  - {slot.get('start_time')} to {slot.get('end_time')}, available: {slot.get('is_available')}")
-    
-    if specific_slots:
-        availability_slots = specific_slots
-    else:
-        print(f"No date-specific slots, checking recurring for day: {day_of_week}")
-        availability_slots = list(db.therapist_availability.find({
-            "user_id": therapist_user_id,
-            "day_of_week": day_of_week,
-            "availability_date": None
-        }))
-        print(f"Found {len(availability_slots)} recurring slots")
-        for slot in availability_slots:
-            print(f"  - {slot.get('start_time')} to {slot.get('end_time')}, available: {slot.get('is_available')}")
-    
-    if not availability_slots:
-        print(f"No availability found, returning empty response")
-        return TherapistAvailabilityResponse(
-            therapist_id=therapist_user_id,
-            therapist_name=f"{therapist.get('first_name', '')} {therapist.get('last_name', '')}".strip(),
-            date=date_str,
-            available_slots=[],
-            price=float(therapist.get('hourly_rate', 150.0)),
-            center_name=therapist.get('office_name', 'Holistic Mind Center')
-        )
-    
-    # Get existing bookings for this date
-    start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    # Find all sessions for this date (scheduled or cancelled without slot_released)
-    # We'll filter out released cancelled slots later
-    existing_sessions = list(db.therapy_sessions.find({
-        "therapist_user_id": therapist_user_id,
-        "scheduled_at": {
-            "$gte": start_of_day,
-            "$lte": end_of_day
-        }
-    }))
-    
-    session_windows: list[tuple[datetime, datetime]] = []
-    for session in existing_sessions:
-        scheduled_value = session.get("scheduled_at")
-        scheduled_dt: Optional[datetime] = None
-        if isinstance(scheduled_value, datetime):
-            scheduled_dt = scheduled_value
-            # MongoDB stores UTC timezone-naive datetimes - convert to Malaysia time
-            if scheduled_dt.tzinfo is None:
-                # Treat as UTC and convert to Malaysia time (+8 hours)
-                scheduled_dt = scheduled_dt + timedelta(hours=8)
-                scheduled_dt = make_aware_malaysia(scheduled_dt)
-            else:
-                # Already has timezone - ensure it's Malaysia time
-                if scheduled_dt.tzinfo.utcoffset(scheduled_dt) != timedelta(hours=8):
-                    utc_dt = scheduled_dt.astimezone(None).replace(tzinfo=None)
-                    my_dt = utc_dt + timedelta(hours=8)
-                    scheduled_dt = make_aware_malaysia(my_dt)
-        elif isinstance(scheduled_value, str):
-            try:
-                scheduled_dt = datetime.fromisoformat(scheduled_value.replace("Z", "+00:00"))
-                # Convert to Malaysia time
-                if scheduled_dt.tzinfo is not None:
-                    utc_dt = scheduled_dt.astimezone(None).replace(tzinfo=None)
-                    my_dt = utc_dt + timedelta(hours=8)
-                    scheduled_dt = make_aware_malaysia(my_dt)
-                else:
-                    # Assume UTC if no timezone
-                    my_dt = scheduled_dt + timedelta(hours=8)
-                    scheduled_dt = make_aware_malaysia(my_dt)
-            except ValueError:
-                scheduled_dt = None
-
-        if scheduled_dt is None:
-            start_label = session.get("start_time")
-            if start_label:
-                try:
-                    scheduled_dt = _combine_date_with_time(target_date, start_label)
-                    # Ensure timezone-aware
-                    if scheduled_dt.tzinfo is None:
-                        scheduled_dt = make_aware_malaysia(scheduled_dt)
-                except ValueError:
-                    continue
-        if scheduled_dt is None:
-            continue
-
-        status_value = session.get("session_status") or session.get("status")
-        status_text = (status_value or "").strip().lower()
-        is_cancelled = status_text == SessionStatus.cancelled.value or "cancel" in status_text
-        if is_cancelled and session.get("slot_released") is True:
-            continue
-
-        duration = int(session.get("duration_minutes", 50))
-        end_dt = scheduled_dt + timedelta(minutes=duration)
-        session_windows.append((scheduled_dt, end_dt))
-
-    slot_entries: list[tuple[datetime, AvailableTimeSlot]] = []
-
-    for slot in availability_slots:
-        start_time_label = slot.get("start_time")
-        end_time_label = slot.get("end_time")
-        if not start_time_label or not end_time_label:
-            continue
-
-        try:
-            slot_start_dt = _combine_date_with_time(target_date, start_time_label)
-            slot_end_dt = _combine_date_with_time(target_date, end_time_label)
-            # Ensure timezone-aware (target_date should already be aware, but make sure)
-            if slot_start_dt.tzinfo is None:
-                slot_start_dt = make_aware_malaysia(slot_start_dt)
-            if slot_end_dt.tzinfo is None:
-                slot_end_dt = make_aware_malaysia(slot_end_dt)
-        except ValueError:
-            continue
-
-        if slot_end_dt <= slot_start_dt:
-            continue
-
-        slot_id = slot.get("availability_id") or str(slot.get("_id"))
-
-        is_booked = any(
-            not (slot_end_dt <= window_start or slot_start_dt >= window_end)
-            for window_start, window_end in session_windows
-        )
 
-        is_available_flag = slot.get("is_available", True) and not is_booked
-
-        slot_entries.append((
-            slot_start_dt,
-            AvailableTimeSlot(
-                slot_id=slot_id,
-                start_time=slot_start_dt.strftime("%I:%M %p"),
-                end_time=slot_end_dt.strftime("%I:%M %p"),
-                is_available=is_available_flag,
-                date=date_str
-            )
-        ))
+    slots = availability_engine.get_slots_for_range(therapist_user_id, target_date, 1)
 
-    available_slots = [entry[1] for entry in sorted(slot_entries, key=lambda entry: entry[0])]
-    print(f"\n=== FINAL RESULT ===")
-    print(f"Returning {len(available_slots)} total slots")
-    for slot in available_slots:
-        print(f"  - {slot.start_time} to {slot.end_time}, available: {slot.is_available}")
-    print(f"=================================\n")
-    
     return TherapistAvailabilityResponse(
         therapist_id=therapist_user_id,
         therapist_name=f"{therapist.get('first_name', '')} {therapist.get('last_name', '')}".strip(),
         date=date_str,
-        available_slots=available_slots,
+        available_slots=slots[date_str],
         price=float(therapist.get('hourly_rate', 150.0)),
         center_name=therapist.get('office_name', 'Holistic Mind Center')
     )
 
 
+def get_therapist_availability_for_range(therapist_user_id: str, start_date_str: str, days: int) -> TherapistAvailabilityRangeResponse:
+    """Get a therapist's slots for several consecutive days in one pass"""
+    therapist = db.therapist_profile.find_one({"user_id": therapist_user_id})
+    if not therapist:
+        raise ValueError("Therapist not found")
+    if not 1 <= days <= MAX_AVAILABILITY_RANGE_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_AVAILABILITY_RANGE_DAYS}")
+
+    try:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+    slots = availability_engine.get_slots_for_range(therapist_user_id, start_date, days)
+
+    return TherapistAvailabilityRangeResponse(
+        therapist_id=therapist_user_id,
+        therapist_name=f"{therapist.get('first_name', '')} {therapist.get('last_name', '')}".strip(),
+        days=[DailyAvailability(date=day, available_slots=day_slots) for day, day_slots in slots.items()],
+        price=float(therapist.get('hourly_rate', 150.0)),
+        center_name=therapist.get('office_name', 'Holistic Mind Center')
+    )
+
+
+def get_next_available_slot(therapist_user_id: str) -> NextAvailableSlotResponse:
+    """Get the earliest bookable slot for a therapist"""
+    if not db.therapist_profile.find_one({"user_id": therapist_user_id}, {"_id": 1}):
+        raise ValueError("Therapist not found")
+
+    found = availability_engine.find_next_available(therapist_user_id)
+    return NextAvailableSlotResponse(
+        therapist_id=therapist_user_id,
+        slot=found[1] if found else None
+    )
+
+
+def _encode_search_cursor(earliest_iso: str, therapist_id: str) -> str:
+    raw = json.dumps({"t": earliest_iso, "id": therapist_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_search_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid search cursor") from exc
+
+
+def search_available_therapists(
+    start_date_str: str,
+    days: int = 1,
+    from_time: Optional[str] = None,
+    to_time: Optional[str] = None,
+    specialization: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> TherapistSlotSearchResponse:
+    """
+    Find approved therapists with a free slot in a date range and time-of-day window
+    Results are ranked by earliest matching slot
+    """
+    try:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    if not 1 <= days <= MAX_AVAILABILITY_RANGE_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_AVAILABILITY_RANGE_DAYS}")
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    window_start = availability_engine.parse_time_of_day(from_time) if from_time else None
+    window_end = availability_engine.parse_time_of_day(to_time) if to_time else None
+    # A to_time of 12:00 AM means the end of the day
+    if window_start and window_end and day_grid.end_minutes_of(window_end) <= day_grid.minutes_of(window_start):
+        raise ValueError("to_time must be after from_time")
+    after_key = _decode_search_cursor(cursor) if cursor else None
+
+    range_end = datetime.combine(start_date + timedelta(days=days), time.min, tzinfo=now_my().tzinfo)
+    query: dict = {
+        "verification_status": "approved",
+        # The materialized next slot already rules out therapists with nothing free before range_end
+        "next_available.start_at": {"$not": {"$gte": range_end}},
+    }
+    if specialization:
+        query["specializations"] = {"$regex": f"^{re.escape(specialization.strip())}$", "$options": "i"}
+    if language:
+        query["languages_spoken"] = {"$regex": f"^{re.escape(language.strip())}$", "$options": "i"}
+    if min_price is not None or max_price is not None:
+        price_filter: dict = {}
+        if min_price is not None:
+            price_filter["$gte"] = min_price
+        if max_price is not None:
+            price_filter["$lte"] = max_price
+        query["hourly_rate"] = price_filter
+
+    therapists = {
+        therapist["user_id"]: therapist
+        for therapist in db.therapist_profile.find(query, {
+            "_id": 0, "user_id": 1, "first_name": 1, "last_name": 1, "specializations": 1,
+            "languages_spoken": 1, "hourly_rate": 1, "office_name": 1,
+        })
+    }
+
+    free_slots = availability_engine.search_free_slots(
+        list(therapists), start_date, days, window_start, window_end
+    )
+
+    ranked = sorted(
+        ((slots[0][0], therapist_id) for therapist_id, slots in free_slots.items()),
+    )
+    if after_key:
+        ranked = [entry for entry in ranked if entry > after_key]
+    page = ranked[:limit]
+    has_more = len(ranked) > limit
+
+    results = []
+    for earliest, therapist_id in page:
+        therapist = therapists[therapist_id]
+        results.append(TherapistSlotSearchResult(
+            therapist_id=therapist_id,
+            therapist_name=f"{therapist.get('first_name', '')} {therapist.get('last_name', '')}".strip(),
+            specializations=therapist.get("specializations") or [],
+            languages_spoken=therapist.get("languages_spoken") or [],
+            price=float(therapist.get("hourly_rate", 150.0)),
+            center_name=therapist.get("office_name", "Holistic Mind Center"),
+            earliest_start_iso=earliest.isoformat(),
+            slots=[slot for _, slot in free_slots[therapist_id][:SLOTS_PER_SEARCH_RESULT]],
+        ))
+
+    next_cursor = None
+    if has_more and page:
+        next_cursor = _encode_search_cursor(page[-1][0].isoformat(), page[-1][1])
+
+    return TherapistSlotSearchResponse(results=results, next_cursor=next_cursor, has_more=has_more)
+
+
+def _booking_label(scheduled_at: datetime) -> str:
+    """Human-readable session time (Malaysia) used in booking chat messages and notifications"""
+    return availability_engine.to_local(scheduled_at).strftime("%A, %d %B %Y at %I:%M %p")
+
+
 def create_booking(request: BookingRequest) -> BookingResponse:
     """
     Create a new booking for a therapy session
@@ -345,19 +330,6 @@ def create_booking(request: BookingRequest) -> BookingResponse:
     if not availability or not availability.get("is_available", True):
         raise ValueError("This time slot is not available")
     
-    # Check if already booked
-    existing_session = db.therapy_sessions.find_one({
-        "therapist_user_id": request.therapist_user_id,
-        "scheduled_at": scheduled_datetime,
-        "$or": [
-            {"session_status": {"$in": [SessionStatus.scheduled.value]}},
-            {"status": {"$in": [SessionStatus.scheduled.value]}}
-        ]
-    })
-    
-    if existing_session:
-        raise ValueError("This time slot is already booked")
-    
     # Calculate end time
     end_datetime = scheduled_datetime + timedelta(minutes=request.duration_minutes)
     end_time_str = end_datetime.strftime("%I:%M %p")
@@ -396,7 +368,8 @@ def create_booking(request: BookingRequest) -> BookingResponse:
         "client_name": client_name,
         "therapist_user_id": request.therapist_user_id,
         "therapist_name": therapist_name,
-        "scheduled_at": scheduled_datetime,
+        # Stored as a UTC BSON date; see app.migrations.session_datetimes
+        "scheduled_at": to_storage_datetime(scheduled_datetime),
         "start_time": normalized_start_time,
         "end_time": end_time_str,
         "duration_minutes": request.duration_minutes,
@@ -413,9 +386,23 @@ def create_booking(request: BookingRequest) -> BookingResponse:
         "center_address": center_address,
     }
 
-    db.therapy_sessions.insert_one(session_doc)
-
-    booking_label = scheduled_datetime.strftime("%A, %d %B %Y at %I:%M %p")
+    # The unique_active_slot index arbitrates concurrent requests for the same slot
+    try:
+        db.therapy_sessions.insert_one(session_doc)
+    except DuplicateKeyError:
+        existing = db.therapy_sessions.find_one({
+            "therapist_user_id": request.therapist_user_id,
+            "scheduled_at": scheduled_datetime,
+            "session_status": SessionStatus.scheduled.value,
+        })
+        if existing and existing.get("user_id") == request.client_user_id:
+            # A retried request from the same client gets its original booking back
+            replay = _session_to_booking_response(existing, message="Booking confirmed successfully!")
+            replay.booking_id = existing["session_id"]
+            return replay
+        raise SlotConflictError("This time slot is already booked")
+
+    booking_label = _booking_label(scheduled_datetime)
     duration_label = f"{request.duration_minutes} minutes"
     message_lines = [
         "Booking confirmed ✅",
@@ -447,95 +434,9 @@ def create_booking(request: BookingRequest) -> BookingResponse:
         data={"session_id": session_id}
     )
 
-    # Schedule reminders for client (1 hour and 10 minutes before session)
-    client_notification_settings = db.notification_settings.find_one({"user_id": request.client_user_id})
-    if client_notification_settings and client_notification_settings.get('therapy_sessions', True):
-        current_time = now_my()
-        
-        # 1-hour reminder for client
-        reminder_1h = scheduled_datetime - timedelta(hours=1)
-        if reminder_1h > current_time:
-            db.scheduled_notifications.insert_one({
-                "notification_id": secrets.token_hex(32),
-                "user_id": request.client_user_id,
-                "notification_type": "therapy_session_reminder",
-                "scheduled_time": reminder_1h,
-                "is_sent": False,
-                "notification_data": {
-                    "session_id": session_id,
-                    "title": "📅 Therapy Session Reminder",
-                    "body": f"Your therapy session with {therapist_name} is starting in 1 hour at {normalized_start_time}.",
-                    "data": {"session_id": session_id, "action": "open_booking"}
-                },
-                "created_at": now_ts
-            })
-            logger.info(f"Scheduled 1-hour reminder for client {request.client_user_id} at {reminder_1h}")
-        
-        # 10-minute reminder for client
-        reminder_10m = scheduled_datetime - timedelta(minutes=10)
-        if reminder_10m > current_time:
-            db.scheduled_notifications.insert_one({
-                "notification_id": secrets.token_hex(32),
-                "user_id": request.client_user_id,
-                "notification_type": "therapy_session_reminder",
-                "scheduled_time": reminder_10m,
-                "is_sent": False,
-                "notification_data": {
-                    "session_id": session_id,
-                    "title": "📅 Therapy Session Starting Soon",
-                    "body": f"Your therapy session with {therapist_name} is starting in 10 minutes at {normalized_start_time}.",
-                    "data": {"session_id": session_id, "action": "open_booking"}
-                },
-                "created_at": now_ts
-            })
-            logger.info(f"Scheduled 10-minute reminder for client {request.client_user_id} at {reminder_10m}")
-    
-    # Schedule reminders for therapist (1 hour and 10 minutes before session)
-    therapist_notification_settings = db.notification_settings.find_one({"user_id": request.therapist_user_id})
-    if therapist_notification_settings and therapist_notification_settings.get('therapy_sessions', True):
-        current_time = now_my()
-        
-        # Get client name for therapist notification
-        client_profile = db.user_profiles.find_one({"user_id": request.client_user_id})
-        client_name_for_therapist = client_profile.get('name', 'A client') if client_profile else 'A client'
-        
-        # 1-hour reminder for therapist
-        reminder_1h = scheduled_datetime - timedelta(hours=1)
-        if reminder_1h > current_time:
-            db.scheduled_notifications.insert_one({
-                "notification_id": secrets.token_hex(32),
-                "user_id": request.therapist_user_id,
-                "notification_type": "therapy_session_reminder",
-                "scheduled_time": reminder_1h,
-                "is_sent": False,
-                "notification_data": {
-                    "session_id": session_id,
-                    "title": "📅 Therapy Session Reminder",
-                    "body": f"Your therapy session with {client_name_for_therapist} is starting in 1 hour at {normalized_start_time}.",
-                    "data": {"session_id": session_id, "action": "open_dashboard"}
-                },
-                "created_at": now_ts
-            })
-            logger.info(f"Scheduled 1-hour reminder for therapist {request.therapist_user_id} at {reminder_1h}")
-        
-        # 10-minute reminder for therapist
-        reminder_10m = scheduled_datetime - timedelta(minutes=10)
-        if reminder_10m > current_time:
-            db.scheduled_notifications.insert_one({
-                "notification_id": secrets.token_hex(32),
-                "user_id": request.therapist_user_id,
-                "notification_type": "therapy_session_reminder",
-                "scheduled_time": reminder_10m,
-                "is_sent": False,
-                "notification_data": {
-                    "session_id": session_id,
-                    "title": "📅 Therapy Session Starting Soon",
-                    "body": f"Your therapy session with {client_name_for_therapist} is starting in 10 minutes at {normalized_start_time}.",
-                    "data": {"session_id": session_id, "action": "open_dashboard"}
-                },
-                "created_at": now_ts
-            })
-            logger.info(f"Scheduled 10-minute reminder for therapist {request.therapist_user_id} at {reminder_10m}")
+    # Reminders are derived from the session itself by the notification scheduler
+    notify_schedule_changed()
+    availability_engine.on_calendar_changed(request.therapist_user_id, scheduled_datetime)
 
     return BookingResponse(
         booking_id=session_id,
@@ -559,90 +460,166 @@ def create_booking(request: BookingRequest) -> BookingResponse:
     )
 
 
-def get_client_bookings(client_user_id: str) -> list[BookingResponse]:
-    """Get all therapy sessions booked by a client."""
+def _session_to_booking_response(session: dict, message: str = "") -> BookingResponse:
+    # pymongo reads dates back as naive UTC; responses carry Malaysia time like create_booking's
+    scheduled_at = session.get("scheduled_at")
+    if isinstance(scheduled_at, datetime):
+        scheduled_at = availability_engine.to_local(scheduled_at)
+    created_at = session.get("created_at")
+    if isinstance(created_at, datetime):
+        created_at = availability_engine.to_local(created_at)
+    session_fee = float(session.get("session_fee", session.get("price", 0.0)))
+    status_enum = _coerce_session_status(session.get("session_status") or session.get("status"))
+    type_enum = _coerce_session_type(session.get("session_type"))
 
-    sessions = list(
-        db.therapy_sessions
-        .find({"user_id": client_user_id})
-        .sort("scheduled_at", -1)
-    )
+    # Create base response
+    response_dict = {
+        "booking_id": str(session.get("_id")),
+        "session_id": session.get("session_id", ""),
+        "client_user_id": session.get("user_id", ""),
+        "therapist_user_id": session.get("therapist_user_id", ""),
+        "therapist_name": session.get("therapist_name", "Unknown Therapist"),
+        "scheduled_at": scheduled_at.isoformat() if scheduled_at else "",
+        "start_time": session.get("start_time", ""),
+        "end_time": session.get("end_time", ""),
+        "duration_minutes": int(session.get("duration_minutes", 50)),
+        "price": session_fee,
+        "session_fee": session_fee,
+        "status": status_enum.value,
+        "session_status": status_enum,
+        "session_type": type_enum,
+        "created_at": created_at.isoformat() if created_at else "",
+        "message": message,
+        "center_name": session.get("center_name"),
+        "center_address": session.get("center_address"),
+        "user_rating": session.get("user_rating"),
+        "user_feedback": session.get("user_feedback"),
+    }
+
+    return BookingResponse(**response_dict)
 
-    result: list[BookingResponse] = []
-    for session in sessions:
-        scheduled_at = session.get("scheduled_at")
-        created_at = session.get("created_at")
-        session_fee = float(session.get("session_fee", session.get("price", 0.0)))
-        status_enum = _coerce_session_status(session.get("session_status") or session.get("status"))
-        type_enum = _coerce_session_type(session.get("session_type"))
-
-        # Create base response
-        response_dict = {
-            "booking_id": str(session.get("_id")),
-            "session_id": session.get("session_id", ""),
-            "client_user_id": session.get("user_id", ""),
-            "therapist_user_id": session.get("therapist_user_id", ""),
-            "therapist_name": session.get("therapist_name", "Unknown Therapist"),
-            "scheduled_at": scheduled_at.isoformat() if scheduled_at else "",
-            "start_time": session.get("start_time", ""),
-            "end_time": session.get("end_time", ""),
-            "duration_minutes": int(session.get("duration_minutes", 50)),
-            "price": session_fee,
-            "session_fee": session_fee,
-            "status": status_enum.value,
-            "session_status": status_enum,
-            "session_type": type_enum,
-            "created_at": created_at.isoformat() if created_at else "",
-            "message": "",
-            "center_name": session.get("center_name"),
-            "center_address": session.get("center_address"),
-            "user_rating": session.get("user_rating"),
-            "user_feedback": session.get("user_feedback"),
-        }
 
-        result.append(BookingResponse(**response_dict))
+def _encode_booking_cursor(scheduled_at: datetime, session_id: str) -> str:
+    raw = json.dumps({"t": scheduled_at.isoformat(), "id": session_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
-    return result
+
+def _decode_booking_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid booking cursor") from exc
 
 
-def get_therapist_bookings(therapist_user_id: str) -> list[BookingResponse]:
-    """Get all bookings for a therapist"""
+def _parse_filter_date(value: Optional[str], field: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return make_aware_malaysia(datetime.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        raise ValueError(f"Invalid {field}. Use YYYY-MM-DD")
+
+
+def _list_bookings(
+    owner_field: str,
+    owner_id: str,
+    statuses: Optional[list[SessionStatus]],
+    from_date: Optional[str],
+    to_date: Optional[str],
+    newest_first: bool,
+    limit: int,
+    cursor: Optional[str],
+) -> BookingListResponse:
+    """One keyset page of sessions keyed on (scheduled_at, session_id), plus per-status totals"""
+    limit = max(1, min(limit, MAX_BOOKING_PAGE_SIZE))
+    query: dict = {owner_field: owner_id}
+    if statuses:
+        # Served by the (owner, session_status, scheduled_at) indexes
+        query["session_status"] = {"$in": [status.value for status in statuses]}
+    range_start = _parse_filter_date(from_date, "from_date")
+    range_end = _parse_filter_date(to_date, "to_date")
+    if range_start or range_end:
+        query["scheduled_at"] = {}
+        if range_start:
+            query["scheduled_at"]["$gte"] = range_start
+        if range_end:
+            # to_date is inclusive
+            query["scheduled_at"]["$lt"] = range_end + timedelta(days=1)
+
+    # Totals ignore the cursor so they stay stable across pages
+    status_counts = {
+        row["_id"] or "unknown": row["count"]
+        for row in db.therapy_sessions.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$session_status", "count": {"$sum": 1}}},
+        ])
+    }
+
+    page_query = query
+    if cursor:
+        after_time, after_id = _decode_booking_cursor(cursor)
+        op = "$lt" if newest_first else "$gt"
+        page_query = {"$and": [query, {"$or": [
+            {"scheduled_at": {op: after_time}},
+            {"scheduled_at": after_time, "session_id": {op: after_id}},
+        ]}]}
+
+    direction = -1 if newest_first else 1
     sessions = list(
         db.therapy_sessions
-        .find({"therapist_user_id": therapist_user_id})
-        .sort("scheduled_at", -1)
+        .find(page_query, _BOOKING_LIST_PROJECTION)
+        .sort([("scheduled_at", direction), ("session_id", direction)])
+        .limit(limit + 1)
+    )
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = _encode_booking_cursor(
+            availability_engine.to_local(sessions[-1]["scheduled_at"]), sessions[-1]["session_id"]
+        )
+
+    bookings = [_session_to_booking_response(session) for session in sessions]
+    if owner_field == "therapist_user_id":
+        # Therapists see the client's name in this field
+        for booking, session in zip(bookings, sessions):
+            booking.therapist_name = session.get("client_name", "Unknown Client")
+
+    return BookingListResponse(
+        bookings=bookings,
+        total=sum(status_counts.values()),
+        status_counts=status_counts,
+        next_cursor=next_cursor,
+        has_more=has_more,
     )
 
-    result: list[BookingResponse] = []
-    for session in sessions:
-        scheduled_at = session.get("scheduled_at")
-        created_at = session.get("created_at")
-        session_fee = float(session.get("session_fee", session.get("price", 0.0)))
-        status_enum = _coerce_session_status(session.get("session_status") or session.get("status"))
-        type_enum = _coerce_session_type(session.get("session_type"))
-
-        result.append(BookingResponse(
-            booking_id=str(session.get("_id")),
-            session_id=session.get("session_id", ""),
-            client_user_id=session.get("user_id", ""),
-            therapist_user_id=session.get("therapist_user_id", ""),
-            therapist_name=session.get("client_name", "Unknown Client"),
-            scheduled_at=scheduled_at.isoformat() if scheduled_at else "",
-            start_time=session.get("start_time", ""),
-            end_time=session.get("end_time", ""),
-            duration_minutes=int(session.get("duration_minutes", 50)),
-            price=session_fee,
-            session_fee=session_fee,
-            status=status_enum.value,
-            session_status=status_enum,
-            session_type=type_enum,
-            created_at=created_at.isoformat() if created_at else "",
-            message="",
-            center_name=session.get("center_name"),
-            center_address=session.get("center_address"),
-        ))
 
-    return result
+def get_client_bookings(
+    client_user_id: str,
+    statuses: Optional[list[SessionStatus]] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    newest_first: bool = True,
+    limit: int = BOOKING_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> BookingListResponse:
+    """Get one page of therapy sessions booked by a client."""
+    return _list_bookings("user_id", client_user_id, statuses, from_date, to_date, newest_first, limit, cursor)
+
+
+def get_therapist_bookings(
+    therapist_user_id: str,
+    statuses: Optional[list[SessionStatus]] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    newest_first: bool = True,
+    limit: int = BOOKING_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> BookingListResponse:
+    """Get one page of bookings for a therapist"""
+    return _list_bookings("therapist_user_id", therapist_user_id, statuses, from_date, to_date, newest_first, limit, cursor)
 
 
 def get_upcoming_client_session(client_user_id: str) -> Optional[UpcomingSessionResponse]:
@@ -661,19 +638,6 @@ def get_upcoming_client_session(client_user_id: str) -> Optional[UpcomingSession
     if not session:
         return None
 
-    scheduled_at_value = session.get("scheduled_at")
-    if isinstance(scheduled_at_value, datetime):
-        scheduled_dt = scheduled_at_value
-    elif isinstance(scheduled_at_value, str):
-        try:
-            scheduled_dt = datetime.fromisoformat(
-                scheduled_at_value.replace("Z", "+00:00")
-            )
-        except ValueError:
-            scheduled_dt = now_utc
-    else:
-        scheduled_dt = now_utc
-
     status_enum = _coerce_session_status(session.get("session_status") or session.get("status"))
     type_enum = _coerce_session_type(session.get("session_type"))
     session_fee = float(session.get("session_fee", session.get("price", 0.0)))
@@ -697,7 +661,7 @@ def get_upcoming_client_session(client_user_id: str) -> Optional[UpcomingSession
         session_id=session.get("session_id", ""),
         therapist_user_id=session.get("therapist_user_id", ""),
         therapist_name=session.get("therapist_name", "Unknown Therapist"),
-        scheduled_at=scheduled_dt,
+        scheduled_at=availability_engine.to_local(session["scheduled_at"]),
         start_time=session.get("start_time", ""),
         end_time=session.get("end_time", ""),
         duration_minutes=int(session.get("duration_minutes", 50)),
@@ -775,6 +739,8 @@ def update_session_status(request: UpdateSessionStatusRequest) -> UpdateSessionS
         {"session_id": request.session_id, "therapist_user_id": request.therapist_user_id},
         update_spec,
     )
+    # Completed and no-show sessions leave the cached dashboard
+    availability_engine.invalidate_therapist_caches(request.therapist_user_id)
 
     return UpdateSessionStatusResponse(
         success=True,
@@ -811,15 +777,6 @@ def get_pending_rating(client_user_id: str) -> PendingRatingResponse:
     if not session:
         return PendingRatingResponse(has_pending=False, session=None)
 
-    scheduled_value = session.get("scheduled_at")
-    if isinstance(scheduled_value, datetime):
-        scheduled_dt = scheduled_value
-    else:
-        try:
-            scheduled_dt = datetime.fromisoformat(str(scheduled_value))
-        except Exception:
-            scheduled_dt = now_my()
-
     therapist_profile = db.therapist_profile.find_one(
         {"user_id": session.get("therapist_user_id")},
         {"profile_picture_url": 1},
@@ -829,7 +786,7 @@ def get_pending_rating(client_user_id: str) -> PendingRatingResponse:
         session_id=session.get("session_id", ""),
         therapist_user_id=session.get("therapist_user_id", ""),
         therapist_name=session.get("therapist_name", "Therapist"),
-        scheduled_at=scheduled_dt,
+        scheduled_at=availability_engine.to_local(session["scheduled_at"]),
         end_time=session.get("end_time", ""),
         duration_minutes=int(session.get("duration_minutes", 50)),
         session_type=_coerce_session_type(session.get("session_type")),
@@ -870,10 +827,40 @@ def submit_session_rating(request: SubmitSessionRatingRequest) -> SubmitSessionR
         "$unset": {"rating_prompted_at": ""},
     }
 
-    db.therapy_sessions.update_one(
+    # The pre-update document tells us whether this replaces an earlier rating
+    previous = db.therapy_sessions.find_one_and_update(
         {"session_id": request.session_id, "user_id": request.client_user_id},
         update_spec,
+        projection={"user_rating": 1, "therapist_user_id": 1},
+        return_document=ReturnDocument.BEFORE,
     )
+    if previous:
+        new_rating = round(rating_value, 1)
+        old_rating = previous.get("user_rating")
+        if isinstance(old_rating, (int, float)) and not isinstance(old_rating, bool):
+            rating_inc = {"rating_sum": new_rating - float(old_rating)}
+        else:
+            rating_inc = {"rating_sum": new_rating, "rating_count": 1}
+        therapist_user_id = previous.get("therapist_user_id")
+        counters = db.therapist_profile.find_one_and_update(
+            {"user_id": therapist_user_id},
+            {"$inc": rating_inc},
+            projection={"rating_sum": 1, "rating_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if counters:
+            # Only applies while the counters are still the ones averaged, so a concurrent
+            # rating cannot leave an older average behind
+            db.therapist_profile.update_one(
+                {
+                    "user_id": therapist_user_id,
+                    "rating_sum": counters.get("rating_sum"),
+                    "rating_count": counters.get("rating_count"),
+                },
+                {"$set": {"rating_average": therapist_service.rating_average(
+                    counters.get("rating_sum") or 0, counters.get("rating_count") or 0
+                )}},
+            )
 
     return SubmitSessionRatingResponse(
         success=True,
@@ -913,38 +900,9 @@ def cancel_client_booking(request: CancelBookingRequest) -> CancelBookingRespons
             }
         }
     )
-    
-    # Format scheduled date/time - convert from UTC to Malaysia time
-    scheduled_at = session.get('scheduled_at')
-    formatted_datetime = str(scheduled_at)
-    
-    if isinstance(scheduled_at, str):
-        try:
-            scheduled_dt = datetime.fromisoformat(scheduled_at.replace('Z', '+00:00'))
-            # Convert to Malaysia time if it has timezone info
-            if scheduled_dt.tzinfo is not None:
-                utc_dt = scheduled_dt.astimezone(None).replace(tzinfo=None)
-                my_dt = utc_dt + timedelta(hours=8)
-                formatted_datetime = my_dt.strftime('%B %d, %Y at %I:%M %p')
-            else:
-                # Assume UTC and convert to Malaysia time
-                my_dt = scheduled_dt + timedelta(hours=8)
-                formatted_datetime = my_dt.strftime('%B %d, %Y at %I:%M %p')
-        except:
-            pass
-    elif isinstance(scheduled_at, datetime):
-        # MongoDB stores UTC timezone-naive datetimes - convert to Malaysia time
-        if scheduled_at.tzinfo is None:
-            # Treat as UTC and convert to Malaysia time (+8 hours)
-            my_dt = scheduled_at + timedelta(hours=8)
-            formatted_datetime = my_dt.strftime('%B %d, %Y at %I:%M %p')
-        else:
-            # Has timezone - convert to Malaysia time
-            utc_dt = scheduled_at.astimezone(None).replace(tzinfo=None)
-            my_dt = utc_dt + timedelta(hours=8)
-            formatted_datetime = my_dt.strftime('%B %d, %Y at %I:%M %p')
-    
-    booking_label = formatted_datetime
+    availability_engine.on_calendar_changed(session["therapist_user_id"], session["scheduled_at"])
+
+    booking_label = _booking_label(session["scheduled_at"])
     duration_minutes = session.get('duration_minutes', 60)
     duration_label = f"{duration_minutes} mins"
     
@@ -1003,7 +961,7 @@ def cancel_client_booking(request: CancelBookingRequest) -> CancelBookingRespons
             user_id=client_user_id,
             type="booking_update",
             title="Booking Cancelled",
-            body=f"{therapist_name} cancelled the booking on {formatted_datetime}.",
+            body=f"{therapist_name} cancelled the booking on {booking_label}.",
             data={"session_id": request.session_id}
         )
     else:
@@ -1012,18 +970,10 @@ def cancel_client_booking(request: CancelBookingRequest) -> CancelBookingRespons
             user_id=therapist_user_id,
             type="booking_update",
             title="Booking Cancelled",
-            body=f"{client_name} cancelled the booking on {formatted_datetime}.",
+            body=f"{client_name} cancelled the booking on {booking_label}.",
             data={"session_id": request.session_id}
         )
 
-    # Delete scheduled reminder notification for this session
-    db.scheduled_notifications.delete_many({
-        "user_id": request.client_user_id,
-        "notification_type": "therapy_session_reminder",
-        "notification_data.session_id": request.session_id,
-        "is_sent": False
-    })
-    logger.info(f"Deleted scheduled reminder for cancelled session {request.session_id}")
 
     return CancelBookingResponse(
         success=True,
@@ -1063,6 +1013,7 @@ def release_cancelled_session_slot(request: ReleaseSessionSlotRequest) -> Releas
             }
         }
     )
+    availability_engine.on_calendar_changed(request.therapist_user_id, session["scheduled_at"])
 
     return ReleaseSessionSlotResponse(
         success=True,
@@ -0,0 +1,210 @@
+"""
+Calendar Feed Service
+Signed per-user ICS feeds of therapy sessions with cheap conditional GETs
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config.settings import CALENDAR_FEED_SECRET
+from app.config.timezone import now_my
+from app.models.database import db
+from app.services.availability_engine import DEFAULT_SESSION_MINUTES
+from app.services.password_service import verify_password
+
+logger = logging.getLogger(__name__)
+
+# Past sessions older than this drop out of the feed
+FEED_HISTORY_DAYS = 90
+# Calendar apps are told how often to poll
+FEED_REFRESH_INTERVAL = "PT1H"
+
+# Document in app_secrets holding the generated key when CALENDAR_FEED_SECRET is not set
+FEED_SECRET_ID = "calendar_feed"
+
+_secret: Optional[bytes] = None
+
+
+def _feed_secret() -> bytes:
+    """Signing key shared by every process
+
+    CALENDAR_FEED_SECRET wins when set; otherwise a key is generated once and
+    persisted in MongoDB, so all workers sign alike and URLs survive restarts.
+    """
+    global _secret
+    if _secret is None:
+        if CALENDAR_FEED_SECRET:
+            _secret = CALENDAR_FEED_SECRET.encode("utf-8")
+        else:
+            try:
+                doc = db.app_secrets.find_one_and_update(
+                    {"_id": FEED_SECRET_ID},
+                    {"$setOnInsert": {"value": secrets.token_hex(32), "created_at": now_my()}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                # Another process inserted it first
+                doc = db.app_secrets.find_one({"_id": FEED_SECRET_ID})
+            _secret = doc["value"].encode("utf-8")
+    return _secret
+
+
+# ---- Signed URLs ----
+
+def feed_token(user_id: str) -> str:
+    digest = hmac.new(_feed_secret(), f"ics:{user_id}".encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+
+def verify_feed_token(user_id: str, token: str) -> bool:
+    return hmac.compare_digest(feed_token(user_id), token or "")
+
+
+def authorize_feed_owner(user_id: str, password: str):
+    """Only the account holder may mint their feed URL; the URL alone grants read access after that"""
+    user = db.users.find_one({"user_id": user_id}, {"password": 1, "is_active": 1})
+    if not user or not verify_password(password, user.get("password", "")):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=403, detail="User inactive")
+
+
+# ---- Versioning for ETag / Last-Modified ----
+
+def _owner_query(user_id: str, window_start: datetime) -> dict:
+    return {
+        "$or": [{"user_id": user_id}, {"therapist_user_id": user_id}],
+        "scheduled_at": {"$gte": window_start},
+    }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo returns naive UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def feed_version(user_id: str) -> Tuple[str, Optional[datetime]]:
+    """(ETag, Last-Modified) of a user's feed from the latest session change.
+
+    Two indexed find_one calls; the window start is part of the ETag because
+    sessions age out of the feed daily even when nothing changes.
+    """
+    latest: Optional[datetime] = None
+    for owner_field in ("user_id", "therapist_user_id"):
+        session = db.therapy_sessions.find_one(
+            {owner_field: user_id},
+            {"updated_at": 1},
+            sort=[("updated_at", -1)]
+        )
+        if session and isinstance(session.get("updated_at"), datetime):
+            updated_at = _as_utc(session["updated_at"]).replace(microsecond=0)
+            latest = updated_at if latest is None or updated_at > latest else latest
+
+    window_day = (now_my() - timedelta(days=FEED_HISTORY_DAYS)).date().isoformat()
+    fingerprint = f"{user_id}:{latest.isoformat() if latest else '-'}:{window_day}"
+    etag = '"' + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest() + '"'
+    return etag, latest
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime],
+                    if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Evaluate conditional GET headers; If-None-Match wins over If-Modified-Since"""
+    if if_none_match:
+        candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
+
+
+# ---- ICS rendering ----
+
+def _escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Fold content lines at 75 octets as RFC 5545 requires"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # never split a multi-byte character
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_time(value: datetime) -> str:
+    return _as_utc(value).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _session_event(session: dict, user_id: str) -> str:
+    start = session["scheduled_at"]
+    end = _as_utc(start) + timedelta(minutes=int(session.get("duration_minutes") or DEFAULT_SESSION_MINUTES))
+    if session.get("therapist_user_id") == user_id:
+        summary = f"Therapy session with {session.get('client_name') or 'a client'}"
+    else:
+        summary = f"Therapy session with {session.get('therapist_name') or 'your therapist'}"
+    location = ", ".join(part for part in (session.get("center_name"), session.get("center_address")) if part)
+    status_text = (session.get("session_status") or session.get("status") or "").lower()
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{session['session_id']}@pawse",
+        f"DTSTAMP:{_ics_time(session.get('updated_at') or start)}",
+        f"DTSTART:{_ics_time(start)}",
+        f"DTEND:{_ics_time(end)}",
+        f"SUMMARY:{_escape(summary)}",
+        f"STATUS:{'CANCELLED' if 'cancel' in status_text else 'CONFIRMED'}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def iter_feed(user_id: str) -> Iterator[str]:
+    """Yield the ICS document a chunk at a time while the cursor streams"""
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Pawse//Therapy Sessions//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:Pawse sessions",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{FEED_REFRESH_INTERVAL}",
+        f"X-PUBLISHED-TTL:{FEED_REFRESH_INTERVAL}",
+    ))
+    window_start = now_my() - timedelta(days=FEED_HISTORY_DAYS)
+    cursor = db.therapy_sessions.find(
+        _owner_query(user_id, window_start),
+        {"_id": 0, "session_id": 1, "user_id": 1, "therapist_user_id": 1, "therapist_name": 1,
+         "client_name": 1, "scheduled_at": 1, "duration_minutes": 1, "session_status": 1,
+         "status": 1, "center_name": 1, "center_address": 1, "updated_at": 1}
+    ).sort("scheduled_at", 1)
+    for session in cursor:
+        if isinstance(session.get("scheduled_at"), datetime) and session.get("session_id"):
+            yield _session_event(session, user_id)
+    yield "END:VCALENDAR\r\n"
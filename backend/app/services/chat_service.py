@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import json
 import secrets
 from datetime import datetime
 from typing import Iterable, Optional
@@ -8,6 +11,7 @@ from ..config.timezone import now_my
 from ..models.chat_schemas import (
     ChatConversationResponse,
     ChatMessageResponse,
+    ChatMessageSyncResponse,
     MarkConversationReadRequest,
     ParticipantRole,
     SendChatMessageRequest,
@@ -156,6 +160,7 @@ def get_or_create_conversation(client_user_id: str, therapist_user_id: str) -> d
         "therapist_user_id": therapist_user_id,
         "created_at": now_ts,
         "updated_at": now_ts,
+        "changed_at": now_ts,
         "last_message": None,
         "last_message_at": None,
         "unread_for_client": 0,
@@ -182,6 +187,61 @@ def get_conversation_summary(conversation_id: str, role: ParticipantRole) -> Cha
     return _conversation_projection(conversation, role)
 
 
+def get_conversations_etag(user_id: str, role: ParticipantRole) -> str:
+    """Return a weak ETag for a user's conversation list.
+
+    ``changed_at`` is bumped on every message and read-state change, so the
+    newest value is enough to tell whether anything in the list moved. The
+    lookup is a single read on the ``(participant, changed_at)`` index.
+    """
+
+    field = "client_user_id" if role == "client" else "therapist_user_id"
+    latest = db.chat_conversations.find_one(
+        {field: user_id},
+        {"_id": 0, "changed_at": 1, "updated_at": 1},
+        sort=[("changed_at", -1)],
+    )
+    marker = "empty"
+    if latest:
+        changed = latest.get("changed_at") or latest.get("updated_at")
+        marker = changed.isoformat() if isinstance(changed, datetime) else str(changed)
+    digest = hashlib.sha1(f"{role}:{user_id}:{marker}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _message_projection(message: dict) -> ChatMessageResponse:
+    return ChatMessageResponse(
+        message_id=message["message_id"],
+        conversation_id=message["conversation_id"],
+        sender_id=message["sender_id"],
+        sender_role=message.get("sender_role", "client"),
+        content=message.get("content", ""),
+        created_at=message.get("created_at", now_my()),
+        is_read=bool(message.get("is_read", False)),
+    )
+
+
+def _encode_sync_cursor(created_at: Optional[datetime], message_id: Optional[str], read_since: datetime) -> str:
+    payload = {
+        "t": created_at.isoformat() if created_at else None,
+        "id": message_id,
+        "r": read_since.isoformat(),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_sync_cursor(cursor: str) -> tuple[Optional[datetime], Optional[str], datetime]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+        read_since = datetime.fromisoformat(payload["r"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid sync cursor") from exc
+    return created_at, payload.get("id"), read_since
+
+
 def fetch_messages(conversation_id: str, *, limit: int = 50, before: Optional[datetime] = None) -> list[ChatMessageResponse]:
     query: dict[str, object] = {"conversation_id": conversation_id}
     if before is not None:
@@ -195,18 +255,82 @@ def fetch_messages(conversation_id: str, *, limit: int = 50, before: Optional[da
     )
     messages = list(cursor)
     messages.reverse()
-    return [
-        ChatMessageResponse(
-            message_id=message["message_id"],
-            conversation_id=message["conversation_id"],
-            sender_id=message["sender_id"],
-            sender_role=message.get("sender_role", "client"),
-            content=message.get("content", ""),
-            created_at=message.get("created_at", now_my()),
-            is_read=bool(message.get("is_read", False)),
+    return [_message_projection(message) for message in messages]
+
+
+def sync_messages(conversation_id: str, *, since: Optional[str] = None, limit: int = 50) -> ChatMessageSyncResponse:
+    """Return messages created after ``since`` plus read-state changes.
+
+    Without a cursor this behaves like the first page of ``fetch_messages``.
+    With one, only messages ordered after ``(created_at, message_id)`` are
+    returned, together with the ids of older messages that were marked read
+    since the previous sync, so idle polls return an empty delta.
+    """
+
+    read_watermark = now_my()
+
+    if since is None:
+        messages = list(
+            db.therapist_chat_messages
+            .find({"conversation_id": conversation_id})
+            .sort([("created_at", -1), ("message_id", -1)])
+            .limit(limit)
+        )
+        messages.reverse()
+        last = messages[-1] if messages else None
+        return ChatMessageSyncResponse(
+            messages=[_message_projection(message) for message in messages],
+            read_message_ids=[],
+            next_cursor=_encode_sync_cursor(
+                last.get("created_at") if last else None,
+                last.get("message_id") if last else None,
+                read_watermark,
+            ),
+            has_more=False,
         )
-        for message in messages
-    ]
+
+    after_ts, after_id, read_since = _decode_sync_cursor(since)
+
+    query: dict[str, object] = {"conversation_id": conversation_id}
+    if after_ts is not None:
+        query["$or"] = [
+            {"created_at": {"$gt": after_ts}},
+            {"created_at": after_ts, "message_id": {"$gt": after_id or ""}},
+        ]
+
+    messages = list(
+        db.therapist_chat_messages
+        .find(query)
+        .sort([("created_at", 1), ("message_id", 1)])
+        .limit(limit + 1)
+    )
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+
+    read_message_ids: list[str] = []
+    if after_ts is not None:
+        read_message_ids = [
+            doc["message_id"]
+            for doc in db.therapist_chat_messages.find(
+                {
+                    "conversation_id": conversation_id,
+                    "read_at": {"$gte": read_since},
+                    "created_at": {"$lte": after_ts},
+                },
+                {"_id": 0, "message_id": 1},
+            )
+        ]
+
+    if messages:
+        after_ts = messages[-1].get("created_at")
+        after_id = messages[-1].get("message_id")
+
+    return ChatMessageSyncResponse(
+        messages=[_message_projection(message) for message in messages],
+        read_message_ids=read_message_ids,
+        next_cursor=_encode_sync_cursor(after_ts, after_id, read_watermark),
+        has_more=has_more,
+    )
 
 
 def send_message(payload: SendChatMessageRequest) -> ChatMessageResponse:
@@ -250,6 +374,7 @@ def send_message(payload: SendChatMessageRequest) -> ChatMessageResponse:
             "$set": {
                 "last_message": content,
                 "updated_at": now_ts,
+                "changed_at": now_ts,
             },
             "$inc": {unread_field: 1},
         },
@@ -269,7 +394,8 @@ def send_message(payload: SendChatMessageRequest) -> ChatMessageResponse:
             type="message",
             title=f"New message from {sender_name}",
             body=content[:100] + "..." if len(content) > 100 else content,
-            data={"conversation_id": conversation_id, "sender_id": payload.sender_id}
+            data={"conversation_id": conversation_id, "sender_id": payload.sender_id},
+            coalesce_key=conversation_id
         )
 
     return ChatMessageResponse(
@@ -285,20 +411,23 @@ def send_message(payload: SendChatMessageRequest) -> ChatMessageResponse:
 
 def mark_conversation_read(conversation_id: str, request: MarkConversationReadRequest) -> None:
     field = "unread_for_client" if request.user_role == "client" else "unread_for_therapist"
+    now_ts = now_my()
     db.chat_conversations.update_one(
         {"conversation_id": conversation_id},
         {
-            "$set": {field: 0},
+            "$set": {field: 0, "changed_at": now_ts},
         },
     )
 
     other_role: ParticipantRole = "therapist" if request.user_role == "client" else "client"
+    # Only touch unread messages so ``read_at`` records when the state changed
     db.therapist_chat_messages.update_many(
         {
             "conversation_id": conversation_id,
             "sender_role": other_role,
+            "is_read": {"$ne": True},
         },
         {
-            "$set": {"is_read": True},
+            "$set": {"is_read": True, "read_at": now_ts},
         },
     )
@@ -0,0 +1,82 @@
+"""
+Day Grid
+Fixed 15-minute cell bitmaps for a day (96 cells), held as Python ints.
+Bit i is set when cell [i*15, (i+1)*15) minutes after midnight is covered.
+"""
+from datetime import datetime, time
+from typing import Iterable, Optional, Tuple
+
+CELL_MINUTES = 15
+CELLS_PER_DAY = 24 * 60 // CELL_MINUTES
+FULL_DAY = (1 << CELLS_PER_DAY) - 1
+
+
+def minutes_of(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def end_minutes_of(value: time) -> int:
+    """Minutes for the end of a span: an end of 00:00 is the midnight closing the day (1440)"""
+    return minutes_of(value) or 24 * 60
+
+
+def span_mask(start_minute: int, end_minute: int) -> int:
+    """Cells touched by [start_minute, end_minute), clamped to the day"""
+    start_minute = max(0, start_minute)
+    end_minute = min(24 * 60, end_minute)
+    if end_minute <= start_minute:
+        return 0
+    first = start_minute // CELL_MINUTES
+    last = -(-end_minute // CELL_MINUTES)  # ceiling
+    return ((1 << (last - first)) - 1) << first
+
+
+def is_aligned(start_minute: int, end_minute: int) -> bool:
+    return start_minute % CELL_MINUTES == 0 and end_minute % CELL_MINUTES == 0
+
+
+def window_mask(window_start: Optional[time], window_end: Optional[time]) -> int:
+    """Cells inside a time-of-day window; the full day when unbounded"""
+    start_minute = minutes_of(window_start) if window_start else 0
+    end_minute = end_minutes_of(window_end) if window_end else 24 * 60
+    return span_mask(start_minute, end_minute)
+
+
+def inner_span_mask(start_minute: int, end_minute: int) -> int:
+    """Cells lying entirely inside [start_minute, end_minute)"""
+    first = -(-max(0, start_minute) // CELL_MINUTES)
+    last = min(24 * 60, end_minute) // CELL_MINUTES
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def day_busy_masks(intervals: Iterable[Tuple[datetime, datetime]], day_start: datetime) -> Tuple[int, int]:
+    """(touched, fully covered) cells of the day starting at day_start for busy intervals"""
+    touched = covered = 0
+    for start, end in intervals:
+        start_minute = int((start - day_start).total_seconds() // 60)
+        end_minute = -int(-(end - day_start).total_seconds() // 60)
+        if end_minute <= 0 or start_minute >= 24 * 60:
+            continue
+        touched |= span_mask(start_minute, end_minute)
+        covered |= inner_span_mask(start_minute, end_minute)
+    return touched, covered
+
+
+def to_hex(mask: int) -> str:
+    """Compact, JSON-safe form stored next to availability documents (24 hex digits)"""
+    return format(mask & FULL_DAY, f"0{CELLS_PER_DAY // 4}x")
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16) & FULL_DAY
+
+
+def grid_fields(start_minute: int, end_minute: int) -> dict:
+    """Fields persisted on a therapist_availability document"""
+    return {
+        "start_minute": start_minute,
+        "end_minute": end_minute,
+        "cell_mask": to_hex(span_mask(start_minute, end_minute)),
+    }
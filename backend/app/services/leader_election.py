@@ -0,0 +1,143 @@
+"""
+Leader Election Service
+Mongo-lease based election so only one process runs scheduled jobs
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.config.timezone import now_my
+from app.models.database import db
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(RuntimeError):
+    """Raised by leader-only work that finds the lease is no longer held"""
+
+
+class LeaderLease:
+    """A named lease in the worker_leases collection held by at most one owner
+
+    The holder must renew before ttl_seconds elapse; once the lease expires any
+    other instance can take it over.
+    """
+
+    # Local validity ends this much before expires_at to absorb clock drift between hosts
+    CLOCK_DRIFT_ALLOWANCE_SECONDS = 2
+
+    def __init__(self, name: str, ttl_seconds: int = 30, owner_id: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner_id = owner_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        # time.monotonic() deadline up to which the last successful renewal guarantees the lease
+        self._held_until = 0.0
+
+    def is_held(self) -> bool:
+        """Whether the lease is still guaranteed, without a database round trip
+
+        Measured from when the last successful renewal was sent, so it runs out
+        no later than the stored expires_at even if renewals start to hang.
+        """
+        return self.is_leader and time.monotonic() < self._held_until
+
+    def ensure_held(self):
+        """Fence for leader-only writes: raise LeaseLostError once the lease may have passed on"""
+        if not self.is_held():
+            raise LeaseLostError(f"Lease {self.name} is no longer held by {self.owner_id}")
+
+    def try_acquire(self, status: Optional[dict] = None) -> bool:
+        """Acquire or renew the lease, returning whether this instance holds it
+
+        status is stored on the lease document (e.g. a metrics snapshot) so
+        other processes can report on the current leader.
+        """
+        started = time.perf_counter()
+        sent_at = time.monotonic()
+        current_time = now_my()
+        update = {
+            "owner": self.owner_id,
+            "expires_at": current_time + timedelta(seconds=self.ttl_seconds),
+            "renewed_at": current_time,
+        }
+        if status is not None:
+            update["status"] = status
+
+        try:
+            lease = db.worker_leases.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [
+                        {"owner": self.owner_id},
+                        {"expires_at": {"$lt": current_time}},
+                    ],
+                },
+                {"$set": update},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            acquired = lease is not None and lease.get("owner") == self.owner_id
+        except DuplicateKeyError:
+            # Another owner holds an unexpired lease, so the upsert collided with it
+            acquired = False
+        except PyMongoError as e:
+            logger.error(f"Failed to renew lease {self.name}: {e}")
+            metrics.increment("worker_lease_errors_total", lease=self.name)
+            acquired = False
+
+        metrics.observe("worker_lease_renew_seconds", time.perf_counter() - started, lease=self.name)
+        if acquired and not self.is_leader:
+            logger.info(f"Acquired lease {self.name} as {self.owner_id}")
+            metrics.increment("worker_lease_acquired_total", lease=self.name)
+        elif not acquired and self.is_leader:
+            logger.warning(f"Lost lease {self.name} held by {self.owner_id}")
+            metrics.increment("worker_lease_lost_total", lease=self.name)
+        if acquired:
+            metrics.increment("worker_lease_renewals_total", lease=self.name)
+
+        if acquired:
+            self._held_until = sent_at + max(0, self.ttl_seconds - self.CLOCK_DRIFT_ALLOWANCE_SECONDS)
+        self.is_leader = acquired
+        metrics.set_gauge("worker_is_leader", 1 if acquired else 0, lease=self.name)
+        return acquired
+
+    def release(self):
+        """Give up the lease so another instance can take over immediately"""
+        try:
+            db.worker_leases.delete_one({"_id": self.name, "owner": self.owner_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to release lease {self.name}: {e}")
+        self.is_leader = False
+
+
+# Lease guarding leader-only work in this process; set by the background worker
+_fence: Optional[LeaderLease] = None
+
+
+def set_fence(lease: Optional[LeaderLease]):
+    global _fence
+    _fence = lease
+
+
+def check_fence():
+    """Raise LeaseLostError if this process runs leader-only work without holding the lease
+
+    Called before each batch of writes in scheduled jobs. A no-op when no worker
+    runs in this process.
+    """
+    if _fence is not None:
+        _fence.ensure_held()
+
+
+def get_lease(name: str) -> Optional[dict]:
+    """Return the current lease document, if any"""
+    return db.worker_leases.find_one({"_id": name})
@@ -0,0 +1,86 @@
+"""
+In-process metrics registry
+Counters, gauges and timing summaries rendered in Prometheus text format
+"""
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters, gauges and timing summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        self._timings: Dict[str, Dict[LabelSet, Dict[str, float]]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            summary = self._timings.setdefault(name, {}).setdefault(key, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += seconds
+            summary["max"] = max(summary["max"], seconds)
+
+    def snapshot(self) -> dict:
+        """Return a JSON/BSON friendly copy of every series"""
+        def dump(store):
+            return {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in store.items()
+            }
+
+        with self._lock:
+            return {
+                "counters": dump(self._counters),
+                "gauges": dump(self._gauges),
+                "timings": dump(self._timings),
+            }
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    merged = {**labels, **(extra or {})}
+    if not merged:
+        return ""
+    parts = ",".join(f'{key}="{value}"' for key, value in sorted(merged.items()))
+    return "{" + parts + "}"
+
+
+def render_prometheus(snapshots: Iterable[Tuple[dict, Dict[str, str]]]) -> str:
+    """Render (snapshot, extra_labels) pairs in the Prometheus text exposition format"""
+    lines = []
+    for snapshot, extra in snapshots:
+        for name, series in snapshot.get("counters", {}).items():
+            for item in series:
+                lines.append(f"{name}{_format_labels(item['labels'], extra)} {item['value']}")
+        for name, series in snapshot.get("gauges", {}).items():
+            for item in series:
+                lines.append(f"{name}{_format_labels(item['labels'], extra)} {item['value']}")
+        for name, series in snapshot.get("timings", {}).items():
+            for item in series:
+                labels = _format_labels(item["labels"], extra)
+                lines.append(f"{name}_count{labels} {item['value']['count']}")
+                lines.append(f"{name}_sum{labels} {item['value']['sum']}")
+                lines.append(f"{name}_max{labels} {item['value']['max']}")
+    return "\n".join(lines) + "\n"
+
+
+# Global registry for this process
+metrics = MetricsRegistry()
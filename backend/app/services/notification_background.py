@@ -1,59 +1,181 @@
 """
 Background Tasks for Notification Scheduler
-Runs periodic checks for scheduled notifications
+Keeps a min-heap of upcoming deadlines and sleeps until the next one is due.
+Deadline changes made in any process bump a version on a scheduler_signals
+document, which the process running the scheduler polls to wake up early.
 """
 import asyncio
+import heapq
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional, Tuple
 from fastapi import FastAPI
 import logging
 
+from pymongo.errors import PyMongoError
+
+from app.config.timezone import now_my
+from app.models.database import db
+
 logger = logging.getLogger(__name__)
 
+SCHEDULE_SIGNAL_ID = "notification_schedule"
+
 class NotificationBackgroundTask:
+    # Upper bound on a single sleep, a fallback should a change signal be missed.
+    # Reloading is two indexed reads, so a short bound is cheap.
+    MAX_SLEEP_SECONDS = 60
+    # How often the scheduler reads the change signal (one _id lookup)
+    SIGNAL_POLL_SECONDS = 1
+
     def __init__(self):
         self.task = None
+        self.signal_task = None
         self.running = False
-    
+        self._deadlines: List[Tuple[datetime, str]] = []
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_run: Optional[datetime] = None
+
+    def wake(self):
+        """Ask the scheduler to reload its deadlines now.
+
+        Safe to call from request handlers running in the threadpool.
+        """
+        if self._loop is None or self._wake_event is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+    @staticmethod
+    def _signal_version() -> int:
+        signal = db.scheduler_signals.find_one({"_id": SCHEDULE_SIGNAL_ID}, {"version": 1})
+        return (signal or {}).get("version", 0)
+
+    async def _watch_signals(self):
+        """Wake the scheduler when another process signals a schedule change"""
+        seen = None
+        while self.running:
+            try:
+                version = await asyncio.to_thread(self._signal_version)
+                if seen is not None and version != seen:
+                    self._wake_event.set()
+                seen = version
+            except Exception as e:
+                logger.error(f"Error reading the notification schedule signal: {e}")
+            await asyncio.sleep(self.SIGNAL_POLL_SECONDS)
+
+    async def _reload_deadlines(self):
+        """Rebuild the heap from MongoDB with everything due after the last run"""
+        from app.services.notification_scheduler import NotificationScheduler
+
+        deadlines = await asyncio.to_thread(NotificationScheduler.load_due_times, self._last_run)
+        heapq.heapify(deadlines)
+        self._deadlines = deadlines
+
+    def _seconds_until_next_deadline(self) -> float:
+        if not self._deadlines:
+            return self.MAX_SLEEP_SECONDS
+        remaining = (self._deadlines[0][0] - now_my()).total_seconds()
+        return min(self.MAX_SLEEP_SECONDS, max(0.0, remaining))
+
     async def check_notifications(self):
-        """Periodic task that checks and sends scheduled notifications"""
-        from app.services.notification_scheduler import process_scheduled_notifications
-        
+        """Sleep until the next deadline (or an early wake-up) and send what is due"""
+        from app.services.notification_scheduler import NotificationScheduler, process_scheduled_notifications
+
+        self._last_run = now_my()
+        try:
+            await asyncio.to_thread(NotificationScheduler.backfill_next_due_at)
+        except Exception as e:
+            logger.error(f"Error backfilling notification deadlines: {e}")
         while self.running:
             try:
-                # Process all scheduled notifications
-                process_scheduled_notifications()
+                await self._reload_deadlines()
             except Exception as e:
-                logger.error(f"Error in notification scheduler: {e}")
-            
-            # Wait 60 seconds before checking again
-            await asyncio.sleep(60)
-    
+                logger.error(f"Error loading notification deadlines: {e}")
+                self._deadlines = []
+
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self._seconds_until_next_deadline())
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+            current_time = now_my()
+            if self._deadlines and self._deadlines[0][0] <= current_time:
+                try:
+                    await asyncio.to_thread(process_scheduled_notifications)
+                except Exception as e:
+                    logger.error(f"Error in notification scheduler: {e}")
+                self._last_run = current_time
+
     async def start(self):
         """Start the background task"""
         if not self.running:
             self.running = True
+            self._loop = asyncio.get_running_loop()
+            self._wake_event = asyncio.Event()
             self.task = asyncio.create_task(self.check_notifications())
+            self.signal_task = asyncio.create_task(self._watch_signals())
             logger.info("Notification scheduler started")
     
     async def stop(self):
         """Stop the background task"""
         self.running = False
+        for task in (self.signal_task, self.task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
             logger.info("Notification scheduler stopped")
+        self.task = self.signal_task = None
+        self._loop = None
 
 # Global instance
 notification_task = NotificationBackgroundTask()
 
+
+def notify_schedule_changed():
+    """Wake the scheduler after a booking or settings change added or moved a deadline.
+
+    The scheduler may run in another web worker or in python -m app.worker, so the
+    change is published on the signal document; this process is also woken directly.
+    """
+    try:
+        db.scheduler_signals.update_one(
+            {"_id": SCHEDULE_SIGNAL_ID},
+            {"$inc": {"version": 1}, "$set": {"changed_at": now_my()}},
+            upsert=True
+        )
+    except PyMongoError as e:
+        # The scheduler still reloads within MAX_SLEEP_SECONDS
+        logger.warning(f"Could not signal a notification schedule change: {e}")
+    notification_task.wake()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """FastAPI lifespan context manager"""
-    # Startup
-    await notification_task.start()
+    """FastAPI lifespan context manager
+
+    Each web process competes for the scheduler lease, so reminders are sent
+    once no matter how many workers run. With EMBEDDED_WORKER=false the web
+    processes leave scheduling to the standalone worker (python -m app.worker).
+    """
+    from app.config.settings import EMBEDDED_WORKER
+    from app.models.database import initialize_indexes
+    from app.services.background_worker import background_worker
+
+    # Startup; a failed index build stops the process instead of serving unsafe bookings
+    initialize_indexes()
+    if EMBEDDED_WORKER:
+        await background_worker.start()
     yield
     # Shutdown
-    await notification_task.stop()
+    if EMBEDDED_WORKER:
+        await background_worker.stop()
@@ -2,199 +2,408 @@
 Notification Scheduler Service
 Handles scheduled notifications for journaling, hydration, breathing reminders, and therapy sessions
 """
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 from app.models.database import db
-from app.config.timezone import now_my
-from app.services.notification_service import create_notification
+from app.config.timezone import now_my, get_malaysia_tz
+from app.services.notification_service import create_notifications_bulk
+from app.services.leader_election import check_fence
+from pymongo import UpdateOne
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Routine reminders tracked through next_due_at on the settings document
+REMINDER_TEMPLATES = {
+    'journaling_reminder': {
+        'title': '📝 Time to Journal',
+        'body': 'Take a moment to reflect on your day. How are you feeling?',
+        'data': {'action': 'open_journal'}
+    },
+    'breathing_reminder': {
+        'title': '🌬️ Breathing Practice',
+        'body': 'Start your day with a calming breathing exercise.',
+        'data': {'action': 'open_breathing'}
+    },
+    'hydration_reminder': {
+        'title': '💧 Hydration Reminder',
+        'body': 'Time to drink some water! Stay hydrated, stay healthy.',
+        'data': {'action': 'log_hydration'}
+    },
+}
+
+# Therapy session reminders are derived from therapy_sessions: (key, lead time, title, wording)
+SESSION_REMINDER_OFFSETS = [
+    ('1h', timedelta(hours=1), '📅 Therapy Session Reminder', 'in 1 hour'),
+    ('10m', timedelta(minutes=10), '📅 Therapy Session Starting Soon', 'in 10 minutes'),
+]
+# Session reminders missed by more than this (e.g. after downtime) are skipped
+SESSION_REMINDER_GRACE = timedelta(minutes=5)
+
+# Daily reminders that are this late (e.g. after downtime) are rescheduled instead of sent
+STALE_REMINDER_GRACE = timedelta(minutes=30)
+
+
+def _as_local(value: datetime) -> datetime:
+    """Convert a datetime read from MongoDB (naive UTC) to Malaysia time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(get_malaysia_tz())
+
+
 class NotificationScheduler:
     """Manages scheduled notifications based on user settings"""
-    
+
     @staticmethod
-    def get_pending_notifications(user_id: str) -> List[Dict]:
-        """Get all pending notifications that should be sent now"""
-        settings = db.notification_settings.find_one({"user_id": user_id})
-        if not settings or not settings.get('all_notifications_enabled', True):
+    def get_pending_notifications(settings: Dict, current_time: datetime) -> List[Dict]:
+        """Get the routine notifications in a settings document that are due now"""
+        if not settings.get('all_notifications_enabled', True):
             return []
-        
-        current_time = now_my()
-        current_hour = current_time.hour
-        current_minute = current_time.minute
-        
+
         notifications = []
-        
-        # Check Journaling Routine
-        if settings.get('journaling_routine_enabled', False):
-            journaling_time = settings.get('journaling_time', '20:00')
-            j_hour, j_minute = map(int, journaling_time.split(':'))
-            
-            if current_hour == j_hour and current_minute == j_minute:
-                # Check if we already sent today
-                if not NotificationScheduler._was_sent_today(user_id, 'journaling'):
-                    notifications.append({
-                        'type': 'journaling_reminder',
-                        'title': '📝 Time to Journal',
-                        'body': 'Take a moment to reflect on your day. How are you feeling?',
-                        'data': {'action': 'open_journal'}
-                    })
-        
-        # Check Breathing Practices
-        if settings.get('breathing_practices_enabled', False):
-            breathing_time = settings.get('breathing_time', '08:00')
-            b_hour, b_minute = map(int, breathing_time.split(':'))
-            
-            if current_hour == b_hour and current_minute == b_minute:
-                if not NotificationScheduler._was_sent_today(user_id, 'breathing'):
-                    notifications.append({
-                        'type': 'breathing_reminder',
-                        'title': '🌬️ Breathing Practice',
-                        'body': 'Start your day with a calming breathing exercise.',
-                        'data': {'action': 'open_breathing'}
-                    })
-        
-        # Check Hydration Reminders
-        if settings.get('hydration_reminders_enabled', False):
-            interval_minutes = settings.get('hydration_interval_minutes', 120)
-            last_sent = NotificationScheduler._get_last_sent_time(user_id, 'hydration')
-            
-            if last_sent is None or (current_time - last_sent).total_seconds() / 60 >= interval_minutes:
-                notifications.append({
-                    'type': 'hydration_reminder',
-                    'title': '💧 Hydration Reminder',
-                    'body': 'Time to drink some water! Stay hydrated, stay healthy.',
-                    'data': {'action': 'log_hydration'}
-                })
-        
+        for reminder_type, due_at in (settings.get('next_due_at') or {}).items():
+            template = REMINDER_TEMPLATES.get(reminder_type)
+            if template is None or not isinstance(due_at, datetime):
+                continue
+            due_at = _as_local(due_at)
+            if due_at > current_time:
+                continue
+            if reminder_type != 'hydration_reminder' and current_time - due_at > STALE_REMINDER_GRACE:
+                logger.info(f"Skipping stale {reminder_type} for user {settings['user_id']} due at {due_at}")
+                continue
+            notifications.append({'type': reminder_type, **template})
+
         return notifications
-    
+
     @staticmethod
-    def _was_sent_today(user_id: str, notification_type: str) -> bool:
-        """Check if a notification of this type was already sent today"""
-        today_start = now_my().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        existing = db.notification_logs.find_one({
-            'user_id': user_id,
-            'type': notification_type,
-            'sent_at': {'$gte': today_start.isoformat()}
-        })
-        
-        return existing is not None
-    
+    def compute_next_due(settings: Dict, after: datetime, sent_types: Optional[Dict[str, datetime]] = None) -> Dict[str, datetime]:
+        """Return the next due time for every enabled routine reminder
+
+        sent_types maps a reminder type to when it was last sent, so daily
+        reminders already delivered today move to tomorrow and hydration
+        counts its interval from the last delivery.
+        """
+        if not settings.get('all_notifications_enabled', True):
+            return {}
+
+        sent_types = sent_types or {}
+        next_due: Dict[str, datetime] = {}
+        start_of_tomorrow = after.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        daily = (
+            ('journaling_reminder', 'journaling_routine_enabled', 'journaling_time', '20:00'),
+            ('breathing_reminder', 'breathing_practices_enabled', 'breathing_time', '08:00'),
+        )
+        for reminder_type, enabled_key, time_key, default_time in daily:
+            if not settings.get(enabled_key, False):
+                continue
+            last_sent = sent_types.get(reminder_type)
+            base = after
+            if last_sent is not None and _as_local(last_sent).date() == after.date():
+                base = start_of_tomorrow - timedelta(microseconds=1)
+            due_at = NotificationScheduler._next_daily_occurrence(settings.get(time_key, default_time), base)
+            if due_at:
+                next_due[reminder_type] = due_at
+
+        if settings.get('hydration_reminders_enabled', False):
+            interval = timedelta(minutes=settings.get('hydration_interval_minutes', 120))
+            last_sent = sent_types.get('hydration_reminder')
+            next_due['hydration_reminder'] = _as_local(last_sent) + interval if last_sent else after
+
+        return next_due
+
+    @staticmethod
+    def _next_due_update(next_due: Dict[str, datetime]) -> Dict:
+        """Build the $set/$unset update that stores next_due_at and its minimum"""
+        if not next_due:
+            return {'$unset': {'next_due_at': '', 'next_reminder_at': ''}}
+        return {'$set': {'next_due_at': next_due, 'next_reminder_at': min(next_due.values())}}
+
     @staticmethod
-    def _get_last_sent_time(user_id: str, notification_type: str) -> Optional[datetime]:
-        """Get the last time a notification of this type was sent"""
-        log = db.notification_logs.find_one(
-            {'user_id': user_id, 'type': notification_type},
-            sort=[('sent_at', -1)]
+    def refresh_next_due(user_id: str) -> None:
+        """Recompute next_due_at after the user's settings changed"""
+        settings = db.notification_settings.find_one({"user_id": user_id})
+        if not settings:
+            return
+
+        current_time = now_my()
+        sent_types: Dict[str, datetime] = {}
+        for reminder_type in ('journaling_reminder', 'breathing_reminder'):
+            if NotificationScheduler._was_sent_today(settings, reminder_type):
+                sent_types[reminder_type] = current_time
+        if settings.get('hydration_reminders_enabled', False):
+            last_hydration = NotificationScheduler._get_last_sent_time(settings, 'hydration_reminder')
+            if last_hydration:
+                sent_types['hydration_reminder'] = last_hydration
+
+        next_due = NotificationScheduler.compute_next_due(settings, current_time, sent_types)
+        db.notification_settings.update_one(
+            {"user_id": user_id},
+            NotificationScheduler._next_due_update(next_due)
         )
-        
-        if log and 'sent_at' in log:
-            return datetime.fromisoformat(log['sent_at'])
+
+    @staticmethod
+    def backfill_next_due_at() -> int:
+        """Populate next_due_at for settings written before it existed"""
+        cursor = db.notification_settings.find({
+            'next_reminder_at': {'$exists': False},
+            'all_notifications_enabled': True,
+            '$or': [
+                {'journaling_routine_enabled': True},
+                {'breathing_practices_enabled': True},
+                {'hydration_reminders_enabled': True}
+            ]
+        }, {'user_id': 1})
+
+        count = 0
+        for settings in cursor:
+            NotificationScheduler.refresh_next_due(settings['user_id'])
+            count += 1
+
+        if count > 0:
+            logger.info(f"Backfilled next_due_at for {count} notification settings")
+        return count
+
+    @staticmethod
+    def _was_sent_today(settings: Dict, notification_type: str) -> bool:
+        """Check if a notification of this type was already sent today"""
+        last_sent = NotificationScheduler._get_last_sent_time(settings, notification_type)
+        return last_sent is not None and last_sent.date() == now_my().date()
+
+    @staticmethod
+    def _get_last_sent_time(settings: Dict, notification_type: str) -> Optional[datetime]:
+        """Get the last time a notification of this type was sent, from the settings' last_sent map"""
+        last_sent = (settings.get('last_sent') or {}).get(notification_type)
+        if isinstance(last_sent, datetime):
+            return _as_local(last_sent)
         return None
-    
+
     @staticmethod
     def send_notification(user_id: str, notification_data: Dict):
         """Send a notification and log it"""
-        from app.services.notification_service import create_notification
-        
-        # Create the notification
-        notification = create_notification(
-            user_id=user_id,
-            type=notification_data['type'],
-            title=notification_data['title'],
-            body=notification_data['body'],
-            data=notification_data.get('data')
-        )
-        
+        notification = NotificationScheduler.send_notifications_batch([(user_id, notification_data)])[0]
         if notification:
-            # Log that we sent it
-            db.notification_logs.insert_one({
+            db.notification_settings.update_one(
+                {'user_id': user_id},
+                {'$set': {f"last_sent.{notification_data['type']}": now_my()}}
+            )
+        return notification
+
+    @staticmethod
+    def send_notifications_batch(deliveries: List[Tuple[str, Dict]]) -> List:
+        """Send (user_id, notification_data) pairs and log them with bulk writes
+
+        Callers record the delivery time in the settings' last_sent map.
+        """
+        notifications = create_notifications_bulk([
+            {
+                'user_id': user_id,
+                'type': notification_data['type'],
+                'title': notification_data['title'],
+                'body': notification_data['body'],
+                'data': notification_data.get('data'),
+            }
+            for user_id, notification_data in deliveries
+        ], fresh_settings=True)
+
+        sent_at = now_my()
+        logs = [
+            {
                 'user_id': user_id,
                 'type': notification_data['type'],
                 'notification_id': notification.notification_id,
-                'sent_at': now_my().isoformat()
-            })
-            
-            logger.info(f"Sent {notification_data['type']} notification to user {user_id}")
-            return notification
-        
-        return None
-    
+                'sent_at': sent_at
+            }
+            for (user_id, notification_data), notification in zip(deliveries, notifications)
+            if notification is not None
+        ]
+        if logs:
+            db.notification_logs.insert_many(logs, ordered=False)
+            logger.info(f"Sent {len(logs)} routine notifications")
+
+        return notifications
+
     @staticmethod
     def process_therapy_session_reminders():
-        """Process scheduled therapy session reminders that are due"""
+        """Send therapy session reminders derived from upcoming scheduled sessions
+
+        A session is due for a reminder when scheduled_at - lead time falls in the
+        last SESSION_REMINDER_GRACE; reminders_sent on the session records which
+        lead times went out, so each is sent once.
+        """
         current_time = now_my()
-        
-        # Find all pending therapy session reminders that should be sent now
-        # Check for reminders scheduled within the last 5 minutes to handle timing variations
-        time_window_start = current_time - timedelta(minutes=5)
-        
-        pending_reminders = db.scheduled_notifications.find({
-            "notification_type": "therapy_session_reminder",
-            "is_sent": False,
-            "scheduled_time": {"$lte": current_time, "$gte": time_window_start}
-        })
-        
-        sent_count = 0
-        for reminder in pending_reminders:
-            try:
-                notification_data = reminder.get("notification_data", {})
-                notification = create_notification(
-                    user_id=reminder["user_id"],
-                    type="therapy_session_reminder",
-                    title=notification_data.get("title", "Therapy Session Reminder"),
-                    body=notification_data.get("body", "Your therapy session is starting soon."),
-                    data=notification_data.get("data")
-                )
-                
-                if notification:
-                    # Mark as sent
-                    db.scheduled_notifications.update_one(
-                        {"notification_id": reminder["notification_id"]},
-                        {"$set": {"is_sent": True, "sent_at": current_time}}
-                    )
-                    sent_count += 1
-                    logger.info(f"Sent therapy session reminder to user {reminder['user_id']}")
-            except Exception as e:
-                logger.error(f"Failed to send therapy reminder {reminder.get('notification_id')}: {e}")
-        
+        deliveries: List[Dict] = []
+        claims = []
+
+        for key, lead_time, title, wording in SESSION_REMINDER_OFFSETS:
+            sessions = list(db.therapy_sessions.find(
+                {
+                    "session_status": "scheduled",
+                    "scheduled_at": {
+                        "$gt": current_time + lead_time - SESSION_REMINDER_GRACE,
+                        "$lte": current_time + lead_time,
+                    },
+                    "reminders_sent": {"$ne": key},
+                },
+                {"session_id": 1, "user_id": 1, "therapist_user_id": 1, "therapist_name": 1,
+                 "client_name": 1, "start_time": 1}
+            ))
+            if not sessions:
+                continue
+
+            claims.append((key, [session["session_id"] for session in sessions]))
+            for session in sessions:
+                start_label = session.get("start_time", "")
+                deliveries.append({
+                    "user_id": session["user_id"],
+                    "type": "therapy_session_reminder",
+                    "title": title,
+                    "body": f"Your therapy session with {session.get('therapist_name') or 'your therapist'} "
+                            f"is starting {wording} at {start_label}.",
+                    "data": {"session_id": session["session_id"], "action": "open_booking"},
+                })
+                deliveries.append({
+                    "user_id": session["therapist_user_id"],
+                    "type": "therapy_session_reminder",
+                    "title": title,
+                    "body": f"Your therapy session with {session.get('client_name') or 'a client'} "
+                            f"is starting {wording} at {start_label}.",
+                    "data": {"session_id": session["session_id"], "action": "open_dashboard"},
+                })
+
+        if not deliveries:
+            return 0
+
+        # Claim before sending so a crash mid-send never produces duplicates
+        check_fence()
+        for key, session_ids in claims:
+            db.therapy_sessions.update_many(
+                {"session_id": {"$in": session_ids}},
+                {"$addToSet": {"reminders_sent": key}}
+            )
+        check_fence()
+        notifications = create_notifications_bulk(deliveries, fresh_settings=True)
+
+        sent_count = sum(1 for notification in notifications if notification is not None)
         if sent_count > 0:
             logger.info(f"Sent {sent_count} therapy session reminders")
-        
+
         return sent_count
-    
+
+    @staticmethod
+    def _next_daily_occurrence(time_label: str, after: datetime) -> Optional[datetime]:
+        """Return the first HH:MM occurrence strictly after the given time"""
+        try:
+            hour, minute = map(int, time_label.split(':'))
+            candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        except (ValueError, AttributeError):
+            return None
+        if candidate <= after:
+            candidate += timedelta(days=1)
+        return candidate
+
+    @staticmethod
+    def load_due_times(after: datetime, limit: int = 256) -> List[Tuple[datetime, str]]:
+        """Return (due_at, key) pairs for work that becomes due after the given time
+
+        Used by the background task to build its min-heap of deadlines, so it can
+        sleep until the next one instead of polling every minute.
+        """
+        due_times: List[Tuple[datetime, str]] = []
+
+        # Therapy session reminders, derived from upcoming scheduled sessions
+        shortest_lead = min(lead_time for _, lead_time, _, _ in SESSION_REMINDER_OFFSETS)
+        sessions = db.therapy_sessions.find(
+            {"session_status": "scheduled", "scheduled_at": {"$gt": after + shortest_lead}},
+            {"_id": 0, "session_id": 1, "scheduled_at": 1, "reminders_sent": 1}
+        ).sort("scheduled_at", 1).limit(limit)
+        for session in sessions:
+            scheduled_at = _as_local(session["scheduled_at"])
+            for key, lead_time, _, _ in SESSION_REMINDER_OFFSETS:
+                due_at = scheduled_at - lead_time
+                if due_at > after and key not in session.get("reminders_sent", []):
+                    due_times.append((due_at, f"therapy_session_reminder:{session['session_id']}:{key}"))
+
+        # Routine reminders, read straight off the next_reminder_at index.
+        # Anything overdue (e.g. a failed send) is retried a minute later at the earliest.
+        earliest = after + timedelta(minutes=1)
+        routine = db.notification_settings.find(
+            {"next_reminder_at": {"$exists": True}},
+            {"_id": 0, "user_id": 1, "next_reminder_at": 1}
+        ).sort("next_reminder_at", 1).limit(limit)
+        for settings in routine:
+            due_at = max(earliest, _as_local(settings["next_reminder_at"]))
+            due_times.append((due_at, f"routine:{settings['user_id']}"))
+
+        return due_times
+
+    @staticmethod
+    def process_routine_reminders() -> int:
+        """Send journaling, breathing and hydration reminders that are due"""
+        current_time = now_my()
+
+        # A single range query on the next_reminder_at index
+        due_settings = list(db.notification_settings.find({"next_reminder_at": {"$lte": current_time}}))
+        if not due_settings:
+            return 0
+
+        deliveries: List[Tuple[str, Dict]] = []
+        next_due_updates: Dict[str, Dict] = {}
+        for settings in due_settings:
+            user_id = settings['user_id']
+            sent_types: Dict[str, datetime] = {}
+            for notification_data in NotificationScheduler.get_pending_notifications(settings, current_time):
+                deliveries.append((user_id, notification_data))
+                sent_types[notification_data['type']] = current_time
+
+            # Every due entry moves forward, including stale ones that were skipped
+            for reminder_type, due_at in (settings.get('next_due_at') or {}).items():
+                if isinstance(due_at, datetime) and _as_local(due_at) <= current_time:
+                    sent_types.setdefault(reminder_type, current_time)
+
+            next_due = NotificationScheduler.compute_next_due(settings, current_time, sent_types)
+            # Reminders that were not due keep their stored time (it may already skip today)
+            for reminder_type, due_at in (settings.get('next_due_at') or {}).items():
+                if reminder_type in next_due and reminder_type not in sent_types and isinstance(due_at, datetime):
+                    next_due[reminder_type] = _as_local(due_at)
+            next_due_updates[user_id] = NotificationScheduler._next_due_update(next_due)
+
+        check_fence()
+        notifications = []
+        try:
+            notifications = NotificationScheduler.send_notifications_batch(deliveries)
+        except Exception as e:
+            logger.error(f"Failed to send routine reminders: {e}")
+            # Users with something to send keep their next_reminder_at, so the next tick retries them
+            for user_id, _ in deliveries:
+                next_due_updates.pop(user_id, None)
+
+        # next_due_at and the last_sent map go out in the same per-user update
+        for (user_id, notification_data), notification in zip(deliveries, notifications):
+            if notification is not None:
+                update = next_due_updates[user_id]
+                update.setdefault('$set', {})[f"last_sent.{notification_data['type']}"] = current_time
+
+        if next_due_updates:
+            check_fence()
+            db.notification_settings.bulk_write(
+                [UpdateOne({"user_id": user_id}, update) for user_id, update in next_due_updates.items()],
+                ordered=False
+            )
+
+        return sum(1 for notification in notifications if notification is not None)
+
     @staticmethod
     def process_scheduled_notifications():
         """Process all scheduled notifications for all users"""
         # First process therapy session reminders
         NotificationScheduler.process_therapy_session_reminders()
-        
-        # Get all users with notification settings enabled
-        settings_cursor = db.notification_settings.find({
-            'all_notifications_enabled': True,
-            '$or': [
-                {'journaling_routine_enabled': True},
-                {'breathing_practices_enabled': True},
-                {'hydration_reminders_enabled': True}
-            ]
-        })
-        
-        sent_count = 0
-        for settings in settings_cursor:
-            user_id = settings['user_id']
-            pending = NotificationScheduler.get_pending_notifications(user_id)
-            
-            for notification_data in pending:
-                NotificationScheduler.send_notification(user_id, notification_data)
-                sent_count += 1
-        
+
+        sent_count = NotificationScheduler.process_routine_reminders()
+
         if sent_count > 0:
             logger.info(f"Processed {sent_count} scheduled notifications")
-        
+
         return sent_count
 
 # Convenience function for external use
@@ -1,18 +1,113 @@
 from app.models.database import db
-from app.models.notification_schemas import NotificationSettings, UpdateNotificationSettingsRequest, Notification
+from app.models.notification_schemas import (
+    NotificationSettings, UpdateNotificationSettingsRequest, Notification, NotificationListResponse
+)
+from app.config.settings import (
+    NOTIFICATION_SETTINGS_CACHE_TTL_SECONDS, NOTIFICATION_SETTINGS_CACHE_SIZE, NOTIFICATION_COALESCE_WINDOW_SECONDS
+)
 from app.config.timezone import now_my
+from app.services.notification_background import notify_schedule_changed
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
 from typing import Optional
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import base64
+import json
+import logging
+import threading
+import time
 import uuid
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+# Read notifications move to the archive after this many days, unread ones after ARCHIVE_ALL_AFTER_DAYS
+ARCHIVE_READ_AFTER_DAYS = 30
+ARCHIVE_ALL_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+# Attempts at storing a lazily counted unread seed before returning the count unstored
+UNREAD_SEED_ATTEMPTS = 3
+
+class _SettingsCache:
+    """Per-process LRU of NotificationSettings with a TTL"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, NotificationSettings]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[NotificationSettings]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, settings = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return settings
+
+    def put(self, settings: NotificationSettings):
+        with self._lock:
+            self._entries[settings.user_id] = (time.monotonic() + self.ttl_seconds, settings)
+            self._entries.move_to_end(settings.user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+_settings_cache = _SettingsCache(NOTIFICATION_SETTINGS_CACHE_TTL_SECONDS, NOTIFICATION_SETTINGS_CACHE_SIZE)
+
+def _settings_from_doc(user_id: str, doc: Optional[dict]) -> NotificationSettings:
+    # Users without a stored document get the defaults; nothing is written on read
+    return NotificationSettings(**doc) if doc else NotificationSettings(user_id=user_id)
+
+def create_default_notification_settings(user_id: str) -> NotificationSettings:
+    """Materialize default settings for a new user (called at signup)"""
+    settings = NotificationSettings(user_id=user_id)
+    db.notification_settings.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": settings.dict(exclude={"user_id"})},
+        upsert=True
+    )
+    _settings_cache.put(settings)
+    return settings
+
 def get_notification_settings(user_id: str) -> NotificationSettings:
-    settings = db.notification_settings.find_one({"user_id": user_id})
-    if settings:
-        return NotificationSettings(**settings)
-    
-    # Create default settings if not found
-    new_settings = NotificationSettings(user_id=user_id)
-    db.notification_settings.insert_one(new_settings.dict())
-    return new_settings
+    settings = _settings_cache.get(user_id)
+    if settings is not None:
+        return settings
+
+    settings = _settings_from_doc(user_id, db.notification_settings.find_one({"user_id": user_id}))
+    _settings_cache.put(settings)
+    return settings
+
+def _get_notification_settings_many(user_ids: list[str], use_cache: bool = True) -> dict[str, NotificationSettings]:
+    """Resolve settings for many users, querying only the cache misses (or everyone without use_cache)"""
+    resolved: dict[str, NotificationSettings] = {}
+    missing: list[str] = []
+    for user_id in user_ids:
+        settings = _settings_cache.get(user_id) if use_cache else None
+        if settings is None:
+            missing.append(user_id)
+        else:
+            resolved[user_id] = settings
+
+    if missing:
+        docs = {doc["user_id"]: doc for doc in db.notification_settings.find({"user_id": {"$in": missing}})}
+        for user_id in missing:
+            settings = _settings_from_doc(user_id, docs.get(user_id))
+            _settings_cache.put(settings)
+            resolved[user_id] = settings
+    return resolved
 
 def update_notification_settings(user_id: str, settings: UpdateNotificationSettingsRequest) -> NotificationSettings:
     update_data = {k: v for k, v in settings.dict().items() if v is not None}
@@ -20,29 +115,37 @@ def update_notification_settings(user_id: str, settings: UpdateNotificationSetti
     if not update_data:
         return get_notification_settings(user_id)
         
-    db.notification_settings.update_one(
+    doc = db.notification_settings.find_one_and_update(
         {"user_id": user_id},
         {"$set": update_data},
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    
-    return get_notification_settings(user_id)
+    # Write-through so this process sees the change immediately
+    updated = _settings_from_doc(user_id, doc)
+    _settings_cache.put(updated)
 
-def create_notification(user_id: str, type: str, title: str, body: str, data: Optional[dict] = None):
-    """Create a notification if user has enabled notifications"""
-    settings = get_notification_settings(user_id)
+    from app.services.notification_scheduler import NotificationScheduler
+    NotificationScheduler.refresh_next_due(user_id)
+    notify_schedule_changed()
     
+    return updated
+
+def _is_notification_allowed(settings: NotificationSettings, type: str) -> bool:
+    """Apply the user's notification switches to a notification type"""
     # Check global switch
     if not settings.all_notifications_enabled:
-        return None
+        return False
         
     # Check specific switches based on type
     if type == 'message' and not settings.intelligent_nudges: # Assuming messages fall under nudges or general
         pass # For now, let's assume messages are important unless global is off
-    elif type == 'booking_update' and not settings.therapy_sessions:
-        return None
-        
-    notification = Notification(
+    elif type in ('booking_update', 'therapy_session_reminder') and not settings.therapy_sessions:
+        return False
+    return True
+
+def _build_notification(user_id: str, type: str, title: str, body: str, data: Optional[dict] = None) -> Notification:
+    return Notification(
         notification_id=str(uuid.uuid4()),
         user_id=user_id,
         type=type,
@@ -51,16 +154,269 @@ def create_notification(user_id: str, type: str, title: str, body: str, data: Op
         created_at=now_my().isoformat(),
         data=data
     )
+
+def _coalesce_notification(user_id: str, type: str, coalesce_key: str, title: str, body: str,
+                           data: Optional[dict]) -> Optional[Notification]:
+    """Fold into an unread notification with the same key whose window is still open"""
+    now = now_my()
+    doc = db.notifications.find_one_and_update(
+        {
+            "user_id": user_id,
+            "type": type,
+            "coalesce_key": coalesce_key,
+            "is_read": False,
+            "coalesce_until": {"$gt": now},
+        },
+        {
+            "$set": {"title": title, "body": body, "data": data, "created_at": now.isoformat()},
+            "$inc": {"count": 1},
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        return None
+
+    # A push still waiting in the queue carries the latest text; one already delivered is not repeated
+    db.push_queue.update_many(
+        {"notification_id": doc["notification_id"], "status": "pending"},
+        {"$set": {"title": title, "body": body}}
+    )
+    return Notification(**doc)
+
+def create_notification(user_id: str, type: str, title: str, body: str, data: Optional[dict] = None,
+                        coalesce_key: Optional[str] = None):
+    """Create a notification if user has enabled notifications
+
+    With a coalesce_key, notifications of the same type and key arriving within
+    NOTIFICATION_COALESCE_WINDOW_SECONDS update one unread notification and bump its count.
+    """
+    settings = get_notification_settings(user_id)
+    
+    if not _is_notification_allowed(settings, type):
+        return None
+
+    if coalesce_key:
+        coalesced = _coalesce_notification(user_id, type, coalesce_key, title, body, data)
+        if coalesced:
+            return coalesced
+        
+    notification = _build_notification(user_id, type, title, body, data)
+    doc = notification.dict()
+    if coalesce_key:
+        doc["coalesce_key"] = coalesce_key
+        doc["coalesce_until"] = now_my() + timedelta(seconds=NOTIFICATION_COALESCE_WINDOW_SECONDS)
     
-    db.notifications.insert_one(notification.dict())
+    with _unread_change([user_id]) as deltas:
+        db.notifications.insert_one(doc)
+        deltas[user_id] = 1
+    _enqueue_push([notification])
     return notification
 
-def get_user_notifications(user_id: str):
-    notifications = list(db.notifications.find({"user_id": user_id}).sort("created_at", -1))
-    return notifications
+def create_notifications_bulk(items: list[dict], fresh_settings: bool = False) -> list[Optional[Notification]]:
+    """Create many notifications with one settings query and one insert.
+
+    Each item carries user_id, type, title, body and optional data. The result
+    is aligned with the input; entries suppressed by user settings are None.
+    The settings cache is per process and can trail a change made through
+    another process, so the scheduler passes fresh_settings=True.
+    """
+    if not items:
+        return []
+
+    settings_map = _get_notification_settings_many(
+        list({item["user_id"] for item in items}), use_cache=not fresh_settings
+    )
+
+    results: list[Optional[Notification]] = []
+    for item in items:
+        settings = settings_map[item["user_id"]]
+        if not _is_notification_allowed(settings, item["type"]):
+            results.append(None)
+            continue
+        results.append(_build_notification(
+            user_id=item["user_id"],
+            type=item["type"],
+            title=item["title"],
+            body=item["body"],
+            data=item.get("data"),
+        ))
+
+    docs = [notification.dict() for notification in results if notification is not None]
+    if docs:
+        with _unread_change([doc["user_id"] for doc in docs]) as deltas:
+            db.notifications.insert_many(docs, ordered=False)
+            for doc in docs:
+                deltas[doc["user_id"]] = deltas.get(doc["user_id"], 0) + 1
+        _enqueue_push([notification for notification in results if notification is not None])
+    return results
+
+def _enqueue_push(notifications: list[Notification]):
+    # Push is best effort; the notification is already stored for polling clients
+    from app.services.push_service import enqueue_notifications
+    try:
+        enqueue_notifications(notifications)
+    except Exception as e:
+        logger.error(f"Failed to queue push notifications: {e}")
+
+@contextmanager
+def _unread_change(user_ids: list[str]):
+    """Bracket a change to users' unread notifications and apply the yielded deltas after it.
+
+    Before the change each counter is marked pending and its version bumped (a missing
+    counter is created unseeded), so get_unread_count never persists a seed that
+    raced a change still in flight.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if user_ids:
+        db.notification_counters.bulk_write([
+            UpdateOne(
+                {"_id": user_id},
+                {"$inc": {"pending": 1, "version": 1}, "$setOnInsert": {"unread_count": 0, "seeded": False}},
+                upsert=True
+            )
+            for user_id in user_ids
+        ], ordered=False)
+    deltas: dict[str, int] = {}
+    try:
+        yield deltas
+    finally:
+        if user_ids:
+            db.notification_counters.bulk_write([
+                UpdateOne({"_id": user_id}, {"$inc": {"unread_count": deltas.get(user_id, 0), "pending": -1}})
+                for user_id in user_ids
+            ], ordered=False)
+
+def get_unread_count(user_id: str) -> int:
+    """Read the user's unread counter, seeding it from the notifications on first use.
+
+    A counter created by a change before any read carries seeded=False. The seed
+    is only stored when no change was in flight while counting and none started
+    since (same version); otherwise the fresh count is returned without storing it.
+    """
+    counter = db.notification_counters.find_one({"_id": user_id})
+    unread = 0
+    for _ in range(UNREAD_SEED_ATTEMPTS):
+        if counter is not None and counter.get("seeded", True):
+            return max(counter.get("unread_count", 0), 0)
+        unread = db.notifications.count_documents({"user_id": user_id, "is_read": False})
+        if counter is None:
+            try:
+                db.notification_counters.insert_one(
+                    {"_id": user_id, "unread_count": unread, "pending": 0, "version": 0}
+                )
+                return unread
+            except DuplicateKeyError:
+                pass
+        elif counter.get("pending", 0) == 0:
+            seeded = db.notification_counters.update_one(
+                {"_id": user_id, "seeded": False, "pending": 0, "version": counter.get("version", 0)},
+                {"$set": {"unread_count": unread, "seeded": True}}
+            )
+            if seeded.matched_count:
+                return unread
+        counter = db.notification_counters.find_one({"_id": user_id})
+    return unread
+
+def _encode_inbox_cursor(created_at: str, notification_id: str) -> str:
+    raw = json.dumps({"t": created_at, "id": notification_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_inbox_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid notification cursor") from exc
+
+def get_user_notifications(user_id: str, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                           unread_only: bool = False) -> NotificationListResponse:
+    """Return one page of the inbox, newest first, keyed on (created_at, notification_id)"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query: dict = {"user_id": user_id}
+    if unread_only:
+        query["is_read"] = False
+    if cursor:
+        created_at, notification_id = _decode_inbox_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "notification_id": {"$lt": notification_id}},
+        ]
+
+    docs = list(
+        db.notifications.find(query, {"_id": 0})
+        .sort([("created_at", -1), ("notification_id", -1)])
+        .limit(limit + 1)
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = _encode_inbox_cursor(docs[-1]["created_at"], docs[-1]["notification_id"])
+
+    return NotificationListResponse(
+        notifications=[Notification(**doc) for doc in docs],
+        next_cursor=next_cursor,
+        has_more=has_more
+    )
 
 def mark_notification_read(notification_id: str):
-    db.notifications.update_one(
-        {"notification_id": notification_id},
-        {"$set": {"is_read": True}}
+    notification = db.notifications.find_one(
+        {"notification_id": notification_id, "is_read": False},
+        {"user_id": 1}
     )
+    if notification is None:
+        return
+    with _unread_change([notification["user_id"]]) as deltas:
+        result = db.notifications.update_one(
+            {"notification_id": notification_id, "is_read": False},
+            {"$set": {"is_read": True}}
+        )
+        deltas[notification["user_id"]] = -result.modified_count
+
+def mark_notifications_read(user_id: str, notification_ids: Optional[list[str]] = None) -> int:
+    """Mark the given notifications (or all of them) as read for a user"""
+    query: dict = {"user_id": user_id, "is_read": False}
+    if notification_ids is not None:
+        if not notification_ids:
+            return 0
+        query["notification_id"] = {"$in": notification_ids}
+
+    with _unread_change([user_id]) as deltas:
+        result = db.notifications.update_many(query, {"$set": {"is_read": True}})
+        # A delta, not a reset: a notification created meanwhile must stay counted
+        deltas[user_id] = -result.modified_count
+    return result.modified_count
+
+def archive_old_notifications() -> int:
+    """Move old notifications out of the live inbox into notifications_archive"""
+    now = now_my()
+    read_cutoff = (now - timedelta(days=ARCHIVE_READ_AFTER_DAYS)).isoformat()
+    all_cutoff = (now - timedelta(days=ARCHIVE_ALL_AFTER_DAYS)).isoformat()
+    query = {"$or": [
+        {"created_at": {"$lt": all_cutoff}},
+        {"created_at": {"$lt": read_cutoff}, "is_read": True},
+    ]}
+
+    archived = 0
+    while True:
+        docs = list(db.notifications.find(query).limit(ARCHIVE_BATCH_SIZE))
+        if not docs:
+            break
+        try:
+            db.notifications_archive.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Documents copied by an earlier interrupted run are already archived
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        with _unread_change([doc["user_id"] for doc in docs]) as deltas:
+            db.notifications.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            for doc in docs:
+                if not doc.get("is_read", False):
+                    deltas[doc["user_id"]] = deltas.get(doc["user_id"], 0) - 1
+        archived += len(docs)
+
+    if archived:
+        logger.info(f"Archived {archived} notifications")
+    return archived
@@ -0,0 +1,341 @@
+"""
+Push Delivery Service
+Device token registry, persistent push queue and pluggable transports
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config.settings import FCM_CREDENTIALS_FILE, FCM_PROJECT_ID, PUSH_TRANSPORT
+from app.config.timezone import now_my
+from app.models.database import db
+from app.services.leader_election import check_fence
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Items claimed per chunk; a tick keeps claiming chunks until its time budget is spent
+PUSH_BATCH_SIZE = 100
+# Stop claiming new chunks after this long so a tick never stalls the worker's job loop
+PUSH_TICK_BUDGET_SECONDS = 4
+# Concurrent FCM requests per chunk
+PUSH_CONCURRENCY = 16
+MAX_PUSH_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+# A claimed batch not finished within this window is picked up again
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+class PushResult:
+    """Outcome of a single push send"""
+
+    OK = "ok"
+    RETRY = "retry"                  # transient failure, try again later
+    INVALID_TOKEN = "invalid_token"  # token is gone, drop it
+    REJECTED = "rejected"            # permanent failure for this message
+    SKIPPED = "skipped"              # no delivering transport configured; nothing was sent
+
+    def __init__(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+
+
+class PushTransport:
+    """Sends a batch of push messages; results are aligned with the input"""
+
+    name = "base"
+
+    def send_batch(self, messages: List[Dict]) -> List[PushResult]:
+        raise NotImplementedError
+
+
+class LocalPushTransport(PushTransport):
+    """Stand-in transport for development: logs messages and keeps the most recent ones
+
+    Nothing is delivered, so every message is reported as skipped rather than sent.
+    """
+
+    name = "local"
+    HISTORY_SIZE = 100
+
+    def __init__(self):
+        self.recent: deque = deque(maxlen=self.HISTORY_SIZE)
+
+    def send_batch(self, messages: List[Dict]) -> List[PushResult]:
+        for message in messages:
+            self.recent.append(message)
+            logger.debug(f"Local push to {message['token']}: {message['title']}")
+        return [PushResult(PushResult.SKIPPED, "no push transport configured") for _ in messages]
+
+
+class FcmPushTransport(PushTransport):
+    """Firebase Cloud Messaging HTTP v1 transport
+
+    HTTP v1 wants a short-lived OAuth2 access token; it is minted from service-account
+    credentials and refreshed shortly before it expires, or when FCM answers 401.
+    """
+
+    name = "fcm"
+    REQUEST_TIMEOUT = 10
+    SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
+
+    def __init__(self, project_id: str, credentials):
+        self.url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+        self.credentials = credentials
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=PUSH_CONCURRENCY))
+        self._token_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=PUSH_CONCURRENCY, thread_name_prefix="fcm-push")
+
+    @classmethod
+    def from_service_account_file(cls, path: str, project_id: Optional[str] = None) -> "FcmPushTransport":
+        from google.oauth2 import service_account
+
+        credentials = service_account.Credentials.from_service_account_file(path, scopes=cls.SCOPES)
+        return cls(project_id or credentials.project_id, credentials)
+
+    def _authorization(self, force_refresh: bool = False) -> str:
+        from google.auth.transport.requests import Request
+
+        with self._token_lock:
+            # valid is False once the token is within google-auth's refresh margin of expiry
+            if force_refresh or not self.credentials.valid:
+                self.credentials.refresh(Request(self.session))
+            return f"Bearer {self.credentials.token}"
+
+    def _send_one(self, message: Dict) -> PushResult:
+        from google.auth.exceptions import GoogleAuthError
+
+        payload = {
+            "message": {
+                "token": message["token"],
+                "notification": {"title": message["title"], "body": message["body"]},
+                # FCM data values must be strings
+                "data": {key: str(value) for key, value in (message.get("data") or {}).items()},
+            }
+        }
+        # A 401 means the access token was revoked or expired early: refresh once and resend
+        for attempt in range(2):
+            try:
+                headers = {"Authorization": self._authorization(force_refresh=attempt > 0)}
+            except GoogleAuthError as e:
+                return PushResult(PushResult.RETRY, f"token refresh failed: {e}")
+            try:
+                response = self.session.post(self.url, json=payload, headers=headers, timeout=self.REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                return PushResult(PushResult.RETRY, str(e))
+            if response.status_code != 401:
+                break
+
+        if response.status_code == 200:
+            return PushResult(PushResult.OK)
+        if response.status_code == 401:
+            # Still unauthorized with a fresh token: a credentials problem, not a bad message
+            return PushResult(PushResult.RETRY, response.text[:200])
+        if response.status_code == 404 or "UNREGISTERED" in response.text:
+            return PushResult(PushResult.INVALID_TOKEN, response.text[:200])
+        if response.status_code == 429 or response.status_code >= 500:
+            return PushResult(PushResult.RETRY, response.text[:200])
+        return PushResult(PushResult.REJECTED, response.text[:200])
+
+    def send_batch(self, messages: List[Dict]) -> List[PushResult]:
+        # HTTP v1 has no batch endpoint, so requests go out in parallel over pooled connections
+        return list(self._pool.map(self._send_one, messages))
+
+
+def _build_transport() -> PushTransport:
+    if PUSH_TRANSPORT == "fcm":
+        if not FCM_CREDENTIALS_FILE:
+            logger.warning("PUSH_TRANSPORT=fcm but FCM_CREDENTIALS_FILE is not set; using local transport")
+            return LocalPushTransport()
+        try:
+            return FcmPushTransport.from_service_account_file(FCM_CREDENTIALS_FILE, FCM_PROJECT_ID or None)
+        except ImportError:
+            logger.warning("PUSH_TRANSPORT=fcm needs the google-auth package; using local transport")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load FCM service account from {FCM_CREDENTIALS_FILE}: {e}; using local transport")
+        return LocalPushTransport()
+    return LocalPushTransport()
+
+
+transport: PushTransport = _build_transport()
+
+
+def set_transport(new_transport: PushTransport):
+    """Swap the transport (e.g. a LocalPushTransport in tests)"""
+    global transport
+    transport = new_transport
+
+
+# ---- Device token registry ----
+
+def register_device(user_id: str, token: str, platform: str = "android") -> Dict:
+    """Register or move a device token to a user"""
+    now = now_my()
+    return db.device_tokens.find_one_and_update(
+        {"token": token},
+        {
+            "$set": {"user_id": user_id, "platform": platform, "last_seen_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def unregister_device(token: str) -> bool:
+    return db.device_tokens.delete_one({"token": token}).deleted_count > 0
+
+
+# ---- Queue ----
+
+def enqueue_notifications(notifications: List) -> int:
+    """Queue a push per registered device for each stored notification"""
+    if not notifications:
+        return 0
+
+    user_ids = list({notification.user_id for notification in notifications})
+    tokens_by_user: Dict[str, List[str]] = {}
+    for device in db.device_tokens.find({"user_id": {"$in": user_ids}}, {"user_id": 1, "token": 1}):
+        tokens_by_user.setdefault(device["user_id"], []).append(device["token"])
+    if not tokens_by_user:
+        return 0
+
+    now = now_my()
+    jobs = []
+    for notification in notifications:
+        for token in tokens_by_user.get(notification.user_id, []):
+            jobs.append({
+                "push_id": str(uuid.uuid4()),
+                "notification_id": notification.notification_id,
+                "user_id": notification.user_id,
+                "token": token,
+                "title": notification.title,
+                "body": notification.body,
+                "data": {**(notification.data or {}), "notification_id": notification.notification_id,
+                         "type": notification.type},
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now,
+            })
+    if jobs:
+        db.push_queue.insert_many(jobs, ordered=False)
+        metrics.increment("push_enqueued_total", len(jobs))
+    return len(jobs)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff with jitter so a failing batch does not retry in lockstep
+    delay = min(RETRY_BASE_SECONDS * (2 ** (attempts - 1)), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim_batch(now) -> List[Dict]:
+    candidates = db.push_queue.find(
+        {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "claimed_until": {"$lt": now}},
+        ]},
+        {"_id": 1}
+    ).sort("next_attempt_at", 1).limit(PUSH_BATCH_SIZE)
+    ids = [job["_id"] for job in candidates]
+    if not ids:
+        return []
+
+    claim_id = str(uuid.uuid4())
+    db.push_queue.update_many(
+        {"_id": {"$in": ids}, "$or": [
+            {"status": "pending"},
+            {"status": "sending", "claimed_until": {"$lt": now}},
+        ]},
+        {"$set": {"status": "sending", "claim_id": claim_id, "claimed_until": now + CLAIM_TIMEOUT}}
+    )
+    return list(db.push_queue.find({"claim_id": claim_id}))
+
+
+def _send_claimed(batch: List[Dict], now) -> int:
+    """Send a claimed chunk and record each outcome on its queue item"""
+    results = transport.send_batch(batch)
+
+    updates = []
+    invalid_tokens = set()
+    sent = 0
+    for job, result in zip(batch, results):
+        metrics.increment("push_attempts_total", transport=transport.name, result=result.status)
+        if result.status == PushResult.OK:
+            sent += 1
+            created_at = job["created_at"]
+            if created_at.tzinfo is None:
+                # pymongo returns naive UTC datetimes
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            latency = (now - created_at).total_seconds()
+            metrics.observe("push_delivery_latency_seconds", max(latency, 0), transport=transport.name)
+            updates.append(UpdateOne({"_id": job["_id"]}, {
+                "$set": {"status": "sent", "completed_at": now},
+                "$unset": {"claim_id": "", "claimed_until": ""},
+            }))
+            continue
+
+        if result.status == PushResult.SKIPPED:
+            # Finished without delivery; completed_at lets the TTL index remove it
+            updates.append(UpdateOne({"_id": job["_id"]}, {
+                "$set": {"status": "skipped", "last_error": result.error, "completed_at": now},
+                "$unset": {"claim_id": "", "claimed_until": ""},
+            }))
+            continue
+
+        attempts = job.get("attempts", 0) + 1
+        if result.status == PushResult.INVALID_TOKEN:
+            invalid_tokens.add(job["token"])
+        if result.status == PushResult.RETRY and attempts < MAX_PUSH_ATTEMPTS:
+            updates.append(UpdateOne({"_id": job["_id"]}, {
+                "$set": {"status": "pending", "attempts": attempts, "last_error": result.error,
+                         "next_attempt_at": now + _retry_delay(attempts)},
+                "$unset": {"claim_id": "", "claimed_until": ""},
+            }))
+        else:
+            updates.append(UpdateOne({"_id": job["_id"]}, {
+                "$set": {"status": "failed", "attempts": attempts, "last_error": result.error,
+                         "completed_at": now},
+                "$unset": {"claim_id": "", "claimed_until": ""},
+            }))
+
+    if updates:
+        db.push_queue.bulk_write(updates, ordered=False)
+    if invalid_tokens:
+        db.device_tokens.delete_many({"token": {"$in": list(invalid_tokens)}})
+        logger.info(f"Removed {len(invalid_tokens)} invalid device tokens")
+
+    logger.info(f"Push chunk: {sent}/{len(batch)} delivered via {transport.name}")
+    return sent
+
+
+def process_push_queue() -> int:
+    """Send due pushes in chunks until the queue is drained or the tick's time budget is spent"""
+    started = time.monotonic()
+    sent = 0
+    while time.monotonic() - started < PUSH_TICK_BUDGET_SECONDS:
+        check_fence()
+        now = now_my()
+        batch = _claim_batch(now)
+        if not batch:
+            break
+        sent += _send_claimed(batch, now)
+        if len(batch) < PUSH_BATCH_SIZE:
+            break
+
+    metrics.set_gauge("push_queue_pending", db.push_queue.count_documents({"status": "pending"}))
+    return sent
@@ -1,19 +1,27 @@
 import uuid
 import logging
-from datetime import datetime, time, timedelta, timezone
+from datetime import datetime, time, timedelta
 from typing import Optional
 from fastapi import HTTPException
+from pymongo import DeleteMany, InsertOne
 from ..models.database import db
 from ..models.schemas import (
     SetAvailabilityRequest, AvailabilityResponse, TherapistScheduleResponse, 
     DashboardAppointment, TherapistDashboardResponse, UpcomingAvailability,
-    EditAvailabilityRequest, NextAvailabilityResponse
+    EditAvailabilityRequest, NextAvailabilityResponse, CalendarDayCounts, TherapistCalendarResponse,
+    AvailabilityRule, BulkAvailabilityRequest, BulkAvailabilityResponse
 )
-from ..config.timezone import now_my, get_malaysia_tz, make_aware_malaysia
+from ..config.settings import DASHBOARD_CACHE_TTL_SECONDS
+from ..config.timezone import now_my, make_aware_malaysia
+from . import availability_engine, day_grid
 
 logger = logging.getLogger(__name__)
 
 VALID_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Bulk editor limits
+MAX_RULE_RANGE_DAYS = 186
+MAX_BULK_SLOTS = 5000
+MIN_SLOT_MINUTES = 15
 
 def _parse_time_string(time_str: str) -> time:
     """Parse time string in format 'HH:MM AM/PM' to time object"""
@@ -35,15 +43,18 @@ def _time_to_minutes(time_obj: time) -> int:
     return time_obj.hour * 60 + time_obj.minute
 
 
-def _time_string_to_minutes(time_str: str | None) -> Optional[int]:
-    """Convert a time label like '2:00 PM' to minutes since midnight."""
+def _minutes_to_label(minutes: int) -> str:
+    return _time_to_string(time(minutes // 60, minutes % 60))
+
+
+def _find_overlap(spans: list[tuple[int, int]]) -> Optional[tuple[tuple[int, int], tuple[int, int]]]:
+    """Sort-and-sweep over (start, end) minute spans; returns the first overlapping pair"""
+    ordered = sorted(spans)
+    for previous, current in zip(ordered, ordered[1:]):
+        if current[0] < previous[1]:
+            return previous, current
+    return None
 
-    if not time_str:
-        return None
-    try:
-        return _time_to_minutes(_parse_time_string(time_str))
-    except HTTPException:
-        return None
 
 def set_therapist_availability(payload: SetAvailabilityRequest) -> dict:
     """Set or update therapist availability for a specific day or date"""
@@ -92,27 +103,24 @@ def set_therapist_availability(payload: SetAvailabilityRequest) -> dict:
         ]
     }))
     
-    # Validate each new slot doesn't overlap with other new slots
-    for i, slot in enumerate(payload.slots):
+    # Validate the new slots don't overlap each other
+    spans = []
+    for slot in payload.slots:
         start_time = _parse_time_string(slot.start_time)
         end_time = _parse_time_string(slot.end_time)
         
         # Validate start time is before end time
         if start_time >= end_time:
             raise HTTPException(status_code=400, detail="Start time must be before end time")
-        
-        # Check against other new slots
-        for j, other_slot in enumerate(payload.slots):
-            if i != j:
-                other_start = _parse_time_string(other_slot.start_time)
-                other_end = _parse_time_string(other_slot.end_time)
-                
-                # Check if times overlap
-                if not (end_time <= other_start or start_time >= other_end):
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Time slot {slot.start_time}-{slot.end_time} overlaps with {other_slot.start_time}-{other_slot.end_time}"
-                    )
+        spans.append((_time_to_minutes(start_time), _time_to_minutes(end_time)))
+    overlap = _find_overlap(spans)
+    if overlap:
+        first, second = overlap
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time slot {_minutes_to_label(first[0])}-{_minutes_to_label(first[1])} overlaps with "
+                   f"{_minutes_to_label(second[0])}-{_minutes_to_label(second[1])}"
+        )
     
     # Insert new availability slots
     inserted_ids = []
@@ -126,6 +134,7 @@ def set_therapist_availability(payload: SetAvailabilityRequest) -> dict:
             "day_of_week": day_lower,
             "start_time": _time_to_string(start_time),
             "end_time": _time_to_string(end_time),
+            **day_grid.grid_fields(_time_to_minutes(start_time), _time_to_minutes(end_time)),
             "is_available": payload.is_available,
             "availability_date": payload.availability_date,  # Store specific date if provided
             "created_at": now,
@@ -136,6 +145,7 @@ def set_therapist_availability(payload: SetAvailabilityRequest) -> dict:
         inserted_ids.append(availability_doc["availability_id"])
     
     logger.info(f"Set availability for therapist {payload.user_id} on {day_lower}: {len(inserted_ids)} slots")
+    availability_engine.on_calendar_changed(payload.user_id)
     
     return {
         "success": True,
@@ -169,6 +179,7 @@ def delete_availability_slot(availability_id: str, user_id: str) -> dict:
         raise HTTPException(status_code=404, detail="Availability slot not found")
     
     logger.info(f"Deleted availability slot {availability_id} for therapist {user_id}")
+    availability_engine.on_calendar_changed(user_id)
     
     return {
         "success": True,
@@ -187,17 +198,15 @@ def get_therapist_schedule(user_id: str, date: str) -> TherapistScheduleResponse
     # Get day of week
     day_name = target_date.strftime("%A").lower()
     
-    malaysia_tz = get_malaysia_tz()
+    # Sessions stored during this Malaysia calendar day
+    start_of_day = make_aware_malaysia(target_date)
+    end_of_day = start_of_day + timedelta(days=1)
 
-    # Get sessions for this date
-    start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
     sessions = list(db.therapy_sessions.find({
         "therapist_user_id": user_id,
         "scheduled_at": {
             "$gte": start_of_day,
-            "$lte": end_of_day
+            "$lt": end_of_day
         },
         "$or": [
             {"slot_released": {"$exists": False}},
@@ -209,47 +218,19 @@ def get_therapist_schedule(user_id: str, date: str) -> TherapistScheduleResponse
 
     # Enrich sessions with client info and normalize time labels
     for session in sessions:
-        scheduled_value = session.get("scheduled_at")
-        scheduled_dt: Optional[datetime] = None
-        if isinstance(scheduled_value, datetime):
-            scheduled_dt = scheduled_value
-            if scheduled_dt.tzinfo is None:
-                # Treat naive values as UTC before shifting to Malaysia time
-                scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc).astimezone(malaysia_tz)
-            else:
-                scheduled_dt = scheduled_dt.astimezone(malaysia_tz)
-        elif isinstance(scheduled_value, str):
-            try:
-                scheduled_dt = datetime.fromisoformat(scheduled_value.replace("Z", "+00:00"))
-                if scheduled_dt.tzinfo is None:
-                    scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
-                scheduled_dt = scheduled_dt.astimezone(malaysia_tz)
-            except ValueError:
-                scheduled_dt = None
-
+        scheduled_dt = availability_engine.to_local(session["scheduled_at"])
         duration = int(session.get("duration_minutes", 50))
-        start_minutes = None
-
-        if scheduled_dt is not None:
-            start_minutes = scheduled_dt.hour * 60 + scheduled_dt.minute
-        else:
-            start_minutes = _time_string_to_minutes(session.get("start_time"))
-            if start_minutes is not None:
-                scheduled_dt = start_of_day + timedelta(minutes=start_minutes)
-                scheduled_dt = make_aware_malaysia(scheduled_dt)
-
-        if scheduled_dt is not None and start_minutes is not None:
-            normalized_start = scheduled_dt.strftime("%I:%M %p")
-            normalized_end = (scheduled_dt + timedelta(minutes=duration)).strftime("%I:%M %p")
-            session["start_time"] = normalized_start
-            if not session.get("end_time"):
-                session["end_time"] = normalized_end
-            session_windows.append({
-                "start": start_minutes,
-                "end": start_minutes + duration,
-                "session_id": session.get("session_id"),
-                "status": (session.get("session_status") or session.get("status") or "scheduled").lower(),
-            })
+        start_minutes = scheduled_dt.hour * 60 + scheduled_dt.minute
+
+        session["start_time"] = scheduled_dt.strftime("%I:%M %p")
+        if not session.get("end_time"):
+            session["end_time"] = (scheduled_dt + timedelta(minutes=duration)).strftime("%I:%M %p")
+        session_windows.append({
+            "start": start_minutes,
+            "end": start_minutes + duration,
+            "session_id": session.get("session_id"),
+            "status": (session.get("session_status") or session.get("status") or "scheduled").lower(),
+        })
 
         client = db.user_profile.find_one({"user_id": session["user_id"]}, {"_id": 0})
         if client:
@@ -268,8 +249,8 @@ def get_therapist_schedule(user_id: str, date: str) -> TherapistScheduleResponse
     }, {"_id": 0}).sort("start_time", 1))
 
     for slot in availability_slots:
-        slot_start = _time_string_to_minutes(slot.get("start_time"))
-        slot_end = _time_string_to_minutes(slot.get("end_time"))
+        minutes = availability_engine.slot_minutes(slot)
+        slot_start, slot_end = minutes if minutes else (None, None)
 
         is_booked = False
         booked_status = None
@@ -318,166 +299,138 @@ def get_today_sessions(user_id: str) -> list[dict]:
     schedule = get_therapist_schedule(user_id, today_date)
     return schedule.sessions
 
-def get_therapist_dashboard(user_id: str) -> TherapistDashboardResponse:
-    """Get therapist dashboard data including today's appointments"""
-    
-    # Get therapist profile
-    therapist = db.therapist_profile.find_one({
-        "user_id": user_id,
-        "verification_status": "approved"
-    })
-    if not therapist:
-        raise HTTPException(status_code=404, detail="Approved therapist profile not found")
-    
-    therapist_name = f"Dr. {therapist.get('first_name', 'Therapist')}"
-    
-    # Get today's sessions
-    now = now_my()
-    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    sessions = list(db.therapy_sessions.find({
-        "therapist_user_id": user_id,
-        "scheduled_at": {
-            "$gte": start_of_day,
-            "$lte": end_of_day
-        },
-        "session_status": {"$in": ["scheduled", "confirmed"]}
-    }, {"_id": 0}).sort("scheduled_at", 1))
-    
-    # Format appointments for dashboard
+DASHBOARD_UPCOMING_DAYS = 5
+DASHBOARD_CACHE_SIZE = 1024
+
+_dashboard_cache = availability_engine.TherapistCache(DASHBOARD_CACHE_TTL_SECONDS, DASHBOARD_CACHE_SIZE)
+
+
+def _today_appointments(user_id: str, start_of_day: datetime) -> list[DashboardAppointment]:
+    """Today's active sessions with client names joined in by one aggregation"""
+    sessions = db.therapy_sessions.aggregate([
+        {"$match": {
+            "therapist_user_id": user_id,
+            "scheduled_at": {"$gte": start_of_day, "$lt": start_of_day + timedelta(days=1)},
+            "session_status": {"$in": ["scheduled", "confirmed"]},
+        }},
+        {"$sort": {"scheduled_at": 1}},
+        {"$lookup": {
+            "from": "user_profile",
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "client",
+        }},
+        {"$project": {
+            "_id": 0,
+            "scheduled_at": 1,
+            "session_type": 1,
+            "client": {"$arrayElemAt": ["$client", 0]},
+        }},
+    ])
+
     appointments = []
     for session in sessions:
-        # Get client info
-        client = db.user_profile.find_one({"user_id": session["user_id"]}, {"_id": 0})
+        client = session.get("client") or {}
+        first_name = client.get('first_name', '')
+        last_name = client.get('last_name', '')
         client_name = "Unknown Client"
-        if client:
-            first_name = client.get('first_name', '')
-            last_name = client.get('last_name', '')
-            if first_name and last_name:
-                client_name = f"{first_name} {last_name[0]}."
-            elif first_name:
-                client_name = first_name
-        
-        # Format time
-        scheduled_time = session["scheduled_at"]
-        time_str = scheduled_time.strftime("%I:%M").lstrip("0")  # Remove leading zero
-        period = scheduled_time.strftime("%p")
-        
-        # Format session description
+        if first_name and last_name:
+            client_name = f"{first_name} {last_name[0]}."
+        elif first_name:
+            client_name = first_name
+
+        scheduled_time = availability_engine.to_local(session["scheduled_at"])
         session_type = session.get("session_type", "Session")
-        session_desc = f"{session_type.replace('_', ' ').title()} (Online)"
-        
         appointments.append(DashboardAppointment(
-            time=time_str,
-            period=period,
+            time=scheduled_time.strftime("%I:%M").lstrip("0"),  # Remove leading zero
+            period=scheduled_time.strftime("%p"),
             name=client_name,
-            session=session_desc
+            session=f"{session_type.replace('_', ' ').title()} (Online)"
         ))
-    
-    # Get upcoming availability (next 5 days with scheduled availability)
-    upcoming = get_upcoming_availability(user_id, 5)
-    
-    return TherapistDashboardResponse(
-        therapist_name=therapist_name,
+    return appointments
+
+
+def get_therapist_dashboard(user_id: str) -> TherapistDashboardResponse:
+    """Get therapist dashboard data including today's appointments"""
+    now = now_my()
+    cache_key = (user_id, now.date())
+    cached = _dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    therapist = db.therapist_profile.find_one(
+        {"user_id": user_id, "verification_status": "approved"},
+        {"first_name": 1}
+    )
+    if not therapist:
+        raise HTTPException(status_code=404, detail="Approved therapist profile not found")
+
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    appointments = _today_appointments(user_id, start_of_day)
+
+    dashboard = TherapistDashboardResponse(
+        therapist_name=f"Dr. {therapist.get('first_name', 'Therapist')}",
         today_appointments=appointments,
         total_today=len(appointments),
-        upcoming_availability=upcoming
+        upcoming_availability=get_upcoming_availability(user_id, DASHBOARD_UPCOMING_DAYS)
     )
+    _dashboard_cache.put(cache_key, dashboard)
+    return dashboard
+
 
 def get_upcoming_availability(user_id: str, days: int = 5) -> list[UpcomingAvailability]:
-    """Get upcoming availability for the next N days"""
-    
-    now = now_my()
+    """Get upcoming availability for the next N days, starting tomorrow, from one query"""
+    first_day = now_my().date() + timedelta(days=1)
+    specific, recurring = availability_engine.load_availability(user_id, first_day, first_day + timedelta(days=days - 1))
+
     upcoming_list = []
-    
-    for i in range(1, days + 1):  # Start from tomorrow
-        target_date = now + __import__('datetime').timedelta(days=i)
-        date_str = target_date.strftime("%Y-%m-%d")
-        day_name = target_date.strftime("%A")
-        day_lower = day_name.lower()
-        
-        # Get availability for this date (specific date or recurring)
-        availability_slots = list(db.therapist_availability.find({
-            "$or": [
-                {"user_id": user_id, "availability_date": date_str},  # Specific date
-                {"user_id": user_id, "day_of_week": day_lower, "availability_date": None}  # Recurring
-            ]
-        }, {"_id": 0}).sort("start_time", 1))
-        
-        if availability_slots:  # Only include days with availability
-            slots_list = []
-            for slot in availability_slots:
-                slots_list.append({
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        templates = availability_engine.templates_for(day, specific, recurring)
+        if not templates:  # Only include days with availability
+            continue
+        templates = sorted(templates, key=lambda slot: availability_engine.slot_minutes(slot) or (0, 0))
+        upcoming_list.append(UpcomingAvailability(
+            date=day.isoformat(),
+            day_name=day.strftime("%A"),
+            slots=[
+                {
                     "availability_id": slot.get("availability_id"),
                     "start_time": slot.get("start_time"),
                     "end_time": slot.get("end_time")
-                })
-            
-            upcoming_list.append(UpcomingAvailability(
-                date=date_str,
-                day_name=day_name,
-                slots=slots_list
-            ))
-    
+                }
+                for slot in templates
+            ]
+        ))
+
     return upcoming_list
 
 def get_next_available_slot(user_id: str, search_days: int = 30) -> NextAvailabilityResponse:
     """Find the next available slot for a therapist within the next search_days."""
 
     now = now_my()
-    current_minutes = now.hour * 60 + now.minute
-    tzinfo = now.tzinfo
-
-    for offset in range(search_days + 1):
-        target_datetime = now + timedelta(days=offset)
-        date_str = target_datetime.strftime("%Y-%m-%d")
-        try:
-            schedule = get_therapist_schedule(user_id, date_str)
-        except HTTPException:
-            continue
-
-        for slot in schedule.availability_slots:
-            if not slot.get("is_available", True):
-                continue
-            if slot.get("is_booked"):
-                continue
-
-            start_label = slot.get("start_time")
-            end_label = slot.get("end_time")
-            if not start_label or not end_label:
-                continue
-
-            start_minutes = _time_string_to_minutes(start_label)
-            end_minutes = _time_string_to_minutes(end_label)
-            if start_minutes is None or end_minutes is None:
-                continue
-            if end_minutes <= start_minutes:
-                continue
-            if offset == 0 and start_minutes <= current_minutes:
-                # Skip slots that already started today
-                continue
-
-            start_time = _parse_time_string(start_label)
-            end_time = _parse_time_string(end_label)
-            start_dt = datetime.combine(target_datetime.date(), start_time)
-            end_dt = datetime.combine(target_datetime.date(), end_time)
-            if tzinfo is not None:
-                start_dt = start_dt.replace(tzinfo=tzinfo)
-                end_dt = end_dt.replace(tzinfo=tzinfo)
-
-            minutes_until = max(0, int((start_dt - now).total_seconds() // 60))
-            day_name = start_dt.strftime("%A")
+    profile = db.therapist_profile.find_one(
+        {"user_id": user_id},
+        {"next_available": 1, "next_available_computed_at": 1}
+    )
+    if profile and availability_engine.is_next_available_fresh(profile, now):
+        next_available = profile.get("next_available")
+    else:
+        next_available = availability_engine.refresh_next_available(user_id) if profile else None
 
+    if next_available:
+        start_dt = availability_engine.to_local(next_available["start_at"])
+        end_dt = availability_engine.to_local(next_available["end_at"])
+        if start_dt.date() <= (now + timedelta(days=search_days)).date():
             return NextAvailabilityResponse(
                 has_availability=True,
-                date=date_str,
-                day_name=day_name,
-                start_time=start_label,
-                end_time=end_label,
+                date=next_available["date"],
+                day_name=start_dt.strftime("%A"),
+                start_time=next_available["start_time"],
+                end_time=next_available["end_time"],
                 start_iso=start_dt.isoformat(),
                 end_iso=end_dt.isoformat(),
-                minutes_until=minutes_until,
+                minutes_until=max(0, int((start_dt - now).total_seconds() // 60)),
             )
 
     return NextAvailabilityResponse(
@@ -503,6 +456,7 @@ def edit_availability_slot(availability_id: str, user_id: str, payload: EditAvai
             "$set": {
                 "start_time": _time_to_string(start_time),
                 "end_time": _time_to_string(end_time),
+                **day_grid.grid_fields(_time_to_minutes(start_time), _time_to_minutes(end_time)),
                 "updated_at": now
             }
         }
@@ -512,6 +466,7 @@ def edit_availability_slot(availability_id: str, user_id: str, payload: EditAvai
         raise HTTPException(status_code=404, detail="Availability slot not found")
     
     logger.info(f"Updated availability slot {availability_id} for therapist {user_id}")
+    availability_engine.on_calendar_changed(user_id)
     
     return {
         "success": True,
@@ -528,11 +483,11 @@ def get_therapist_schedule_for_month(user_id: str, year: int, month: int) -> dic
         raise HTTPException(status_code=400, detail="Year must be between 2000 and 2100")
 
     # Get start and end of the month
-    start_of_month = datetime(year, month, 1)
+    start_of_month = make_aware_malaysia(datetime(year, month, 1))
     if month == 12:
-        end_of_month = datetime(year + 1, 1, 1)
+        end_of_month = make_aware_malaysia(datetime(year + 1, 1, 1))
     else:
-        end_of_month = datetime(year, month + 1, 1)
+        end_of_month = make_aware_malaysia(datetime(year, month + 1, 1))
 
     # --- Get dates with sessions ---
     sessions = db.therapy_sessions.find({
@@ -543,7 +498,7 @@ def get_therapist_schedule_for_month(user_id: str, year: int, month: int) -> dic
         }
     })
     
-    scheduled_dates = {session["scheduled_at"].strftime("%Y-%m-%d") for session in sessions}
+    scheduled_dates = {availability_engine.to_local(session["scheduled_at"]).strftime("%Y-%m-%d") for session in sessions}
 
     # --- Get dates with specific availability ---
     specific_availability = db.therapist_availability.find({
@@ -574,3 +529,175 @@ def get_therapist_schedule_for_month(user_id: str, year: int, month: int) -> dic
             current_day += __import__('datetime').timedelta(days=1)
 
     return {"scheduled_dates": sorted(list(scheduled_dates))}
+
+
+def get_therapist_calendar(user_id: str, start_date: str, days: int) -> TherapistCalendarResponse:
+    """Per-day available / booked / released slot counts for a date range"""
+    try:
+        first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+    try:
+        counts = availability_engine.get_calendar_counts(user_id, first_day, days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return TherapistCalendarResponse(
+        therapist_id=user_id,
+        start_date=start_date,
+        days=[CalendarDayCounts(date=date_str, **day_counts) for date_str, day_counts in counts.items()]
+    )
+
+
+def _expand_rule(rule: AvailabilityRule) -> list[tuple[Optional[str], str, int, int]]:
+    """Expand one rule into (availability_date or None, day_of_week, start_minute, end_minute) slots"""
+    days = {day.lower() for day in rule.days_of_week}
+    if not days or not days <= set(VALID_DAYS):
+        raise HTTPException(status_code=400, detail="days_of_week must be a non-empty list of monday-sunday")
+
+    window_start = _time_to_minutes(_parse_time_string(rule.start_time))
+    window_end = _time_to_minutes(_parse_time_string(rule.end_time))
+    if window_start >= window_end:
+        raise HTTPException(status_code=400, detail="Start time must be before end time")
+
+    if rule.slot_minutes is None:
+        spans = [(window_start, window_end)]
+    else:
+        if rule.slot_minutes < MIN_SLOT_MINUTES or rule.break_minutes < 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"slot_minutes must be at least {MIN_SLOT_MINUTES} and break_minutes non-negative"
+            )
+        spans = []
+        start = window_start
+        while start + rule.slot_minutes <= window_end:
+            spans.append((start, start + rule.slot_minutes))
+            start += rule.slot_minutes + rule.break_minutes
+        if not spans:
+            raise HTTPException(status_code=400, detail="slot_minutes does not fit between start_time and end_time")
+
+    if rule.start_date is None and rule.end_date is None:
+        return [(None, day, start, end) for day in sorted(days) for start, end in spans]
+    if rule.start_date is None or rule.end_date is None:
+        raise HTTPException(status_code=400, detail="Provide both start_date and end_date, or neither")
+
+    try:
+        first_day = datetime.strptime(rule.start_date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(rule.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    range_days = (last_day - first_day).days + 1
+    if not 1 <= range_days <= MAX_RULE_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"A rule may cover between 1 and {MAX_RULE_RANGE_DAYS} days")
+
+    slots = []
+    for offset in range(range_days):
+        day = first_day + timedelta(days=offset)
+        day_name = day.strftime("%A").lower()
+        if day_name in days:
+            slots.extend((day.isoformat(), day_name, start, end) for start, end in spans)
+    return slots
+
+
+def bulk_set_therapist_availability(payload: BulkAvailabilityRequest) -> BulkAvailabilityResponse:
+    """Expand recurrence rules into slots and write them with one bulk_write.
+
+    With replace, the existing slots on every weekday template or date the rules
+    touch are deleted in the same ordered bulk_write, ahead of the inserts.
+    """
+    therapist = db.therapist_profile.find_one(
+        {"user_id": payload.user_id, "verification_status": "approved"},
+        {"_id": 1}
+    )
+    if not therapist:
+        raise HTTPException(status_code=404, detail="Approved therapist profile not found")
+    if not payload.rules:
+        raise HTTPException(status_code=400, detail="At least one rule is required")
+
+    # Slots grouped by the key they are matched on: a date, or a weekday template
+    slots_by_key: dict[tuple[Optional[str], str], list[tuple[int, int, bool]]] = {}
+    total = 0
+    for rule in payload.rules:
+        for availability_date, day_name, start, end in _expand_rule(rule):
+            key = (availability_date, day_name if availability_date is None else "")
+            slots_by_key.setdefault(key, []).append((start, end, rule.is_available))
+            total += 1
+    if total == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="The rules do not produce any slots; check the weekdays, date range and slot length"
+        )
+    if total > MAX_BULK_SLOTS:
+        raise HTTPException(status_code=400, detail=f"Rules expand to {total} slots; the limit is {MAX_BULK_SLOTS}")
+
+    covered_dates = sorted(date_key for date_key, _ in slots_by_key if date_key is not None)
+    covered_days = sorted(day_name for date_key, day_name in slots_by_key if date_key is None)
+    scope = []
+    if covered_dates:
+        scope.append({"availability_date": {"$in": covered_dates}})
+    if covered_days:
+        scope.append({"availability_date": None, "day_of_week": {"$in": covered_days}})
+
+    # Slots that survive the swap must not collide with the new ones either
+    existing: dict[tuple[Optional[str], str], list[tuple[int, int]]] = {}
+    if not payload.replace:
+        for slot in db.therapist_availability.find(
+            {"user_id": payload.user_id, "$or": scope},
+            {"availability_date": 1, "day_of_week": 1, "start_time": 1, "end_time": 1,
+             "start_minute": 1, "end_minute": 1}
+        ):
+            minutes = availability_engine.slot_minutes(slot)
+            if minutes:
+                date_key = slot.get("availability_date")
+                key = (date_key, (slot.get("day_of_week") or "").lower() if date_key is None else "")
+                existing.setdefault(key, []).append(minutes)
+
+    for key, slots in slots_by_key.items():
+        overlap = _find_overlap([(start, end) for start, end, _ in slots] + existing.get(key, []))
+        if overlap:
+            first, second = overlap
+            where = key[0] or f"every {key[1]}"
+            raise HTTPException(
+                status_code=400,
+                detail=f"Time slot {_minutes_to_label(first[0])}-{_minutes_to_label(first[1])} overlaps with "
+                       f"{_minutes_to_label(second[0])}-{_minutes_to_label(second[1])} on {where}"
+            )
+
+    now = now_my()
+    operations: list = []
+    if payload.replace:
+        operations.extend(DeleteMany({"user_id": payload.user_id, **condition}) for condition in scope)
+    for (availability_date, day_key), slots in slots_by_key.items():
+        day_name = day_key or datetime.strptime(availability_date, "%Y-%m-%d").strftime("%A").lower()
+        for start, end, is_available in sorted(slots):
+            operations.append(InsertOne({
+                "availability_id": str(uuid.uuid4()),
+                "user_id": payload.user_id,
+                "day_of_week": day_name,
+                "start_time": _minutes_to_label(start),
+                "end_time": _minutes_to_label(end),
+                **day_grid.grid_fields(start, end),
+                "is_available": is_available,
+                "availability_date": availability_date,
+                "created_at": now,
+                "updated_at": now,
+            }))
+
+    slots_created = slots_deleted = 0
+    if operations:
+        # Ordered, so the deletes land before the inserts in a single round trip
+        result = db.therapist_availability.bulk_write(operations, ordered=True)
+        slots_created, slots_deleted = result.inserted_count, result.deleted_count
+        logger.info(
+            f"Bulk availability for therapist {payload.user_id}: "
+            f"{slots_deleted} removed, {slots_created} created"
+        )
+        availability_engine.on_calendar_changed(payload.user_id)
+
+    return BulkAvailabilityResponse(
+        success=True,
+        message=f"Availability updated for {len(covered_days)} weekdays and {len(covered_dates)} dates",
+        slots_created=slots_created,
+        slots_deleted=slots_deleted
+    )
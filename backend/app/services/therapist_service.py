@@ -1,13 +1,34 @@
 import uuid
+import base64
+import json
 import logging
+import re
 from typing import Optional, List, Tuple
 from fastapi import HTTPException
 from ..models.database import db
-from ..models.schemas import TherapistApplicationRequest, TherapistApplicationResponse, TherapistProfileResponse, UpdateTherapistProfileRequest
+from ..models.schemas import (
+    TherapistApplicationRequest,
+    TherapistApplicationResponse,
+    TherapistProfileResponse,
+    TherapistSearchResponse,
+    UpdateTherapistProfileRequest,
+)
 from ..config.timezone import now_my
 
 logger = logging.getLogger(__name__)
 
+THERAPIST_SEARCH_PAGE_SIZE = 20
+MAX_THERAPIST_SEARCH_PAGE_SIZE = 50
+# Query words beyond this are ignored
+MAX_SEARCH_TERMS = 8
+# Relevance weight per field; an exact word match counts double a prefix match
+SEARCH_FIELD_WEIGHTS = (("first_name", 3), ("last_name", 3), ("specializations", 2))
+# Ranked search order; relevance is computed per query, the rest is stored on the profile
+_RANKED_SORT = (("relevance", -1), ("rating_average", -1), ("rating_count", -1))
+_WORD_RE = re.compile(r"[^\W_]+")
+# Upper bound on the radius of a near search
+MAX_NEAR_DISTANCE_KM = 500
+
 
 def _guess_image_mime(image_base64: str) -> str:
     """Derive the most likely mime type from a base64-encoded image."""
@@ -82,47 +103,243 @@ def _ensure_profile_picture_fields(doc: dict) -> None:
         doc['profile_picture_base64'] = resolved_base64
 
 
-def _compute_rating_summary(therapist_ids: List[str]) -> dict[str, dict[str, float | int]]:
-    """Return average rating and count for each therapist id provided."""
+def _apply_rating_summary(therapist: dict) -> None:
+    """Derive average_rating / total_ratings from the counters kept on the profile."""
 
-    if not therapist_ids:
-        return {}
+    rating_count = therapist.get("rating_count") or 0
+    if rating_count > 0:
+        therapist["average_rating"] = rating_average(therapist.get("rating_sum", 0), rating_count)
+        therapist["total_ratings"] = rating_count
+    else:
+        therapist["average_rating"] = None
+        therapist["total_ratings"] = 0
 
-    logger.info(f"Computing ratings for therapist IDs: {therapist_ids}")
-    
-    summary: dict[str, list[float]] = {}
-    cursor = db.therapy_sessions.find(
-        {
-            "therapist_user_id": {"$in": therapist_ids},
-            "user_rating": {"$exists": True, "$ne": None},
-        },
-        {"therapist_user_id": 1, "user_rating": 1},
-    )
 
-    doc_count = 0
-    for doc in cursor:
-        doc_count += 1
-        rating_value = doc.get("user_rating")
-        therapist_id = doc.get("therapist_user_id")
-        logger.info(f"Found session: therapist_id={therapist_id}, rating={rating_value}")
-        if therapist_id and isinstance(rating_value, (int, float)):
-            summary.setdefault(therapist_id, []).append(float(rating_value))
-
-    logger.info(f"Total sessions found: {doc_count}")
-    logger.info(f"Rating summary: {summary}")
-
-    aggregates: dict[str, dict[str, float | int]] = {}
-    for therapist_id, ratings in summary.items():
-        if not ratings:
+def rating_average(rating_sum: float, rating_count: int) -> float:
+    """Average shown to clients and stored as the rating_average sort key; 0 when unrated"""
+
+    return round(rating_sum / rating_count, 1) if rating_count else 0.0
+
+
+def _words(value) -> list[str]:
+    if isinstance(value, list):
+        return [word for item in value for word in _words(item)]
+    if not isinstance(value, str):
+        return []
+    return _WORD_RE.findall(value.lower())
+
+
+def search_fields(profile: dict) -> dict:
+    """
+    Indexed search_terms (every searchable word) and search_words (the words of each
+    weighted field, which the ranking pipeline scores against)
+    """
+    search_words = {field: sorted(set(_words(profile.get(field)))) for field, _ in SEARCH_FIELD_WEIGHTS}
+    return {
+        "search_terms": sorted({word for words in search_words.values() for word in words}),
+        "search_words": search_words,
+    }
+
+
+def _relevance_expr(query_words: list[str]) -> dict:
+    """Weighted sum of each query word's best field match, as an aggregation expression"""
+
+    def field_score(field: str, weight: int, query_word: str) -> dict:
+        words = {"$ifNull": [f"$search_words.{field}", []]}
+        prefixed = {"$filter": {
+            "input": words, "as": "word",
+            "cond": {"$regexMatch": {"input": "$$word", "regex": f"^{re.escape(query_word)}"}},
+        }}
+        return {"$cond": [
+            {"$in": [query_word, words]},
+            weight * 2,
+            {"$cond": [{"$gt": [{"$size": prefixed}, 0]}, weight, 0]},
+        ]}
+
+    return {"$add": [
+        {"$max": [field_score(field, weight, query_word) for field, weight in SEARCH_FIELD_WEIGHTS]}
+        for query_word in query_words
+    ]}
+
+
+def _min_rating_match(min_rating: float) -> dict:
+    """Rated therapists whose stored rating_sum / rating_count average is at least min_rating"""
+
+    return {"rating_count": {"$gt": 0}, "rating_average": {"$gte": min_rating}}
+
+
+def _after_match(fields: list[tuple[str, int]], values: list, after_id: str) -> dict:
+    """Keyset condition for rows sorted on fields (then user_id ascending) after the given row"""
+
+    branches = []
+    for index, (field, direction) in enumerate(fields):
+        branch = {name: value for (name, _), value in zip(fields[:index], values)}
+        branch[field] = {"$lt" if direction < 0 else "$gt": values[index]}
+        branches.append(branch)
+    branches.append({**{name: value for (name, _), value in zip(fields, values)}, "user_id": {"$gt": after_id}})
+    return {"$or": branches}
+
+
+def _encode_therapist_cursor(values: list, therapist_id: str) -> str:
+    raw = json.dumps({"k": values, "id": therapist_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_therapist_cursor(cursor: str, size: int) -> tuple[list, str]:
+    """(sort values, therapist id); size is the number of sort values the caller expects"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [float(value) for value in payload["k"]]
+        if len(values) != size:
+            raise ValueError("cursor is for a different search mode")
+        return values, str(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid search cursor") from exc
+
+
+def _location_field(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    """GeoJSON point for the 2dsphere index; None when no coordinates are given"""
+
+    if latitude is None and longitude is None:
+        return None
+    if latitude is None or longitude is None:
+        raise HTTPException(status_code=400, detail="latitude and longitude must be given together")
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise HTTPException(status_code=400, detail="Coordinates out of range")
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def _apply_location_fields(therapist: dict) -> None:
+    """Expose the stored GeoJSON point as latitude / longitude"""
+
+    coordinates = (therapist.get("location") or {}).get("coordinates")
+    if coordinates and len(coordinates) == 2:
+        therapist["longitude"], therapist["latitude"] = coordinates
+
+
+def _therapist_filter(
+    search_text: Optional[str],
+    specialization: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> tuple[dict, list[str]]:
+    """
+    Query over approved therapists, plus the query words it matches on
+    Every query word must prefix one of the therapist's search_terms, so the lookup rides
+    the (verification_status, search_terms) index instead of scanning with a regex
+    """
+    query: dict = {"verification_status": "approved"}
+    query_words = _words(search_text)[:MAX_SEARCH_TERMS]
+    if query_words:
+        query["$and"] = [{"search_terms": {"$regex": f"^{re.escape(word)}"}} for word in query_words]
+    if specialization:
+        query["specializations"] = {"$regex": f"^{re.escape(specialization.strip())}$", "$options": "i"}
+    if language:
+        query["languages_spoken"] = {"$regex": f"^{re.escape(language.strip())}$", "$options": "i"}
+    if min_price is not None or max_price is not None:
+        price_filter: dict = {}
+        if min_price is not None:
+            price_filter["$gte"] = min_price
+        if max_price is not None:
+            price_filter["$lte"] = max_price
+        query["hourly_rate"] = price_filter
+    return query, query_words
+
+
+def _ranked_therapists(
+    query: dict,
+    query_words: list[str],
+    min_rating: Optional[float],
+    limit: Optional[int],
+    after: Optional[tuple[list, str]],
+) -> list[tuple[list, str]]:
+    """
+    ([relevance, average rating, rating count], user_id) of matching therapists, best first
+    Filtering, ranking and the keyset cursor all run in Mongo, so only limit + 1 rows come
+    back. Without query words relevance is 0 for everyone and the sort rides the stored
+    (rating_average, rating_count) index
+    """
+    if min_rating is not None:
+        query = {**query, **_min_rating_match(min_rating)}
+    pipeline: list[dict] = [{"$match": query}]
+    sort_fields = list(_RANKED_SORT)
+    if query_words:
+        pipeline.append({"$addFields": {"relevance": _relevance_expr(query_words)}})
+    else:
+        sort_fields = sort_fields[1:]
+    if after:
+        values, after_id = after
+        pipeline.append({"$match": _after_match(sort_fields, values[-len(sort_fields):], after_id)})
+    pipeline.append({"$sort": {**dict(sort_fields), "user_id": 1}})
+    if limit is not None:
+        pipeline.append({"$limit": limit + 1})
+    pipeline.append({"$project": {"_id": 0, "user_id": 1, **{field: 1 for field, _ in sort_fields}}})
+    return [
+        ([row.get("relevance", 0), row.get("rating_average", 0.0), row.get("rating_count", 0)], row["user_id"])
+        for row in db.therapist_profile.aggregate(pipeline)
+    ]
+
+
+def _nearby_therapists(
+    query: dict,
+    near_lat: float,
+    near_lng: float,
+    max_distance_km: Optional[float],
+    min_rating: Optional[float],
+    limit: int,
+    after: Optional[tuple[list, str]],
+) -> list[tuple[float, str]]:
+    """
+    (distance in metres, user_id) of matching therapists, nearest first
+    $geoNear sorts on the 2dsphere index, so only limit + 1 rows leave the database
+    """
+    geo_near: dict = {
+        "near": {"type": "Point", "coordinates": [near_lng, near_lat]},
+        "key": "location",
+        "distanceField": "distance_m",
+        "spherical": True,
+        "query": query,
+    }
+    if max_distance_km is not None:
+        geo_near["maxDistance"] = max_distance_km * 1000
+    pipeline: list[dict] = [{"$geoNear": geo_near}]
+    if min_rating is not None:
+        pipeline.append({"$match": _min_rating_match(min_rating)})
+    if after:
+        pipeline.append({"$match": _after_match([("distance_m", 1)], *after)})
+    pipeline += [
+        {"$sort": {"distance_m": 1, "user_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, "user_id": 1, "distance_m": 1}},
+    ]
+    return [(row["distance_m"], row["user_id"]) for row in db.therapist_profile.aggregate(pipeline)]
+
+
+def _load_profiles(
+    therapist_ids: list[str],
+    distances_m: Optional[dict[str, float]] = None,
+) -> list[TherapistProfileResponse]:
+    """Full profiles for therapist_ids, in that order"""
+
+    therapists = {
+        therapist["user_id"]: therapist
+        for therapist in db.therapist_profile.find({"user_id": {"$in": therapist_ids}}, {"_id": 0})
+    }
+    results = []
+    for therapist_id in therapist_ids:
+        therapist = therapists.get(therapist_id)
+        if not therapist:
             continue
-        average = round(sum(ratings) / len(ratings), 1)
-        aggregates[therapist_id] = {
-            "average_rating": average,
-            "total_ratings": len(ratings),
-        }
+        _ensure_profile_picture_fields(therapist)
+        _apply_rating_summary(therapist)
+        _apply_location_fields(therapist)
+        if distances_m and therapist_id in distances_m:
+            therapist["distance_km"] = round(distances_m[therapist_id] / 1000, 2)
+        results.append(TherapistProfileResponse(**therapist))
+    return results
 
-    logger.info(f"Final aggregates: {aggregates}")
-    return aggregates
 
 def submit_therapist_application(payload: TherapistApplicationRequest) -> TherapistApplicationResponse:
     """Submit a therapist application"""
@@ -163,6 +380,10 @@ def submit_therapist_application(payload: TherapistApplicationRequest) -> Therap
                 "rejection_reason": None,  # Clear rejection reason
                 "updated_at": now,
             }
+            update_doc.update(search_fields(update_doc))
+            location = _location_field(payload.latitude, payload.longitude)
+            if location:
+                update_doc["location"] = location
             
             # Only update license_number if it's different to avoid unique index conflict
             if existing_therapist.get("license_number") != payload.license_number:
@@ -265,9 +486,16 @@ def submit_therapist_application(payload: TherapistApplicationRequest) -> Therap
         "profile_picture_base64": base64_payload,
         "verification_status": "pending",  # pending, approved, rejected
         "verified_at": None,
+        "rating_sum": 0,
+        "rating_count": 0,
+        "rating_average": 0.0,
         "created_at": now,
         "updated_at": now,
     }
+    therapist_doc.update(search_fields(therapist_doc))
+    location = _location_field(payload.latitude, payload.longitude)
+    if location:
+        therapist_doc["location"] = location
     
     try:
         result = db.therapist_profile.insert_one(therapist_doc)
@@ -292,14 +520,8 @@ def get_therapist_profile(user_id: str) -> TherapistProfileResponse:
 
     _ensure_profile_picture_fields(therapist)
 
-    rating_map = _compute_rating_summary([user_id])
-    rating_info = rating_map.get(user_id)
-    if rating_info:
-        therapist["average_rating"] = rating_info["average_rating"]
-        therapist["total_ratings"] = rating_info["total_ratings"]
-    else:
-        therapist["average_rating"] = None
-        therapist["total_ratings"] = 0
+    _apply_rating_summary(therapist)
+    _apply_location_fields(therapist)
     
     return TherapistProfileResponse(**therapist)
 
@@ -318,34 +540,65 @@ def get_pending_therapists() -> list[TherapistProfileResponse]:
 
 
 def get_all_verified_therapists(search_text: Optional[str] = None) -> list[TherapistProfileResponse]:
-    """Get all verified therapists with optional search"""
-    # Build the base query
-    query = {"verification_status": "approved"}
-    
-    # Add search logic if search_text is provided
-    if search_text and search_text.strip():
-        search_pattern = {"$regex": search_text.strip(), "$options": "i"}
-        query["$or"] = [
-            {"first_name": search_pattern},
-            {"last_name": search_pattern},
-            {"specializations": search_pattern}
-        ]
-    
-    therapists = list(db.therapist_profile.find(query, {"_id": 0}))
-
-    for therapist in therapists:
-        _ensure_profile_picture_fields(therapist)
-
-    therapist_ids = [t.get("user_id", "") for t in therapists if t.get("user_id")]
-    rating_map = _compute_rating_summary(therapist_ids)
+    """Get all verified therapists with optional search, most relevant first"""
+
+    query, query_words = _therapist_filter(search_text)
+    ranked = _ranked_therapists(query, query_words, None, None, None)
+    return _load_profiles([therapist_id for _, therapist_id in ranked])
+
+
+def search_therapists(
+    search_text: Optional[str] = None,
+    specialization: Optional[str] = None,
+    language: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    limit: int = THERAPIST_SEARCH_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    near_lat: Optional[float] = None,
+    near_lng: Optional[float] = None,
+    max_distance_km: Optional[float] = None,
+) -> TherapistSearchResponse:
+    """
+    Page of approved therapists matching search_text (word prefixes of name / specializations)
+    Ranked by relevance, then rating; with near_lat / near_lng, nearest first among therapists
+    with a stored location. Pass next_cursor back for the next page
+    """
+    limit = max(1, min(limit, MAX_THERAPIST_SEARCH_PAGE_SIZE))
+
+    if near_lat is not None or near_lng is not None:
+        if near_lat is None or near_lng is None:
+            raise ValueError("near_lat and near_lng must be given together")
+        if not -90 <= near_lat <= 90 or not -180 <= near_lng <= 180:
+            raise ValueError("Coordinates out of range")
+        if max_distance_km is not None and not 0 < max_distance_km <= MAX_NEAR_DISTANCE_KM:
+            raise ValueError(f"max_distance_km must be between 0 and {MAX_NEAR_DISTANCE_KM}")
+        after = _decode_therapist_cursor(cursor, 1) if cursor else None
+        query, _ = _therapist_filter(search_text, specialization, language, min_price, max_price)
+        nearby = _nearby_therapists(query, near_lat, near_lng, max_distance_km, min_rating, limit, after)
+        page = nearby[:limit]
+        has_more = len(nearby) > limit
+        return TherapistSearchResponse(
+            results=_load_profiles(
+                [therapist_id for _, therapist_id in page],
+                {therapist_id: distance for distance, therapist_id in page},
+            ),
+            next_cursor=_encode_therapist_cursor([page[-1][0]], page[-1][1]) if has_more and page else None,
+            has_more=has_more,
+        )
 
-    for therapist in therapists:
-        therapist_id = therapist.get("user_id")
-        rating_info = rating_map.get(therapist_id, {}) if therapist_id else {}
-        therapist["average_rating"] = rating_info.get("average_rating")
-        therapist["total_ratings"] = rating_info.get("total_ratings", 0)
+    after = _decode_therapist_cursor(cursor, 3) if cursor else None
+    query, query_words = _therapist_filter(search_text, specialization, language, min_price, max_price)
+    ranked = _ranked_therapists(query, query_words, min_rating, limit, after)
+    page = ranked[:limit]
+    has_more = len(ranked) > limit
 
-    return [TherapistProfileResponse(**t) for t in therapists]
+    return TherapistSearchResponse(
+        results=_load_profiles([therapist_id for _, therapist_id in page]),
+        next_cursor=_encode_therapist_cursor(*page[-1]) if has_more and page else None,
+        has_more=has_more,
+    )
 
 
 def update_therapist_verification_status(user_id: str, status: str, rejection_reason: Optional[str] = None) -> dict:
@@ -385,44 +638,6 @@ def update_therapist_verification_status(user_id: str, status: str, rejection_re
     }
 
 
-def get_therapist_dashboard_data(user_id: str) -> dict:
-    """Get therapist dashboard data including appointments and availability"""
-    # Get user basic info
-    user = db.users.find_one({"user_id": user_id}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get therapist profile
-    therapist = db.therapist_profile.find_one({"user_id": user_id}, {"_id": 0})
-    if not therapist:
-        raise HTTPException(status_code=404, detail="Therapist profile not found")
-    
-    # Check if therapist is approved
-    if therapist.get("verification_status") != "approved":
-        raise HTTPException(status_code=403, detail="Therapist not approved")
-    
-    # Get therapist name
-    first_name = therapist.get("first_name", "")
-    last_name = therapist.get("last_name", "")
-    therapist_name = f"Dr. {first_name} {last_name}".strip()
-    
-    # TODO: Get today's appointments from appointments collection
-    # For now, return empty lists
-    today_appointments = []
-    
-    # TODO: Get upcoming availability from schedules collection
-    upcoming_availability = []
-    
-    return {
-        "therapist_name": therapist_name,
-        "today_appointments": today_appointments,
-        "upcoming_availability": upcoming_availability,
-        "total_clients": 0,  # TODO: Calculate from appointments
-        "sessions_completed": 0,  # TODO: Calculate from appointments
-        "hours_available": 0,  # TODO: Calculate from schedules
-    }
-
-
 def update_therapist_profile(user_id: str, payload: UpdateTherapistProfileRequest) -> TherapistProfileResponse:
     """Update therapist profile"""
     therapist = db.therapist_profile.find_one({"user_id": user_id})
@@ -459,6 +674,17 @@ def update_therapist_profile(user_id: str, payload: UpdateTherapistProfileReques
         update_data["languages_spoken"] = payload.languages_spoken
     if payload.hourly_rate is not None:
         update_data["hourly_rate"] = payload.hourly_rate
+    if any(field in update_data for field, _ in SEARCH_FIELD_WEIGHTS):
+        update_data.update(search_fields({**therapist, **update_data}))
+    
+    # Coordinates are optional; only in-person therapists need them for near searches
+    unset_data: dict = {}
+    if payload.clear_location:
+        unset_data["location"] = ""
+    else:
+        location = _location_field(payload.latitude, payload.longitude)
+        if location:
+            update_data["location"] = location
     
     # Handle profile picture
     if payload.delete_profile_picture:
@@ -474,10 +700,10 @@ def update_therapist_profile(user_id: str, payload: UpdateTherapistProfileReques
         update_data["profile_picture_base64"] = base64_payload
     
     try:
-        db.therapist_profile.update_one(
-            {"user_id": user_id},
-            {"$set": update_data}
-        )
+        update_spec: dict = {"$set": update_data}
+        if unset_data:
+            update_spec["$unset"] = unset_data
+        db.therapist_profile.update_one({"user_id": user_id}, update_spec)
         logger.info(f"Therapist profile updated: {user_id}")
         
         # Return updated profile
@@ -485,6 +711,7 @@ def update_therapist_profile(user_id: str, payload: UpdateTherapistProfileReques
         if not updated_therapist:
             raise HTTPException(status_code=404, detail="Updated profile not found")
         _ensure_profile_picture_fields(updated_therapist)
+        _apply_location_fields(updated_therapist)
         return TherapistProfileResponse(**updated_therapist)  # type: ignore
     except Exception as e:
         logger.error(f"Failed to update therapist profile: {e}")
@@ -0,0 +1,51 @@
+"""
+Standalone background worker
+
+Runs the notification scheduler and maintenance jobs outside the web processes:
+
+    python -m app.worker
+
+Any number of instances can run; a Mongo lease makes sure only one is active.
+"""
+import asyncio
+import logging
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    from app.models.database import initialize_indexes
+    from app.services.background_worker import background_worker
+
+    initialize_indexes()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops do not support signal handlers; Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    await background_worker.start()
+    try:
+        await stop_event.wait()
+    finally:
+        await background_worker.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Worker interrupted")
@@ -0,0 +1,59 @@
+"""
+Shared benchmark setup
+
+Benchmarks seed and wipe their own database, so they refuse to run against one
+whose name does not end in "_bench". Run from the backend directory, e.g.
+
+    python -m benchmarks.bench_routine_reminders --users 100000
+    python -m benchmarks.bench_routine_reminders --users 5000 --mongomock
+
+Numbers from --mongomock only show relative cost; use a real MongoDB for latency.
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Callable
+
+
+def parse_args(description: str, **sizes: int) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    for name, default in sizes.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default="pawse_bench")
+    parser.add_argument("--mongomock", action="store_true", help="Use an in-memory mongomock database")
+    return parser.parse_args()
+
+
+def connect(args: argparse.Namespace):
+    """Point the app at the benchmark database (before anything under app/ is imported) and clear it"""
+    if not args.database.endswith("_bench"):
+        raise SystemExit("Refusing to use a database whose name does not end in '_bench'")
+    os.environ["DATABASE_NAME"] = args.database
+    if args.mongomock:
+        import mongomock
+        import pymongo
+
+        pymongo.MongoClient = mongomock.MongoClient
+
+    from app.models.database import db
+
+    for name in db.list_collection_names():
+        if not name.startswith("system."):
+            db[name].delete_many({})
+    return db
+
+
+def timed(label: str, fn: Callable[[], object], repeat: int, setup: Callable[[], object] = None) -> float:
+    """Run fn repeat times (calling setup before each run) and print median / max milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    median = statistics.median(samples)
+    print(f"{label:<48} median {median:9.2f} ms   max {max(samples):9.2f} ms   (n={repeat})")
+    return median
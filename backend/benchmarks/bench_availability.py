@@ -0,0 +1,93 @@
+"""
+Availability engine on dense calendars
+
+Each therapist offers 30-minute slots from 08:00 to 22:00 every day, with
+date-specific overrides on some dates, and most slots already booked by
+50-minute sessions (so the unaligned overlap path runs too). Times a single
+day, a 31-day range, next-available when the first gap is weeks out, and a
+windowed free-slot search across every therapist.
+"""
+import random
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+from benchmarks._common import connect, parse_args, timed
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DAY_START_MINUTE, DAY_END_MINUTE, SLOT_MINUTES = 8 * 60, 22 * 60, 30
+
+
+def availability_doc(user_id, start, end, day_of_week, availability_date=None):
+    from app.services import day_grid
+
+    return {
+        "availability_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "day_of_week": day_of_week,
+        "start_time": f"{start // 60:02d}:{start % 60:02d}",
+        "end_time": f"{end // 60:02d}:{end % 60:02d}",
+        **day_grid.grid_fields(start, end),
+        "is_available": True,
+        "availability_date": availability_date,
+    }
+
+
+def main():
+    args = parse_args(__doc__, therapists=50, days=60, booked_percent=90)
+    db = connect(args)
+
+    from app.config.timezone import get_malaysia_tz, now_my
+    from app.services import availability_engine
+
+    rng = random.Random(36)
+    tz = get_malaysia_tz()
+    today = now_my().date()
+    slot_starts = range(DAY_START_MINUTE, DAY_END_MINUTE, SLOT_MINUTES)
+    therapist_ids = [f"therapist-{index}" for index in range(args.therapists)]
+
+    availability, sessions = [], []
+    for user_id in therapist_ids:
+        for weekday in WEEKDAYS:
+            availability.extend(
+                availability_doc(user_id, start, start + SLOT_MINUTES, weekday) for start in slot_starts
+            )
+        for offset in range(args.days):
+            day = today + timedelta(days=offset)
+            if offset % 7 == 3:
+                # Date-specific override: shorter day on these dates
+                availability.extend(
+                    availability_doc(user_id, start, start + SLOT_MINUTES, day.strftime("%A").lower(), day.isoformat())
+                    for start in range(10 * 60, 18 * 60, SLOT_MINUTES)
+                )
+            for start in slot_starts:
+                # Keep the first three weeks fully booked so next-available has to scan past them
+                if offset < 21 or rng.randrange(100) < args.booked_percent:
+                    scheduled_at = datetime.combine(day, time.min, tzinfo=tz) + timedelta(minutes=start)
+                    sessions.append({
+                        "session_id": str(uuid.uuid4()),
+                        "therapist_user_id": user_id,
+                        "user_id": f"client-{rng.randrange(10_000)}",
+                        "scheduled_at": scheduled_at.astimezone(timezone.utc),
+                        "duration_minutes": 50,
+                        "session_status": "scheduled",
+                    })
+    db.therapist_availability.insert_many(availability)
+    db.therapy_sessions.insert_many(sessions)
+    print(f"{args.therapists} therapists, {len(availability)} availability slots, {len(sessions)} sessions")
+
+    therapist = therapist_ids[0]
+    busy_day = today + timedelta(days=1)
+    timed("single day", lambda: availability_engine.get_slots_for_range(therapist, busy_day, 1), args.repeat)
+    timed("31-day range", lambda: availability_engine.get_slots_for_range(therapist, today, 31), args.repeat)
+    timed("next available (first gap after 3 weeks)", lambda: availability_engine.find_next_available(therapist), args.repeat)
+    timed(
+        f"free 14:00-18:00 slots, {args.therapists} therapists x 7 days",
+        lambda: availability_engine.search_free_slots(
+            therapist_ids, today + timedelta(days=21), 7, time(14, 0), time(18, 0)
+        ),
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
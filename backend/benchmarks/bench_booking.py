@@ -0,0 +1,137 @@
+"""
+Slot-index migration and booking
+
+Seeds N legacy sessions whose scheduled_at is an ISO string, then times the
+session_datetimes migration, the unique_active_slot index build, the booking
+availability read on a busy day, a run of sequential bookings, and many clients
+racing for one slot (exactly one should win).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._common import connect, parse_args, timed
+
+HOURS = range(8, 20)
+
+
+def hour_label(hour: int) -> str:
+    return f"{(hour - 1) % 12 + 1:02d}:00 {'AM' if hour < 12 else 'PM'}"
+
+
+def main():
+    args = parse_args(__doc__, sessions=100_000, therapists=200, bookings=200, contenders=200)
+    db = connect(args)
+
+    from pymongo import UpdateOne
+
+    from app.config.timezone import get_malaysia_tz, now_my
+    from app.migrations import session_datetimes
+    from app.models.booking_schemas import BookingRequest
+    from app.models.database import UNIQUE_ACTIVE_SLOT_INDEX, initialize_indexes
+    from app.services import booking_service
+
+    tz = get_malaysia_tz()
+    today = now_my().date()
+    therapist_ids = [f"therapist-{index}" for index in range(args.therapists)]
+    db.therapist_profile.insert_many([
+        {"user_id": user_id, "license_number": f"LIC-{index}", "first_name": "Amy", "last_name": "Lim",
+         "verification_status": "approved", "hourly_rate": 120.0}
+        for index, user_id in enumerate(therapist_ids)
+    ])
+    db.therapist_availability.insert_many([
+        {"user_id": user_id, "day_of_week": day, "availability_date": None, "is_available": True,
+         "start_time": hour_label(hour), "end_time": hour_label(hour + 1)}
+        for user_id in therapist_ids
+        for day in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        for hour in HOURS
+    ])
+
+    # One legacy session per (therapist, day, hour) so the unique index can be built afterwards
+    legacy, slots_per_day = [], len(HOURS) * args.therapists
+    for index in range(args.sessions):
+        day, rest = divmod(index, slots_per_day)
+        hour = HOURS[rest % len(HOURS)]
+        scheduled_at = datetime.combine(today + timedelta(days=day), datetime.min.time(), tzinfo=tz)
+        legacy.append({
+            "session_id": f"legacy-{index}",
+            "user_id": f"client-{index % 5000}",
+            "therapist_user_id": therapist_ids[rest // len(HOURS)],
+            "scheduled_at": (scheduled_at + timedelta(hours=hour)).isoformat(),
+            "duration_minutes": 50,
+            "session_status": "scheduled",
+        })
+    db.therapy_sessions.insert_many(legacy)
+    first_free_day = today + timedelta(days=args.sessions // slots_per_day + 1)
+    print(f"{args.sessions} legacy sessions across {args.therapists} therapists")
+
+    def restore_strings():
+        db.therapy_sessions.bulk_write(
+            [UpdateOne({"session_id": doc["session_id"]}, {"$set": {"scheduled_at": doc["scheduled_at"]}})
+             for doc in legacy],
+            ordered=False,
+        )
+
+    timed("session_datetimes migration", session_datetimes.run, max(1, args.repeat // 2), setup=restore_strings)
+    timed(
+        "unique_active_slot index build",
+        initialize_indexes,
+        max(1, args.repeat // 2),
+        setup=lambda: db.therapy_sessions.drop_index(UNIQUE_ACTIVE_SLOT_INDEX)
+        if UNIQUE_ACTIVE_SLOT_INDEX in db.therapy_sessions.index_information() else None,
+    )
+
+    busy_day = (today + timedelta(days=1)).isoformat()
+    timed(
+        "availability for a booked-up day",
+        lambda: booking_service.get_therapist_availability_for_booking(therapist_ids[0], busy_day),
+        args.repeat,
+    )
+
+    clients = [f"client-{index}" for index in range(max(args.bookings, args.contenders))]
+    db.users.insert_many([{"user_id": user_id, "email": f"{user_id}@example.com"} for user_id in clients])
+    requests = [
+        BookingRequest(
+            client_user_id=clients[index],
+            therapist_user_id=therapist_ids[index % args.therapists],
+            date=(first_free_day + timedelta(days=index // (args.therapists * len(HOURS)))).isoformat(),
+            start_time=hour_label(HOURS[index // args.therapists % len(HOURS)]),
+        )
+        for index in range(args.bookings)
+    ]
+    started = time.perf_counter()
+    for request in requests:
+        booking_service.create_booking(request)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{f'{args.bookings} sequential bookings':<48} total {elapsed:10.2f} ms   "
+          f"per booking {elapsed / args.bookings:9.2f} ms")
+
+    contested_day = (first_free_day + timedelta(days=30)).isoformat()
+    barrier = threading.Barrier(args.contenders)
+    winners, conflicts = [], []
+
+    def contend(client_id):
+        barrier.wait()
+        try:
+            winners.append(booking_service.create_booking(BookingRequest(
+                client_user_id=client_id, therapist_user_id=therapist_ids[0],
+                date=contested_day, start_time="10:00 AM",
+            )))
+        except booking_service.SlotConflictError:
+            conflicts.append(client_id)
+
+    threads = [threading.Thread(target=contend, args=(client_id,)) for client_id in clients[:args.contenders]]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{f'{args.contenders} clients racing for one slot':<48} total {elapsed:10.2f} ms   "
+          f"{len(winners)} booked, {len(conflicts)} conflicts")
+    if len(winners) != 1:
+        raise SystemExit(f"Expected exactly one booking for the contested slot, got {len(winners)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Notification inbox and unread counter
+
+Seeds N users with a mixed read/unread history. One user has a deep inbox. Times
+the first inbox page, walking 20 cursor pages, the unread-only page, the
+counter read (seeded and unseeded), and the write path that keeps it current.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from benchmarks._common import connect, parse_args, timed
+
+
+def main():
+    args = parse_args(__doc__, users=1_000, per_user=50, heavy_user=20_000)
+    db = connect(args)
+
+    from app.config.timezone import now_my
+    from app.migrations import notification_counters
+    from app.services import notification_service
+
+    rng = random.Random(32)
+    now = now_my()
+
+    def notifications_for(user_id, count):
+        return [
+            {
+                "notification_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "type": rng.choice(["message", "booking_update", "hydration_reminder"]),
+                "title": "Reminder",
+                "body": "Time for a break",
+                "created_at": (now - timedelta(minutes=index)).isoformat(),
+                "is_read": rng.random() < 0.7,
+            }
+            for index in range(count)
+        ]
+
+    for index in range(args.users):
+        db.notifications.insert_many(notifications_for(f"user-{index}", args.per_user))
+    heavy = "heavy-user"
+    db.notifications.insert_many(notifications_for(heavy, args.heavy_user))
+    notification_counters.run()
+    print(f"{args.users} users x {args.per_user} notifications, plus one user with {args.heavy_user}")
+
+    timed("first inbox page (50)", lambda: notification_service.get_user_notifications(heavy), args.repeat)
+
+    def walk_pages():
+        cursor = None
+        for _ in range(20):
+            page = notification_service.get_user_notifications(heavy, cursor=cursor)
+            cursor = page.next_cursor
+
+    timed("20 cursor pages", walk_pages, args.repeat)
+    timed(
+        "unread-only page",
+        lambda: notification_service.get_user_notifications(heavy, unread_only=True),
+        args.repeat,
+    )
+    timed("unread count (counter)", lambda: notification_service.get_unread_count(heavy), args.repeat)
+    timed(
+        "unread count (first read, seeds counter)",
+        lambda: notification_service.get_unread_count(heavy),
+        args.repeat,
+        setup=lambda: db.notification_counters.delete_one({"_id": heavy}),
+    )
+    timed(
+        "create notification (insert + counter)",
+        lambda: notification_service.create_notification(heavy, "message", "New message", "Hello"),
+        args.repeat,
+    )
+    timed(
+        f"bulk create for {min(args.users, 500)} users",
+        lambda: notification_service.create_notifications_bulk([
+            {"user_id": f"user-{index}", "type": "message", "title": "Hi", "body": "Hello"}
+            for index in range(min(args.users, 500))
+        ]),
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Routine reminder scheduler tick over N users
+
+Measures the deadline reload (load_due_times) and one process_routine_reminders
+pass with --due-percent of users due, both served by the next_reminder_at index.
+"""
+import random
+from datetime import timedelta
+
+from benchmarks._common import connect, parse_args, timed
+
+
+def main():
+    args = parse_args(__doc__, users=100_000, due_percent=1)
+    db = connect(args)
+
+    from pymongo import UpdateOne
+
+    from app.config.timezone import now_my
+    from app.services.notification_scheduler import NotificationScheduler
+
+    rng = random.Random(42)
+    now = now_my()
+    due_count = args.users * args.due_percent // 100
+
+    def seed_due_state():
+        """Spread next_reminder_at over the next day, with due_count users due a minute ago"""
+        updates = []
+        for index in range(args.users):
+            due_at = now - timedelta(minutes=1) if index < due_count else now + timedelta(minutes=rng.randint(2, 24 * 60))
+            updates.append(UpdateOne(
+                {"user_id": f"user-{index}"},
+                {"$set": {"next_due_at": {"hydration_reminder": due_at}, "next_reminder_at": due_at}},
+            ))
+        db.notification_settings.bulk_write(updates, ordered=False)
+
+    db.notification_settings.insert_many([
+        {
+            "user_id": f"user-{index}",
+            "all_notifications_enabled": True,
+            "hydration_reminders_enabled": True,
+            "hydration_interval_minutes": 120,
+        }
+        for index in range(args.users)
+    ])
+    seed_due_state()
+    print(f"{args.users} users, {due_count} due per tick")
+
+    timed("load_due_times (deadline heap reload)", lambda: NotificationScheduler.load_due_times(now), args.repeat)
+    timed(
+        f"process_routine_reminders ({due_count} due)",
+        NotificationScheduler.process_routine_reminders,
+        args.repeat,
+        setup=seed_due_state,
+    )
+
+
+if __name__ == "__main__":
+    main()
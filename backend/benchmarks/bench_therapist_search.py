@@ -0,0 +1,73 @@
+"""
+Ranked therapist search over N approved profiles
+
+Times the /therapist/search paths: a typed prefix, a two-word query with
+filters, the rating-ordered directory with no query, and walks of cursor pages
+beyond the first for both.
+"""
+import random
+
+from benchmarks._common import connect, parse_args, timed
+
+FIRST_NAMES = ["Aisha", "Amy", "Daniel", "Farah", "Hui Min", "Jason", "Kavitha", "Mei Ling", "Nur", "Ravi", "Sarah", "Wei"]
+LAST_NAMES = ["Abdullah", "Chong", "Lee", "Lim", "Nair", "Ong", "Rahman", "Tan", "Wong", "Yusof"]
+SPECIALIZATIONS = ["Anxiety", "Depression", "Family Therapy", "Grief", "Relationships", "Stress Management", "Trauma"]
+LANGUAGES = ["English", "Malay", "Mandarin", "Tamil"]
+
+
+def main():
+    args = parse_args(__doc__, therapists=10_000)
+    db = connect(args)
+
+    from app.config.timezone import now_my
+    from app.services import therapist_service
+
+    rng = random.Random(42)
+    now = now_my()
+    profiles = []
+    for index in range(args.therapists):
+        rating_count = rng.randint(0, 40)
+        rating_sum = float(sum(rng.randint(3, 5) for _ in range(rating_count)))
+        profile = {
+            "user_id": f"therapist-{index}",
+            "license_number": f"LIC-{index}",
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"therapist-{index}@example.com",
+            "bio": "Licensed counsellor",
+            "specializations": rng.sample(SPECIALIZATIONS, 2),
+            "languages_spoken": rng.sample(LANGUAGES, 2),
+            "hourly_rate": float(rng.randrange(80, 300, 10)),
+            "verification_status": "approved",
+            "rating_sum": rating_sum,
+            "rating_count": rating_count,
+            "rating_average": therapist_service.rating_average(rating_sum, rating_count),
+            "created_at": now,
+            "updated_at": now,
+        }
+        profile.update(therapist_service.search_fields(profile))
+        profiles.append(profile)
+    db.therapist_profile.insert_many(profiles)
+    print(f"{args.therapists} approved therapist profiles")
+
+    timed("prefix 'sa'", lambda: therapist_service.search_therapists("sa"), args.repeat)
+    timed(
+        "'lim anx' + language, price and rating filters",
+        lambda: therapist_service.search_therapists(
+            "lim anx", language="Malay", max_price=200, min_rating=4
+        ),
+        args.repeat,
+    )
+    timed("directory by rating (no query)", lambda: therapist_service.search_therapists(), args.repeat)
+
+    def walk_pages(search_text):
+        cursor = None
+        for _ in range(10):
+            cursor = therapist_service.search_therapists(search_text, cursor=cursor).next_cursor
+
+    timed("10 cursor pages of 'an'", lambda: walk_pages("an"), args.repeat)
+    timed("10 cursor pages of the directory", lambda: walk_pages(None), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
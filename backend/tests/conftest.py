@@ -0,0 +1,35 @@
+"""
+Test fixtures
+
+The app binds its MongoDB client at import time, so mongomock is swapped in
+before anything under app/ is imported.
+"""
+import mongomock
+import pymongo
+import pytest
+
+pymongo.MongoClient = mongomock.MongoClient
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.database import db, initialize_indexes  # noqa: E402
+from app.services import notification_service  # noqa: E402
+
+# The app builds these in its lifespan, which the test client below never runs
+initialize_indexes()
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager, so the lifespan background worker never starts
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    yield
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+    # Per-process caches would otherwise carry one test's users into the next
+    notification_service._settings_cache._entries.clear()
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.migrations import active_slot_duplicates
+from app.models.database import UNIQUE_ACTIVE_SLOT_INDEX, db, initialize_indexes
+
+
+@pytest.fixture
+def double_booked():
+    db.therapy_sessions.drop_index(UNIQUE_ACTIVE_SLOT_INDEX)
+    slot = datetime(2026, 12, 1, 2, 0, tzinfo=timezone.utc)
+    created = datetime(2026, 11, 1, tzinfo=timezone.utc)
+    for index, client in enumerate(["first", "second", "third"]):
+        db.therapy_sessions.insert_one({
+            "session_id": f"s-{client}",
+            "user_id": client,
+            "therapist_user_id": "t1",
+            "scheduled_at": slot,
+            "duration_minutes": 50,
+            "session_status": "scheduled",
+            "created_at": created + timedelta(minutes=index),
+        })
+    yield
+    db.therapy_sessions.delete_many({})
+    initialize_indexes()
+
+
+def test_startup_fails_while_slots_are_double_booked(double_booked):
+    with pytest.raises(RuntimeError, match="active_slot_duplicates"):
+        initialize_indexes()
+
+
+def test_report_leaves_duplicates_alone(double_booked):
+    assert active_slot_duplicates.run() == 1
+    assert db.therapy_sessions.count_documents({"session_status": "scheduled"}) == 3
+
+
+def test_resolve_keeps_earliest_booking_and_builds_index(double_booked, monkeypatch):
+    # mongomock checks existing documents against a unique index without applying its
+    # partialFilterExpression, so the build itself is only recorded here
+    built = []
+    monkeypatch.setattr(active_slot_duplicates, "ensure_unique_active_slot_index", lambda: built.append(True))
+
+    assert active_slot_duplicates.run(resolve=True) == 1
+
+    scheduled = list(db.therapy_sessions.find({"session_status": "scheduled"}))
+    assert [session["session_id"] for session in scheduled] == ["s-first"]
+    cancelled = db.therapy_sessions.find_one({"session_id": "s-second"})
+    assert cancelled["cancellation_reason"] == active_slot_duplicates.DUPLICATE_REASON
+    assert cancelled["slot_released"] is False
+    assert db.notifications.count_documents({"user_id": {"$in": ["second", "third"]}}) == 2
+    assert built == [True]
+    assert active_slot_duplicates.run() == 0
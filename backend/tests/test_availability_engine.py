@@ -0,0 +1,54 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from app.migrations import availability_grid
+from app.models.database import db
+from app.services import availability_engine, day_grid
+
+LATE_SLOT = {"start_time": "10:00 PM", "end_time": "12:00 AM"}
+DAY = date(2030, 1, 7)  # a Monday
+
+
+def _late_slot():
+    db.therapist_availability.insert_one({
+        "user_id": "t1", "day_of_week": "monday", "availability_date": None, "is_available": True, **LATE_SLOT,
+    })
+
+
+def test_midnight_end_label_closes_the_day():
+    assert availability_engine.slot_minutes(LATE_SLOT) == (22 * 60, 24 * 60)
+    assert day_grid.window_mask(time(22, 0), time(0, 0)) == day_grid.span_mask(22 * 60, 24 * 60)
+
+
+def test_slot_ending_at_midnight_is_offered_and_can_be_booked():
+    _late_slot()
+
+    [slot] = availability_engine.get_slots_for_range("t1", DAY, 1)[DAY.isoformat()]
+    assert (slot.start_time, slot.end_time, slot.is_available) == ("10:00 PM", "12:00 AM", True)
+
+    db.therapy_sessions.insert_one({
+        "session_id": "s1", "user_id": "c1", "therapist_user_id": "t1", "duration_minutes": 50,
+        "scheduled_at": datetime(2030, 1, 7, 14, 0, tzinfo=timezone.utc),  # 10 PM in Malaysia
+        "session_status": "scheduled",
+    })
+    availability_engine.invalidate_therapist_caches("t1")
+    [slot] = availability_engine.get_slots_for_range("t1", DAY, 1)[DAY.isoformat()]
+    assert not slot.is_available
+
+
+def test_grid_backfill_covers_the_last_hours_of_the_day():
+    _late_slot()
+
+    availability_grid.run()
+
+    stored = db.therapist_availability.find_one({"user_id": "t1"})
+    assert (stored["start_minute"], stored["end_minute"]) == (22 * 60, 24 * 60)
+    assert day_grid.from_hex(stored["cell_mask"]) == day_grid.span_mask(22 * 60, 24 * 60)
+
+
+def test_next_available_ends_at_the_following_midnight():
+    _late_slot()
+
+    next_available = availability_engine.refresh_next_available("t1")
+
+    assert next_available["end_at"] - next_available["start_at"] == timedelta(hours=2)
+    assert next_available["end_at"].time() == time(0, 0)
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+from app.services import background_worker as worker_module
+from app.services.background_worker import BackgroundWorker
+from app.services.leader_election import LeaderLease, LeaseLostError, check_fence, set_fence
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_lease_is_renewed_while_a_long_job_runs(monkeypatch):
+    renewals = []
+    job_finished = threading.Event()
+
+    def slow_job():
+        time.sleep(2.5)
+        job_finished.set()
+
+    lease = LeaderLease("test-renew", ttl_seconds=3)
+    original_acquire = lease.try_acquire
+
+    def counting_acquire(status=None):
+        renewals.append(time.monotonic())
+        return original_acquire(status)
+
+    monkeypatch.setattr(lease, "try_acquire", counting_acquire)
+    monkeypatch.setattr(worker_module, "MAINTENANCE_JOBS", [("slow", slow_job, 60)])
+
+    async def scenario():
+        worker = BackgroundWorker(lease)
+        monkeypatch.setattr(worker_module.notification_task, "start", _noop)
+        await worker.start()
+        await asyncio.sleep(3)
+        await worker.stop()
+
+    _run(scenario())
+
+    assert job_finished.is_set()
+    # ttl/3 = 1s renewals keep going while the 2.5s job holds the job loop
+    assert len(renewals) >= 3
+
+
+def test_lost_lease_cancels_running_jobs(monkeypatch):
+    job_started = threading.Event()
+    fenced = threading.Event()
+
+    def fenced_job():
+        job_started.set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                check_fence()
+            except LeaseLostError:
+                fenced.set()
+                raise
+            time.sleep(0.05)
+
+    lease = LeaderLease("test-lost", ttl_seconds=3)
+    monkeypatch.setattr(worker_module, "MAINTENANCE_JOBS", [("fenced", fenced_job, 60)])
+
+    async def scenario():
+        worker = BackgroundWorker(lease)
+        monkeypatch.setattr(worker_module.notification_task, "start", _noop)
+        await worker.start()
+        while not job_started.is_set():
+            await asyncio.sleep(0.05)
+        # Another owner takes the lease over; the next renewal fails
+        monkeypatch.setattr(lease, "try_acquire", lambda status=None: _lose(lease))
+        await asyncio.sleep(1.5)
+        assert worker.jobs_task is None
+        await worker.stop()
+
+    _run(scenario())
+
+    assert fenced.is_set()
+
+
+def test_check_fence_is_a_noop_without_a_worker():
+    set_fence(None)
+    check_fence()
+
+
+async def _noop():
+    return None
+
+
+def _lose(lease):
+    lease.is_leader = False
+    return False
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from app.models.database import db
+
+
+def _scheduled_session(session_id="s1", scheduled_at=None):
+    scheduled_at = scheduled_at or datetime(2030, 1, 7, 2, 0)  # 10:00 AM Malaysia time, naive UTC
+    db.therapist_profile.insert_one({
+        "user_id": "t1", "license_number": "L1", "first_name": "Amy", "last_name": "Lim",
+        "verification_status": "approved",
+    })
+    db.therapy_sessions.insert_one({
+        "session_id": session_id,
+        "user_id": "c1",
+        "therapist_user_id": "t1",
+        "scheduled_at": scheduled_at,
+        "duration_minutes": 50,
+        "session_status": "scheduled",
+        "status": "scheduled",
+    })
+
+
+def test_cancel_booking_by_client(client):
+    _scheduled_session()
+
+    response = client.post("/booking/cancel", json={
+        "session_id": "s1", "client_user_id": "c1", "reason": "sick",
+    })
+
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    session = db.therapy_sessions.find_one({"session_id": "s1"})
+    assert session["session_status"] == "cancelled"
+    assert session["cancelled_by"] == "client"
+    notification = db.notifications.find_one({"user_id": "t1", "type": "booking_update"})
+    assert notification is not None
+    assert "Monday, 07 January 2030 at 10:00 AM" in notification["body"]
+
+
+def test_cancel_booking_by_therapist_notifies_client(client):
+    _scheduled_session()
+
+    response = client.post("/booking/cancel", json={
+        "session_id": "s1", "client_user_id": "c1", "cancelled_by": "therapist",
+    })
+
+    assert response.status_code == 200
+    notification = db.notifications.find_one({"user_id": "c1", "type": "booking_update"})
+    assert notification is not None
+    assert notification["body"].startswith("Dr. Amy Lim cancelled the booking on")
+
+
+def test_cancel_unknown_booking_is_400(client):
+    response = client.post("/booking/cancel", json={"session_id": "missing", "client_user_id": "c1"})
+
+    assert response.status_code == 400
+
+
+def test_search_from_evening_until_midnight(client):
+    db.therapist_profile.insert_one({
+        "user_id": "t1", "license_number": "L1", "first_name": "Amy", "last_name": "Lim",
+        "verification_status": "approved", "hourly_rate": 120.0,
+    })
+    db.therapist_availability.insert_many([
+        {"user_id": "t1", "day_of_week": "monday", "availability_date": None, "is_available": True,
+         "start_time": start, "end_time": end}
+        for start, end in [("02:00 PM", "03:00 PM"), ("10:00 PM", "12:00 AM")]
+    ])
+
+    response = client.get("/booking/availability/search", params={
+        "start_date": "2030-01-07", "from_time": "6:00 PM", "to_time": "12:00 AM",
+    })
+
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert [(slot["start_time"], slot["end_time"]) for slot in result["slots"]] == [("10:00 PM", "12:00 AM")]
+
+
+def test_upcoming_session_is_returned_in_malaysia_time(client):
+    _scheduled_session()
+
+    response = client.get("/booking/client/c1/upcoming")
+
+    assert response.status_code == 200
+    scheduled_at = datetime.fromisoformat(response.json()["scheduled_at"])
+    assert (scheduled_at.hour, scheduled_at.utcoffset().total_seconds()) == (10, 8 * 3600)
+
+
+def test_pending_rating_is_returned_in_malaysia_time(client):
+    _scheduled_session()
+    db.therapy_sessions.update_one({"session_id": "s1"}, {"$set": {"session_status": "completed"}})
+
+    response = client.get("/booking/client/c1/pending-rating")
+
+    assert response.status_code == 200
+    scheduled_at = datetime.fromisoformat(response.json()["session"]["scheduled_at"])
+    assert (scheduled_at.hour, scheduled_at.utcoffset().total_seconds()) == (10, 8 * 3600)
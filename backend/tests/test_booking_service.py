@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.models.booking_schemas import BookingRequest
+from app.models.database import db
+from app.services import booking_service
+
+SLOT_DATE = "2030-01-07"  # a Monday
+
+
+def _bookable_slot(clients):
+    db.therapist_profile.insert_one({
+        "user_id": "t1", "license_number": "L1", "first_name": "Amy", "last_name": "Lim",
+        "verification_status": "approved", "hourly_rate": 120.0,
+    })
+    db.therapist_availability.insert_one({
+        "user_id": "t1", "day_of_week": "monday", "availability_date": None,
+        "start_time": "10:00 AM", "end_time": "11:00 AM", "is_available": True,
+    })
+    db.users.insert_many([{"user_id": client_id, "email": f"{client_id}@example.com"} for client_id in clients])
+
+
+def _request(client_id):
+    return BookingRequest(
+        client_user_id=client_id, therapist_user_id="t1", date=SLOT_DATE, start_time="10:00 AM",
+    )
+
+
+def test_concurrent_bookings_for_one_slot_yield_a_single_session():
+    clients = [f"c{index}" for index in range(8)]
+    _bookable_slot(clients)
+    barrier = threading.Barrier(len(clients))
+    outcomes = {}
+
+    def book(client_id):
+        barrier.wait()
+        try:
+            outcomes[client_id] = booking_service.create_booking(_request(client_id))
+        except booking_service.SlotConflictError as e:
+            outcomes[client_id] = e
+
+    threads = [threading.Thread(target=book, args=(client_id,)) for client_id in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    booked = [outcome for outcome in outcomes.values() if not isinstance(outcome, Exception)]
+    assert len(booked) == 1
+    assert sum(isinstance(outcome, booking_service.SlotConflictError) for outcome in outcomes.values()) == 7
+    assert db.therapy_sessions.count_documents({"therapist_user_id": "t1", "session_status": "scheduled"}) == 1
+
+
+def test_retried_booking_replays_the_original_in_malaysia_time():
+    _bookable_slot(["c1"])
+
+    first = booking_service.create_booking(_request("c1"))
+    replay = booking_service.create_booking(_request("c1"))
+
+    assert replay.session_id == first.session_id
+    assert replay.scheduled_at == first.scheduled_at
+    assert datetime.fromisoformat(replay.scheduled_at).utcoffset().total_seconds() == 8 * 3600
+
+
+def test_another_client_cannot_take_a_booked_slot():
+    _bookable_slot(["c1", "c2"])
+    booking_service.create_booking(_request("c1"))
+
+    with pytest.raises(booking_service.SlotConflictError):
+        booking_service.create_booking(_request("c2"))
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from app.models.database import db
+from app.services.password_service import hash_password
+
+
+def _user_with_session():
+    db.users.insert_one({"user_id": "c1", "email": "c1@example.com", "password": hash_password("s3cret-pass")})
+    db.therapy_sessions.insert_one({
+        "session_id": "s1", "user_id": "c1", "therapist_user_id": "t1", "therapist_name": "Amy Lim",
+        "scheduled_at": datetime(2030, 1, 7, 2, 0), "duration_minutes": 50, "session_status": "scheduled",
+        "updated_at": datetime(2029, 12, 1, 0, 0),
+    })
+
+
+def test_feed_url_requires_the_account_password(client):
+    _user_with_session()
+
+    assert client.post("/booking/calendar/c1/feed-url", json={"password": "wrong"}).status_code == 401
+    assert client.post("/booking/calendar/nobody/feed-url", json={"password": "s3cret-pass"}).status_code == 401
+    assert client.get("/booking/calendar/c1/feed-url").status_code in (404, 405)
+
+
+def test_feed_url_serves_the_owners_calendar(client):
+    _user_with_session()
+
+    response = client.post("/booking/calendar/c1/feed-url", json={"password": "s3cret-pass"})
+
+    assert response.status_code == 200
+    feed = client.get(response.json()["feed_url"])
+    assert feed.status_code == 200
+    assert "BEGIN:VEVENT" in feed.text
+    assert client.get("/booking/calendar/c1.ics?token=forged").status_code == 404
+
+
+def test_generated_feed_secret_is_shared_across_processes(monkeypatch):
+    from app.services import calendar_feed_service
+
+    monkeypatch.setattr(calendar_feed_service, "CALENDAR_FEED_SECRET", "")
+    monkeypatch.setattr(calendar_feed_service, "_secret", None)
+    first_worker_token = calendar_feed_service.feed_token("c1")
+
+    # A second worker starts with nothing cached and must load the same key
+    monkeypatch.setattr(calendar_feed_service, "_secret", None)
+
+    assert calendar_feed_service.feed_token("c1") == first_worker_token
+    assert db.app_secrets.count_documents({"_id": calendar_feed_service.FEED_SECRET_ID}) == 1
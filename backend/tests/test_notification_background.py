@@ -0,0 +1,34 @@
+import asyncio
+
+from app.services import notification_background
+from app.services.notification_background import NotificationBackgroundTask
+from app.services.notification_scheduler import NotificationScheduler
+
+
+def test_schedule_change_in_another_process_wakes_the_scheduler(monkeypatch):
+    reloads = []
+    monkeypatch.setattr(NotificationScheduler, "backfill_next_due_at", staticmethod(lambda: None))
+    monkeypatch.setattr(
+        NotificationScheduler, "load_due_times", staticmethod(lambda since: reloads.append(since) or [])
+    )
+    monkeypatch.setattr(NotificationBackgroundTask, "SIGNAL_POLL_SECONDS", 0.05)
+
+    async def scenario():
+        # The leader's scheduler; the module-level notification_task stands in for
+        # a web worker that is not running it
+        leader = NotificationBackgroundTask()
+        await leader.start()
+        await asyncio.sleep(0.2)
+        before = len(reloads)
+
+        notification_background.notify_schedule_changed()
+        await asyncio.sleep(0.5)
+        after = len(reloads)
+        await leader.stop()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+
+    assert not notification_background.notification_task.running
+    assert before == 1
+    assert after > before
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from app.config.timezone import now_my
+from app.models.database import db
+from app.services import notification_service
+from app.services.notification_scheduler import NotificationScheduler, _as_local
+
+
+def _due_hydration_user(user_id="u1"):
+    due_at = now_my() - timedelta(minutes=1)
+    db.notification_settings.insert_one({
+        "user_id": user_id,
+        "all_notifications_enabled": True,
+        "hydration_reminders_enabled": True,
+        "hydration_interval_minutes": 120,
+        "next_due_at": {"hydration_reminder": due_at},
+        "next_reminder_at": due_at,
+    })
+    return due_at
+
+
+def test_failed_send_leaves_routine_reminder_due(monkeypatch):
+    due_at = _due_hydration_user()
+
+    def broken_send(deliveries):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(NotificationScheduler, "send_notifications_batch", staticmethod(broken_send))
+
+    assert NotificationScheduler.process_routine_reminders() == 0
+
+    settings = db.notification_settings.find_one({"user_id": "u1"})
+    assert abs(_as_local(settings["next_reminder_at"]) - due_at) < timedelta(seconds=1)
+    assert "last_sent" not in settings
+
+
+def test_successful_send_advances_routine_reminder():
+    due_at = _due_hydration_user()
+
+    assert NotificationScheduler.process_routine_reminders() == 1
+
+    settings = db.notification_settings.find_one({"user_id": "u1"})
+    assert _as_local(settings["next_reminder_at"]) > due_at + timedelta(minutes=60)
+    assert db.notifications.count_documents({"user_id": "u1", "type": "hydration_reminder"}) == 1
+
+
+def test_scheduler_ignores_cached_settings_from_before_an_opt_out():
+    notification_service.create_default_notification_settings("u1")
+    # Another process turns notifications off; this process still holds the old settings
+    db.notification_settings.update_one({"user_id": "u1"}, {"$set": {"all_notifications_enabled": False}})
+    assert notification_service.get_notification_settings("u1").all_notifications_enabled
+
+    sent = NotificationScheduler.send_notifications_batch(
+        [("u1", {"type": "hydration_reminder", "title": "Drink water", "body": "Time for a glass"})]
+    )
+
+    assert sent == [None]
+    assert db.notifications.count_documents({"user_id": "u1"}) == 0
@@ -0,0 +1,79 @@
+from app.models.database import db
+from app.services import notification_service
+
+
+def _unread(user_id, count):
+    for index in range(count):
+        db.notifications.insert_one({
+            "notification_id": f"{user_id}-{index}",
+            "user_id": user_id,
+            "type": "message",
+            "title": "Hi",
+            "body": "Hello",
+            "created_at": f"2026-01-01T00:00:{index:02d}+08:00",
+            "is_read": False,
+        })
+
+
+def test_unread_count_seeds_missing_counter():
+    _unread("u1", 2)
+
+    assert notification_service.get_unread_count("u1") == 2
+    notification_service.create_notification("u1", "message", "Hi", "Hello")
+    assert notification_service.get_unread_count("u1") == 3
+
+
+def test_seed_is_not_stored_while_a_change_is_in_flight():
+    _unread("u1", 2)
+
+    with notification_service._unread_change(["u1"]) as deltas:
+        db.notifications.insert_one({
+            "notification_id": "late", "user_id": "u1", "type": "message", "title": "Hi", "body": "Hello",
+            "created_at": "2026-01-01T00:01:00+08:00", "is_read": False,
+        })
+        # The new notification is counted, but its increment has not landed yet
+        assert notification_service.get_unread_count("u1") == 3
+        deltas["u1"] = 1
+
+    assert notification_service.get_unread_count("u1") == 3
+    assert db.notification_counters.find_one({"_id": "u1"})["seeded"] is True
+
+
+def test_seed_is_not_stored_when_a_change_started_while_counting(monkeypatch):
+    _unread("u1", 2)
+    with notification_service._unread_change(["u1"]):
+        pass
+    count_documents = db.notifications.count_documents
+    raced = []
+
+    def counting_during_a_write(query, **kwargs):
+        result = count_documents(query, **kwargs)
+        if not raced:
+            raced.append(True)
+            notification_service.create_notification("u1", "message", "Hi", "Hello")
+        return result
+
+    monkeypatch.setattr(db.notifications, "count_documents", counting_during_a_write)
+    assert notification_service.get_unread_count("u1") == 3
+    monkeypatch.undo()
+
+    assert db.notification_counters.find_one({"_id": "u1"})["unread_count"] == 3
+    notification_service.mark_notification_read("u1-0")
+    assert notification_service.get_unread_count("u1") == 2
+
+
+def test_mark_all_read_keeps_a_notification_created_meanwhile(monkeypatch):
+    _unread("u1", 2)
+    assert notification_service.get_unread_count("u1") == 2
+    update_many = db.notifications.update_many
+
+    def marking_during_a_write(query, update, **kwargs):
+        result = update_many(query, update, **kwargs)
+        notification_service.create_notification("u1", "message", "Hi", "Hello")
+        return result
+
+    monkeypatch.setattr(db.notifications, "update_many", marking_during_a_write)
+    assert notification_service.mark_notifications_read("u1") == 2
+    monkeypatch.undo()
+
+    assert notification_service.get_unread_count("u1") == 1
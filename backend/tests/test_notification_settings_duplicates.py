@@ -0,0 +1,32 @@
+import pytest
+
+from app.migrations import notification_settings_duplicates
+from app.models.database import SETTINGS_USER_INDEX, db, initialize_indexes
+
+
+@pytest.fixture
+def duplicated_settings():
+    db.notification_settings.drop_index(SETTINGS_USER_INDEX)
+    db.notification_settings.create_index("user_id", name=SETTINGS_USER_INDEX)
+    db.notification_settings.insert_many([
+        {"user_id": "u1", "all_notifications_enabled": False},
+        {"user_id": "u1", "all_notifications_enabled": True},
+        {"user_id": "u2", "all_notifications_enabled": True},
+    ])
+    yield
+    db.notification_settings.delete_many({})
+    initialize_indexes()
+
+
+def test_startup_fails_while_settings_are_duplicated(duplicated_settings):
+    with pytest.raises(RuntimeError, match="notification_settings_duplicates"):
+        initialize_indexes()
+
+
+def test_migration_keeps_the_oldest_document_and_makes_user_id_unique(duplicated_settings):
+    assert notification_settings_duplicates.run() == 1
+
+    [kept] = db.notification_settings.find({"user_id": "u1"})
+    assert kept["all_notifications_enabled"] is False
+    assert db.notification_settings.index_information()[SETTINGS_USER_INDEX].get("unique")
+    assert notification_settings_duplicates.run() == 0
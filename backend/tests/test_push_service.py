@@ -0,0 +1,99 @@
+from app.models.database import db
+from app.services import push_service
+from app.services.notification_service import create_notification
+
+
+def test_local_transport_marks_pushes_skipped_not_sent(monkeypatch):
+    monkeypatch.setattr(push_service, "transport", push_service.LocalPushTransport())
+    push_service.register_device("u1", "token-1")
+    create_notification(user_id="u1", type="system", title="Hello", body="World")
+
+    assert push_service.process_push_queue() == 0
+
+    job = db.push_queue.find_one({"token": "token-1"})
+    assert job["status"] == "skipped"
+    assert "completed_at" in job
+
+
+def test_local_transport_history_is_bounded():
+    local = push_service.LocalPushTransport()
+    messages = [{"token": f"t{i}", "title": "x", "body": "y"} for i in range(local.HISTORY_SIZE + 50)]
+
+    local.send_batch(messages)
+
+    assert len(local.recent) == local.HISTORY_SIZE
+
+
+class _FakeCredentials:
+    def __init__(self):
+        self.token = None
+        self.valid = False
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.valid = True
+
+
+class _FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+def test_fcm_refreshes_the_token_and_resends_on_401(monkeypatch):
+    credentials = _FakeCredentials()
+    fcm = push_service.FcmPushTransport("demo-project", credentials)
+    seen_tokens = []
+    responses = [_FakeResponse(401, "UNAUTHENTICATED"), _FakeResponse(200)]
+
+    def fake_post(url, json, headers, timeout):
+        seen_tokens.append(headers["Authorization"])
+        return responses.pop(0)
+
+    monkeypatch.setattr(fcm.session, "post", fake_post)
+
+    [result] = fcm.send_batch([{"token": "t1", "title": "x", "body": "y"}])
+
+    assert result.status == push_service.PushResult.OK
+    assert seen_tokens == ["Bearer token-1", "Bearer token-2"]
+
+
+def test_fcm_persistent_401_is_retried_later_not_rejected(monkeypatch):
+    fcm = push_service.FcmPushTransport("demo-project", _FakeCredentials())
+    monkeypatch.setattr(fcm.session, "post", lambda url, json, headers, timeout: _FakeResponse(401))
+
+    [result] = fcm.send_batch([{"token": "t1", "title": "x", "body": "y"}])
+
+    assert result.status == push_service.PushResult.RETRY
+
+
+class _SlowOkTransport(push_service.PushTransport):
+    name = "slow"
+
+    def __init__(self, clock, seconds_per_batch):
+        self.clock = clock
+        self.seconds_per_batch = seconds_per_batch
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append(len(messages))
+        self.clock[0] += self.seconds_per_batch
+        return [push_service.PushResult(push_service.PushResult.OK) for _ in messages]
+
+
+def test_push_tick_stops_claiming_once_its_time_budget_is_spent(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(push_service.time, "monotonic", lambda: clock[0])
+    slow = _SlowOkTransport(clock, seconds_per_batch=push_service.PUSH_TICK_BUDGET_SECONDS / 2)
+    monkeypatch.setattr(push_service, "transport", slow)
+    push_service.register_device("u1", "token-1")
+    for index in range(push_service.PUSH_BATCH_SIZE * 5):
+        create_notification(user_id="u1", type="system", title=f"n{index}", body="b")
+
+    sent = push_service.process_push_queue()
+
+    assert slow.batches == [push_service.PUSH_BATCH_SIZE, push_service.PUSH_BATCH_SIZE]
+    assert sent == 2 * push_service.PUSH_BATCH_SIZE
+    assert db.push_queue.count_documents({"status": "pending"}) == 3 * push_service.PUSH_BATCH_SIZE
@@ -0,0 +1,45 @@
+from app.models.database import db
+
+
+def _approved_therapist():
+    db.therapist_profile.insert_one({"user_id": "t1", "license_number": "L1", "verification_status": "approved"})
+
+
+def test_bulk_availability_rejects_rules_that_expand_to_nothing(client):
+    _approved_therapist()
+
+    # 2030-01-07..2030-01-08 is a Monday and Tuesday, so a Friday rule has no dates
+    response = client.post("/therapist/availability/bulk", json={
+        "user_id": "t1",
+        "rules": [{
+            "days_of_week": ["friday"], "start_time": "9:00 AM", "end_time": "5:00 PM",
+            "start_date": "2030-01-07", "end_date": "2030-01-08",
+        }],
+    })
+
+    assert response.status_code == 400
+    assert db.therapist_availability.count_documents({}) == 0
+
+
+def test_bulk_availability_rejects_window_shorter_than_slot(client):
+    _approved_therapist()
+
+    response = client.post("/therapist/availability/bulk", json={
+        "user_id": "t1",
+        "rules": [{"days_of_week": ["monday"], "start_time": "9:00 AM", "end_time": "9:30 AM", "slot_minutes": 50}],
+    })
+
+    assert response.status_code == 400
+
+
+def test_bulk_availability_creates_weekly_slots(client):
+    _approved_therapist()
+
+    response = client.post("/therapist/availability/bulk", json={
+        "user_id": "t1",
+        "rules": [{"days_of_week": ["monday", "wednesday"], "start_time": "9:00 AM", "end_time": "11:00 AM",
+                   "slot_minutes": 60}],
+    })
+
+    assert response.status_code == 200
+    assert response.json()["slots_created"] == 4
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from app.models.database import db
+from app.services import therapist_service
+
+
+def _therapist(user_id, first_name, last_name, specializations, ratings=(), **extra):
+    profile = {
+        "user_id": user_id, "license_number": f"LIC-{user_id}", "first_name": first_name,
+        "last_name": last_name, "email": f"{user_id}@example.com", "bio": "Counsellor",
+        "specializations": specializations, "languages_spoken": ["English"], "hourly_rate": 120.0,
+        "verification_status": "approved", "rating_sum": float(sum(ratings)), "rating_count": len(ratings),
+        "rating_average": therapist_service.rating_average(sum(ratings), len(ratings)),
+        "created_at": datetime(2030, 1, 1), "updated_at": datetime(2030, 1, 1), **extra,
+    }
+    profile.update(therapist_service.search_fields(profile))
+    db.therapist_profile.insert_one(profile)
+
+
+def _walk(limit, **filters):
+    user_ids, cursor = [], None
+    while True:
+        page = therapist_service.search_therapists(limit=limit, cursor=cursor, **filters)
+        user_ids += [therapist.user_id for therapist in page.results]
+        if not page.has_more:
+            return user_ids
+        cursor = page.next_cursor
+
+
+def test_ranks_exact_name_matches_above_prefixes_then_rating():
+    _therapist("t1", "Sarah", "Tan", ["Anxiety"], ratings=[3])
+    _therapist("t2", "Sara", "Lim", ["Grief"], ratings=[5])
+    _therapist("t3", "Amy", "Wong", ["Saraswati Yoga"], ratings=[5, 5])
+    _therapist("t4", "Sarah", "Ong", ["Trauma"], ratings=[4, 5])
+    _therapist("t5", "Daniel", "Lee", ["Grief"])
+
+    # "sara" is an exact first name for t2, a first-name prefix for t1 / t4, a specialization prefix for t3
+    assert _walk(10, search_text="sara") == ["t2", "t4", "t1", "t3"]
+    assert _walk(1, search_text="sara") == ["t2", "t4", "t1", "t3"]
+
+
+def test_directory_pages_by_rating_without_repeats():
+    for index, ratings in enumerate([[5], [4, 5], [], [3], [5], [4, 5], []]):
+        _therapist(f"t{index}", "Amy", "Lim", ["Anxiety"], ratings=ratings)
+
+    expected = ["t0", "t4", "t1", "t5", "t3", "t2", "t6"]
+    assert _walk(50) == expected
+    assert _walk(2) == expected
+
+
+def test_min_rating_is_applied_in_the_query():
+    _therapist("t1", "Amy", "Lim", ["Anxiety"], ratings=[4, 5])  # 4.5
+    _therapist("t2", "Amy", "Tan", ["Anxiety"], ratings=[4, 4, 5])  # 4.3
+    _therapist("t3", "Amy", "Ong", ["Anxiety"])
+
+    assert _walk(1, search_text="amy", min_rating=4.5) == ["t1"]
+    assert _walk(1, min_rating=4.3) == ["t1", "t2"]
+
+
+def test_rating_a_session_keeps_the_stored_average_current():
+    from app.models.booking_schemas import SubmitSessionRatingRequest
+    from app.services import booking_service
+
+    _therapist("t1", "Amy", "Lim", ["Anxiety"], ratings=[4])
+    db.therapy_sessions.insert_one({
+        "session_id": "s1", "user_id": "c1", "therapist_user_id": "t1", "session_status": "completed",
+    })
+
+    booking_service.submit_session_rating(SubmitSessionRatingRequest(
+        session_id="s1", client_user_id="c1", rating=5,
+    ))
+
+    assert db.therapist_profile.find_one({"user_id": "t1"})["rating_average"] == 4.5